@@ -0,0 +1,238 @@
+"""
+Benchmark GirderContentsManager against an in-process fake Girder, reporting
+the wall time of common operations and the exact Girder requests they make.
+
+    pip install -e . && python benchmarks/bench_contents.py [--quick] [--latency MS]
+
+The request counts are compared with benchmarks/baselines.json, the run fails
+if any operation makes more requests of Girder than its baseline. After a
+change that is meant to alter the counts, record the new ones with
+--update-baselines.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import nbformat
+from nbformat.v4 import new_code_cell, new_notebook, new_output
+
+from girder_jupyter.contents.manager import GirderContentsManager
+from girder_jupyter.testing import FakeGirder
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+KB = 1024
+MB = 1024 * KB
+
+
+def _notebook(size):
+    """A notebook whose JSON is roughly size bytes, mostly cell outputs."""
+    cells = max(1, min(100, size // KB))
+    text = 'x' * (size // cells)
+    nb = new_notebook(cells=[
+        new_code_cell('print(%d)' % i, outputs=[new_output('stream', text=text)])
+        for i in range(cells)
+    ])
+
+    return nbformat.writes(nb).encode('utf8')
+
+
+def _model(text):
+    return {'type': 'file', 'format': 'text', 'content': text}
+
+
+class Scenario(object):
+    """
+    An operation to benchmark. setup populates the fake Girder once, prepare
+    is called before each run, outside of the timing, and returns the
+    argument run is called with.
+    """
+
+    def __init__(self, name, setup, run, prepare=None, quick=True):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.prepare = prepare or (lambda girder, i: None)
+        self.quick = quick
+
+
+def _list_dir(count):
+    def setup(girder):
+        folder = girder.add_folder(girder.user, 'list%d' % count)
+        for i in range(count):
+            name = 'file%05d.txt' % i
+            girder.add_file(girder.add_item(folder, name), name, b'data', 'text/plain')
+
+    return Scenario('list_dir_%d' % count, setup,
+                    lambda manager, _: manager.get('list%d' % count),
+                    quick=count <= 1000)
+
+
+def _open_notebook(label, size):
+    path = 'notebooks/%s.ipynb' % label
+
+    return Scenario('open_notebook_%s' % label,
+                    lambda girder: girder.add_path(path, _notebook(size), 'application/json'),
+                    lambda manager, _: manager.get(path),
+                    quick=size <= MB)
+
+
+def _save():
+    return Scenario('save_file', lambda girder: girder.add_path('save/file.txt', b'0'),
+                    lambda manager, i: manager.save(_model('%d' % i), 'save/file.txt'),
+                    prepare=lambda girder, i: i + 1)
+
+
+def _rename():
+    def prepare(girder, i):
+        girder.add_path('rename/a%d.txt' % i, b'data')
+        return i
+
+    return Scenario('rename_file', lambda girder: None,
+                    lambda manager, i: manager.rename('rename/a%d.txt' % i,
+                                                      'rename/b%d.txt' % i),
+                    prepare=prepare)
+
+
+def _delete():
+    def prepare(girder, i):
+        girder.add_path('delete/a%d.txt' % i, b'data')
+        return i
+
+    return Scenario('delete_file', lambda girder: None,
+                    lambda manager, i: manager.delete('delete/a%d.txt' % i),
+                    prepare=prepare)
+
+
+SCENARIOS = [
+    _list_dir(10),
+    _list_dir(1000),
+    _list_dir(10000),
+    _open_notebook('1KB', KB),
+    _open_notebook('1MB', MB),
+    _open_notebook('10MB', 10 * MB),
+    _open_notebook('100MB', 100 * MB),
+    _save(),
+    _rename(),
+    _delete()
+]
+
+
+def _manager(girder):
+    # A new manager for each run, so every run starts with cold caches.
+    return GirderContentsManager(api_url=girder.api_url, token='token',
+                                 root='user/%s' % girder.user['login'])
+
+
+def run_scenario(girder, scenario, repeat):
+    """
+    Run a scenario repeat times, returns the best wall time in seconds and
+    the requests made by the first run.
+    """
+    scenario.setup(girder)
+    times = []
+    requests = None
+    for i in range(repeat):
+        arg = scenario.prepare(girder, i)
+        manager = _manager(girder)
+        girder.reset_requests()
+        start = time.time()
+        scenario.run(manager, arg)
+        times.append(time.time() - start)
+        if requests is None:
+            requests = dict(girder.requests)
+
+    return min(times), requests
+
+
+def compare(name, requests, baseline):
+    """
+    The regressions in the requests made by a scenario compared with its
+    baseline, as a list of messages, and whether it makes fewer requests.
+    """
+    regressions = []
+    for route in sorted(set(requests) | set(baseline)):
+        count, expected = requests.get(route, 0), baseline.get(route, 0)
+        if count > expected:
+            regressions.append('%s: %d %s requests, the baseline is %d' %
+                               (name, count, route, expected))
+
+    return regressions, sum(requests.values()) < sum(baseline.values())
+
+
+def _load_baselines():
+    if not os.path.exists(BASELINES):
+        return {}
+
+    with open(BASELINES) as f:
+        return json.load(f)
+
+
+def _save_baselines(baselines):
+    with open(BASELINES, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--quick', action='store_true',
+                        help='Skip the 10k entry listing and notebooks over 1MB.')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Milliseconds of latency added to each Girder request.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs of each scenario, the best time is reported.')
+    parser.add_argument('--scenario', action='append',
+                        help='Only run the named scenarios.')
+    parser.add_argument('--update-baselines', action='store_true',
+                        help='Record the request counts as the new baselines.')
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in SCENARIOS
+                 if (s.quick or not args.quick)
+                 and (not args.scenario or s.name in args.scenario)]
+    baselines = _load_baselines()
+    regressions = []
+    improved = []
+
+    print('%-22s %12s %10s' % ('scenario', 'time (ms)', 'requests'))
+    with FakeGirder(login='bench', latency=args.latency / 1000.0) as girder:
+        for scenario in scenarios:
+            seconds, requests = run_scenario(girder, scenario, args.repeat)
+            print('%-22s %12.1f %10d' % (scenario.name, seconds * 1000,
+                                         sum(requests.values())))
+            for route, count in sorted(requests.items()):
+                print('    %-30s %6d' % (route, count))
+
+            if args.update_baselines:
+                baselines[scenario.name] = requests
+            elif scenario.name in baselines:
+                failed, fewer = compare(scenario.name, requests, baselines[scenario.name])
+                regressions.extend(failed)
+                if fewer and not failed:
+                    improved.append(scenario.name)
+
+    if args.update_baselines:
+        _save_baselines(baselines)
+        print('Baselines written to %s' % BASELINES)
+        return 0
+
+    if improved:
+        print('\nFewer requests than the baseline for %s, record them with '
+              '--update-baselines.' % ', '.join(improved))
+
+    if regressions:
+        print('\nREQUEST COUNT REGRESSIONS:', file=sys.stderr)
+        for regression in regressions:
+            print('    ' + regression, file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
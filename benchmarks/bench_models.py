@@ -0,0 +1,59 @@
+"""
+Time building the contents models of a listing of 10k resources, parsing
+timestamps with dateutil and with the fast path in girder_jupyter.
+
+    pip install -e . && python benchmarks/bench_models.py
+"""
+import datetime
+import timeit
+
+import dateutil.parser
+import girder_client
+import mock
+
+from girder_jupyter.contents.manager import GirderContentsManager
+from girder_jupyter.contents import timestamps
+
+COUNT = 10000
+REPEAT = 5
+
+
+def _resources(count):
+    start = datetime.datetime(2018, 1, 1)
+    resources = []
+    for i in range(count):
+        # Distinct timestamps, so memoization doesn't flatter the results.
+        timestamp = (start + datetime.timedelta(seconds=i)).isoformat() + '.123000+00:00'
+        resources.append({
+            '_id': str(i),
+            '_modelType': 'item',
+            'name': 'item%d' % i,
+            'created': timestamp,
+            'updated': timestamp
+        })
+
+    return resources
+
+
+def _build(manager, resources):
+    for resource in resources:
+        manager._new_model('dir/%s' % resource['name'], resource, True)
+
+
+def main():
+    manager = GirderContentsManager(gc=mock.Mock(spec=girder_client.GirderClient),
+                                    root='user/test')
+    resources = _resources(COUNT)
+
+    def fast_path(timestamp):
+        return timestamps.parse_timestamp(timestamp)
+
+    for name, parse in (('dateutil', dateutil.parser.parse), ('fast path', fast_path)):
+        manager._parse_timestamp = parse
+        best = min(timeit.repeat(lambda: _build(manager, resources), number=1,
+                                 repeat=REPEAT, setup=timestamps._memo.clear))
+        print('%-10s %8.2fms for %d models' % (name, best * 1000, COUNT))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Time what the contents manager adds to the notebook server starting: importing
+it, constructing it with a {login} root, and answering the first listing of
+the root and opening a folder in it, cold and prewarmed, against a fake Girder with added latency.
+
+    pip install -e . && python benchmarks/bench_startup.py [--latency MS]
+
+The run fails if importing the manager imports girder_client or requests, or
+if constructing it waits on Girder.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from girder_jupyter.contents.manager import GirderContentsManager
+from girder_jupyter.testing import FakeGirder
+
+# Imported where they are first used, not when the manager is.
+DEFERRED = ('girder_client', 'requests')
+
+# Run in a fresh interpreter, after what the notebook server imports anyway.
+IMPORT_SCRIPT = """
+import json, sys, time
+import notebook.notebookapp
+before = set(sys.modules)
+start = time.time()
+import girder_jupyter.contents.manager
+seconds = time.time() - start
+modules = sorted(set(name.split('.')[0] for name in set(sys.modules) - before))
+print(json.dumps({'seconds': seconds, 'modules': modules}))
+"""
+
+# Folders in the root, like a user's Public and Private
+FOLDERS = 20
+
+
+def time_import():
+    """The seconds importing the manager takes, and the packages it imports."""
+    output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT])
+    result = json.loads(output.decode('utf8').strip().splitlines()[-1])
+
+    return result['seconds'], result['modules']
+
+
+def _setup(girder):
+    for i in range(FOLDERS):
+        girder.add_path('folder%02d/notebook.ipynb' % i, b'{}', 'application/json')
+
+
+def time_startup(girder, prewarm, settle):
+    """
+    Construct a manager, then list its root and open a folder in it settle
+    seconds later, as the first request reaches a server some time after it
+    starts. Returns the seconds each took.
+    """
+    start = time.time()
+    manager = GirderContentsManager(api_url=girder.api_url, token='token',
+                                    root='user/{login}', prewarm=prewarm,
+                                    resource_cache_ttl=60)
+    init = time.time() - start
+
+    time.sleep(settle)
+    start = time.time()
+    manager.get('')
+    listing = time.time() - start
+
+    start = time.time()
+    manager.get('folder01')
+
+    return init, listing, time.time() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--latency', type=float, default=50.0,
+                        help='Milliseconds of latency added to each Girder request.')
+    parser.add_argument('--settle', type=float, default=1.0,
+                        help='Seconds between constructing the manager and listing its root.')
+    args = parser.parse_args(argv)
+    latency = args.latency / 1000.0
+    failures = []
+
+    seconds, modules = time_import()
+    print('%-28s %10.1f ms' % ('import', seconds * 1000))
+    deferred = [name for name in DEFERRED if name in modules]
+    if deferred:
+        failures.append('Importing the manager imports %s' % ', '.join(deferred))
+
+    with FakeGirder(login='bench', latency=latency) as girder:
+        _setup(girder)
+        # The first manager pays for setting up its traits and config, which
+        # doesn't involve Girder.
+        start = time.time()
+        GirderContentsManager(api_url=girder.api_url, token='token', root='user/bench')
+        print('%-28s %10.1f ms' % ('construct (first)', (time.time() - start) * 1000))
+
+        for prewarm in (False, True):
+            init, listing, folder = time_startup(girder, prewarm, args.settle)
+            label = 'prewarmed' if prewarm else 'cold'
+            print('%-28s %10.1f ms' % ('construct (%s)' % label, init * 1000))
+            print('%-28s %10.1f ms' % ('first root listing (%s)' % label, listing * 1000))
+            print('%-28s %10.1f ms' % ('first folder (%s)' % label, folder * 1000))
+            if latency and init >= latency:
+                failures.append('Constructing the manager waited on Girder (%.1fms)'
+                                % (init * 1000))
+
+    if failures:
+        print('\nSTARTUP REGRESSIONS:', file=sys.stderr)
+        for failure in failures:
+            print('    ' + failure, file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,390 @@
+import json
+import mimetypes
+
+from tornado import locks, queues
+from tornado.httpclient import HTTPClientError, HTTPRequest
+from tornado.httputil import url_concat
+from tornado.simple_httpclient import _HTTPConnection, SimpleAsyncHTTPClient
+
+import girder_client
+
+from . import metrics
+
+
+class StreamedResponse(object):
+    """
+    The body of a streamed response, read a chunk at a time. Chunks are queued
+    as they arrive, at most queue_size of them, then no more of the body is
+    read from Girder until some are. The body of an error response is held
+    back to be raised as a girder_client.HttpError instead.
+    """
+
+    def __init__(self, url, method, path=None, queue_size=16):
+        self.url = url
+        self.method = method
+        self.path = path
+        self.code = None
+        self.received = 0
+        self.finished = False
+        self._chunks = queues.Queue(maxsize=queue_size)
+        self._error_body = []
+        self._closed = False
+
+    def _header(self, line):
+        # Each response followed by a redirect starts with its own status line.
+        if line.startswith('HTTP/'):
+            self.code = int(line.split(' ', 2)[1])
+
+    def _chunk(self, chunk):
+        self.received += len(chunk)
+        if self.code is not None and self.code >= 400:
+            self._error_body.append(chunk)
+            return None
+
+        # False aborts the request, a future is waited on before reading more.
+        if self._closed:
+            return False
+        try:
+            self._chunks.put_nowait(chunk)
+        except queues.QueueFull:
+            return self._put(chunk)
+
+        return None
+
+    async def _put(self, chunk):
+        await self._chunks.put(chunk)
+
+        return not self._closed
+
+    def _done(self, future):
+        self.finished = True
+        try:
+            response = future.result()
+        except Exception as e:  # noqa: B902
+            self._end(e)
+            return
+
+        metrics.girder_request(self.method, self.path or self.url, response.code,
+                               response.request_time or 0, received=self.received)
+        if response.code == 599:
+            self._end(response.error)
+        elif response.code >= 400:
+            self._end(girder_client.HttpError(
+                status=response.code,
+                text=b''.join(self._error_body).decode('utf8', 'replace'),
+                url=self.url, method=self.method))
+        else:
+            self._end(b'')
+
+    def _end(self, value):
+        # Queued behind the chunks still to be read, however many there are.
+        if not self._closed:
+            self._chunks.put(value)
+
+    async def read(self):
+        """The next chunk of the body, b'' at the end."""
+        chunk = await self._chunks.get()
+        if isinstance(chunk, Exception):
+            raise chunk
+
+        return chunk
+
+    def close(self):
+        """
+        Stop reading the body, the request to Girder is aborted rather than run
+        to completion.
+        """
+        self._closed = True
+        # Unblock a chunk waiting for room in the queue, it then aborts the request.
+        while True:
+            try:
+                self._chunks.get_nowait()
+            except queues.QueueEmpty:
+                break
+
+
+class _StreamingConnection(_HTTPConnection):
+    """
+    Tornado ignores what a request's streaming_callback returns. This waits on
+    an awaitable it returns before reading more of the body, so a slow reader
+    of a StreamedResponse holds back the download, and closes the connection
+    when it returns (or resolves to) False.
+    """
+
+    def data_received(self, chunk):
+        if self.request.streaming_callback is None or self._should_follow_redirect():
+            return super(_StreamingConnection, self).data_received(chunk)
+
+        result = self.request.streaming_callback(chunk)
+        if result is False:
+            self._abort()
+        elif result is not None:
+            return self._wait(result)
+
+        return None
+
+    async def _wait(self, result):
+        if await result is False:
+            self._abort()
+
+    def _abort(self):
+        # Reading the rest of the body then fails, finishing the request.
+        self.stream.close()
+
+
+class _HTTPClient(SimpleAsyncHTTPClient):
+
+    def _connection_class(self):
+        return _StreamingConnection
+
+
+class AsyncGirderClient(object):
+    """
+    A minimal, non-blocking, Girder REST client built on tornado's
+    AsyncHTTPClient. It mirrors the subset of the girder_client.GirderClient
+    API used by the contents manager, with each method being a coroutine.
+    Errors are reported by raising girder_client.HttpError so callers can
+    handle both clients the same way.
+    """
+
+    MAX_CHUNK_SIZE = girder_client.GirderClient.MAX_CHUNK_SIZE
+    # Tornado rejects response bodies over 100MB by default, Girder's files
+    # can be much larger than that.
+    MAX_BODY_SIZE = 1024 ** 4
+
+    def __init__(self, api_url, token=None, api_key=None, max_clients=10,
+                 connect_timeout=None, read_timeout=None, max_body_size=None):
+        self.urlBase = api_url.rstrip('/') + '/'
+        self.token = token
+        self.api_key = api_key
+        self.max_clients = max_clients
+        self.max_body_size = max_body_size or self.MAX_BODY_SIZE
+        self.connect_timeout = connect_timeout or None
+        self.read_timeout = read_timeout or None
+        self._http_client = None
+        self._auth_lock = locks.Lock()
+
+    @property
+    def http_client(self):
+        # Created lazily so we pick up the IOLoop we are actually running on.
+        if self._http_client is None:
+            self._http_client = _HTTPClient(force_instance=True, max_clients=self.max_clients,
+                                            max_body_size=self.max_body_size)
+
+        return self._http_client
+
+    async def authenticate(self, apiKey):
+        self.api_key = apiKey
+        resp = await self.post('api_key/token', {'key': apiKey}, authenticate=False)
+        self.token = resp['authToken']['token']
+
+    async def _ensure_token(self):
+        if self.api_key is None or self.token:
+            return
+
+        async with self._auth_lock:
+            if not self.token:
+                await self.authenticate(self.api_key)
+
+    async def sendRestRequest(self, method, path, parameters=None, body=None,
+                              headers=None, jsonResp=True, authenticate=True):
+        if authenticate:
+            await self._ensure_token()
+
+        params = {k: v for k, v in (parameters or {}).items() if v is not None}
+        url = url_concat(self.urlBase + path, params)
+
+        _headers = {}
+        if self.token is not None:
+            _headers['Girder-Token'] = self.token
+        if isinstance(headers, dict):
+            _headers.update(headers)
+
+        if body is None and method in ('POST', 'PUT'):
+            body = b''
+
+        request = HTTPRequest(url, method=method, headers=_headers, body=body,
+                              connect_timeout=self.connect_timeout,
+                              request_timeout=self.read_timeout,
+                              allow_nonstandard_methods=True)
+        response = await self.http_client.fetch(request, raise_error=False)
+        metrics.girder_request(method, path, response.code, response.request_time or 0,
+                               sent=len(body or b''), received=len(response.body or b''))
+
+        # Connection level failures have no HTTP status to report.
+        if response.code == 599:
+            raise response.error
+
+        if response.code >= 400:
+            raise girder_client.HttpError(
+                status=response.code, text=response.body.decode('utf8', 'replace'),
+                url=url, method=method)
+
+        if jsonResp:
+            return json.loads(response.body.decode('utf8'))
+
+        return response.body
+
+    async def get(self, path, parameters=None, jsonResp=True):
+        return await self.sendRestRequest('GET', path, parameters, jsonResp=jsonResp)
+
+    async def stream(self, path, parameters=None):
+        """
+        Start a GET whose body is streamed, returns a StreamedResponse to read it
+        from.
+        """
+        await self._ensure_token()
+
+        params = {k: v for k, v in (parameters or {}).items() if v is not None}
+        url = url_concat(self.urlBase + path, params)
+        headers = {}
+        if self.token is not None:
+            headers['Girder-Token'] = self.token
+
+        response = StreamedResponse(url, 'GET', path)
+        # A large body can take much longer than read_timeout to arrive, so the
+        # request as a whole is not timed out.
+        request = HTTPRequest(url, method='GET', headers=headers,
+                              connect_timeout=self.connect_timeout,
+                              request_timeout=0,
+                              header_callback=response._header,
+                              streaming_callback=response._chunk)
+        self.http_client.fetch(request, raise_error=False).add_done_callback(response._done)
+
+        return response
+
+    async def post(self, path, parameters=None, body=None, authenticate=True):
+        return await self.sendRestRequest('POST', path, parameters, body=body,
+                                          authenticate=authenticate)
+
+    async def put(self, path, parameters=None, body=None):
+        return await self.sendRestRequest('PUT', path, parameters, body=body)
+
+    async def delete(self, path, parameters=None):
+        return await self.sendRestRequest('DELETE', path, parameters)
+
+    async def resourceLookup(self, path):
+        return await self.get('resource/lookup', {'path': path})
+
+    async def getFolder(self, folderId):
+        return await self.get('folder/%s' % folderId)
+
+    async def getItem(self, itemId):
+        return await self.get('item/%s' % itemId)
+
+    async def listFile(self, itemId):
+        return await self.get('item/%s/files' % itemId, {'limit': 0})
+
+    async def listFolder(self, parentId, parentFolderType='folder', name=None):
+        return await self.get('folder', {
+            'parentId': parentId,
+            'parentType': parentFolderType,
+            'name': name,
+            'limit': 0
+        })
+
+    async def listItem(self, folderId, name=None):
+        return await self.get('item', {
+            'folderId': folderId,
+            'name': name,
+            'limit': 0
+        })
+
+    async def createFolder(self, parentId, name, parentType='folder', reuseExisting=False):
+        return await self.post('folder', {
+            'parentId': parentId,
+            'parentType': parentType,
+            'name': name,
+            'reuseExisting': 'true' if reuseExisting else None
+        })
+
+    async def loadOrCreateItem(self, name, parentFolderId):
+        return await self.post('item', {
+            'folderId': parentFolderId,
+            'name': name,
+            'reuseExisting': 'true'
+        })
+
+    async def downloadFile(self, fileId, size=None):
+        """
+        Download a file, returns its contents. The body is streamed rather than
+        buffered by the HTTP client, into a single buffer allocated up front if
+        the file's size is given.
+        """
+        response = await self.stream('file/%s/download' % fileId)
+        try:
+            if size is None:
+                chunks = []
+                chunk = await response.read()
+                while chunk:
+                    chunks.append(chunk)
+                    chunk = await response.read()
+                return b''.join(chunks)
+
+            data = bytearray(size)
+            view = memoryview(data)
+            offset = 0
+            chunk = await response.read()
+            while chunk:
+                end = offset + len(chunk)
+                if end > size:
+                    raise girder_client.IncompleteResponseError(
+                        'Girder sent more data than expected for file %s' % fileId, size, end)
+                view[offset:end] = chunk
+                offset = end
+                chunk = await response.read()
+            del view
+        finally:
+            response.close()
+
+        if offset != size:
+            raise girder_client.IncompleteResponseError(
+                'Incomplete download of file %s' % fileId, size, offset)
+
+        return data
+
+    async def _uploadContents(self, upload, stream, size, chunkSize=None, maxRetries=3):
+        """
+        Send the contents of stream one chunk at a time, resuming from the
+        offset Girder has acknowledged if sending a chunk fails.
+        """
+        chunk_size = chunkSize or self.MAX_CHUNK_SIZE
+        upload_id = upload['_id']
+        offset = 0
+        retries = 0
+        while offset < size:
+            stream.seek(offset)
+            chunk = stream.read(min(chunk_size, size - offset))
+            try:
+                upload = await self.post('file/chunk', {
+                    'offset': offset,
+                    'uploadId': upload_id
+                }, body=chunk)
+            except (girder_client.HttpError, HTTPClientError, IOError):
+                if retries >= maxRetries:
+                    raise
+                retries += 1
+                offset = (await self.get('file/offset', {'uploadId': upload_id}))['offset']
+                continue
+
+            offset += len(chunk)
+            retries = 0
+
+        return upload
+
+    async def uploadFile(self, parentId, stream, name, size, parentType='item',
+                         mimeType=None, chunkSize=None):
+        upload = await self.post('file', {
+            'parentType': parentType,
+            'parentId': parentId,
+            'name': name,
+            'size': size,
+            'mimeType': mimeType or mimetypes.guess_type(name)[0]
+        })
+
+        return await self._uploadContents(upload, stream, size, chunkSize)
+
+    async def uploadFileContents(self, fileId, stream, size, chunkSize=None):
+        upload = await self.put('file/%s/contents' % fileId, {'size': size})
+
+        return await self._uploadContents(upload, stream, size, chunkSize)
@@ -0,0 +1,924 @@
+import functools
+import itertools
+import json
+import os
+import time
+
+from nbformat.v4 import new_notebook
+from notebook.services.contents.manager import copy_pat
+
+from traitlets import default, Instance, Integer
+
+from notebook.services.contents.checkpoints import GenericCheckpointsMixin
+
+from tornado import gen, locks, web
+from tornado.ioloop import IOLoop
+
+from . import metrics, tracing
+from .manager import GirderContentsManager
+
+
+def _operation(name):
+    """The coroutine version of metrics.operation."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            with metrics.track(name, self):
+                return await func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _traced(func):
+    """The coroutine version of tracing.traced."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with tracing.span(func.__name__):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+class AsyncGirderContentsManager(GirderContentsManager):
+    """
+    A GirderContentsManager whose contents API methods are coroutines. Girder
+    is accessed using a non-blocking HTTP client, so a slow Girder response
+    no longer stalls the server's event loop, and independent requests (items
+    and folders of a listing, the children of a directory) are made
+    concurrently. Requires Python 3.
+    """
+
+    max_concurrent_requests = Integer(
+        config=True,
+        help='The maximum number of concurrent requests made to Girder.',
+        default_value=10
+    )
+
+    async_gc = Instance('girder_jupyter.contents.async_client.AsyncGirderClient')
+
+    @default('async_gc')
+    def _async_gc(self):
+        from .async_client import AsyncGirderClient
+
+        # As with the sync client, an API key takes precedence over a token.
+        token = self.token or None if self.api_key is None else None
+
+        return AsyncGirderClient(self.api_url, token=token, api_key=self.api_key,
+                                 max_clients=self.max_concurrent_requests,
+                                 connect_timeout=self.connect_timeout,
+                                 read_timeout=self.read_timeout)
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncGirderContentsManager, self).__init__(*args, **kwargs)
+        # Folders are resolved on the event loop, which a threading lock would block.
+        self._folders_lock = locks.Lock()
+
+    def _create_save_queue(self):
+        if self.write_behind:
+            self.log.warning('write_behind is not supported by AsyncGirderContentsManager, '
+                             'saves are uploaded directly.')
+
+        return None
+
+    @_traced
+    async def _resource(self, path):
+        resource = self.resource_cache.get(path)
+        if resource is not None:
+            return resource
+
+        import girder_client
+
+        try:
+            resource = await self.async_gc.resourceLookup(path)
+        except girder_client.HttpError:
+            return None
+
+        self.resource_cache.set(path, resource)
+
+        return resource
+
+    async def _resource_exists(self, path, model_type):
+        resource = await self._resource(path)
+
+        return self._is_type(resource, model_type)
+
+    async def _file(self, path):
+        resource = await self._resource(path)
+
+        name = path.split('/')[-1]
+
+        if self._is_item(resource):
+            return await self._file_by_name(resource['_id'], name)
+
+        return None
+
+    async def _file_by_name(self, item_id, name, files=None):
+        for file in await self._item_files(item_id, files):
+            if file['name'] == name:
+                return file
+
+        return None
+
+    @_traced
+    async def _item_files(self, item_id, files=None):
+        if files is None:
+            files = {}
+
+        if item_id not in files:
+            files[item_id] = await self.async_gc.listFile(item_id)
+
+        return files[item_id]
+
+    @_traced
+    async def _prefetch_item_files(self, item_ids, files):
+        item_ids = [item_id for item_id in item_ids if item_id not in files]
+        # Requests beyond the client's max_clients wait in its queue, where they
+        # can time out, so no more than that are started at once.
+        semaphore = locks.Semaphore(max(1, self.max_concurrent_requests))
+
+        async def list_files(item_id):
+            async with semaphore:
+                return await self.async_gc.listFile(item_id)
+
+        listings = await gen.multi([list_files(item_id) for item_id in item_ids])
+        files.update(zip(item_ids, listings))
+
+    async def _list_pages(self, path, params, page_size):
+        async def fetch(offset):
+            page_params = dict(params, limit=page_size, offset=offset)
+            return await self.async_gc.get(path, page_params)
+
+        if page_size <= 0:
+            return await fetch(0)
+
+        concurrency = max(1, self.list_concurrency)
+        listing = []
+        offset = 0
+        while True:
+            pages = await gen.multi([fetch(offset + i * page_size)
+                                     for i in range(concurrency)])
+            offset += concurrency * page_size
+            for page in pages:
+                listing += page
+                if len(page) < page_size:
+                    return listing
+
+    @_traced
+    async def _list_resource(self, resource, page_size=None):
+        if page_size is None:
+            page_size = self.list_page_size
+
+        listings = []
+        if self._is_folder(resource):
+            params = {
+                'folderId': resource['_id']
+            }
+
+            listings.append(self._list_pages('item', params, page_size))
+
+        params = {
+            'parentId': resource['_id'],
+            'parentType': resource['_modelType']
+        }
+
+        listings.append(self._list_pages('folder', params, page_size))
+
+        return [doc for listing in await gen.multi(listings) for doc in listing]
+
+    async def _is_empty(self, resource):
+        """
+        Does a folder have no items or folders in it? Only the first of either
+        is requested, items first, as the sync listing would.
+        """
+        items = await self.async_gc.get('item', {'folderId': resource['_id'], 'limit': 1})
+        if items:
+            return False
+
+        folders = await self.async_gc.get('folder', {
+            'parentId': resource['_id'],
+            'parentType': resource['_modelType'],
+            'limit': 1
+        })
+
+        return not folders
+
+    @_operation('dir_exists')
+    async def dir_exists(self, path):
+        path = path.strip('/')
+        girder_path = self._get_girder_path(path)
+
+        return await self._resource_exists(girder_path, ['folder', 'item', 'user'])
+
+    @_operation('file_exists')
+    async def file_exists(self, path=''):
+        path = path.strip('/')
+        girder_path = self._get_girder_path(path)
+
+        return await self._file(girder_path) is not None
+
+    async def exists(self, path):
+        return await self.file_exists(path) or await self.dir_exists(path)
+
+    @_traced
+    async def _has_write_access(self, resource, access=None):
+        if access is None:
+            access = {}
+
+        if resource['_id'] in access:
+            return access[resource['_id']]
+
+        if self._is_folder(resource) or self._is_user(resource):
+            writable = resource['_accessLevel'] > 0
+        elif self._is_item(resource):
+            writable = access.get(resource['folderId'])
+            if writable is None:
+                folder = await self.async_gc.getFolder(resource['folderId'])
+                writable = await self._has_write_access(folder, access)
+        elif self._is_file(resource):
+            writable = access.get(resource['itemId'])
+            if writable is None:
+                item = await self.async_gc.getItem(resource['itemId'])
+                writable = await self._has_write_access(item, access)
+        else:
+            raise Exception('Unexpected resource type: %s' % resource['_modelType'])
+
+        access[resource['_id']] = writable
+
+        return writable
+
+    async def _base_model(self, path, resource, access=None):
+        writable = await self._has_write_access(resource, access)
+
+        return self._new_model(path, resource, writable)
+
+    @_traced
+    async def _dir_model(self, path, resource, content=True, format=None, access=None,
+                         files=None):
+        if access is None:
+            access = {}
+        if files is None:
+            files = {}
+        model = await self._base_model(path, resource, access)
+        model['type'] = 'directory'
+        if content:
+            children = [child for child in await self._list_resource(resource)
+                        if self.should_list(child['name']) and not child['name'].startswith('.')]
+            await self._prefetch_item_files(
+                [child['_id'] for child in children if self._is_item(child)], files)
+
+            model['content'] = await gen.multi([
+                self._get('%s/%s' % (path, child['name']), child,
+                          content=False, format=format, access=access, files=files)
+                for child in children
+            ])
+            model['format'] = 'json'
+
+        return model
+
+    @_traced
+    async def _download(self, girder_path, file):
+        self._check_inline_size(girder_path, file)
+        tracing.annotate(size=file.get('size'))
+
+        data = self._read_assetstore(file)
+        if data is not None:
+            tracing.annotate(source='assetstore')
+            return data
+
+        if self.blob_cache is not None:
+            data = self.blob_cache.get(file)
+            if data is not None:
+                tracing.annotate(source='blob_cache')
+                return data
+
+        tracing.annotate(source='girder')
+        import girder_client
+
+        try:
+            data = await self.async_gc.downloadFile(file['_id'], file.get('size'))
+        except girder_client.IncompleteResponseError as e:
+            raise web.HTTPError(502, 'Failed to download %s: %s' % (girder_path, e))
+
+        if self.blob_cache is not None:
+            self.blob_cache.put(file, [data])
+
+        return data
+
+    async def _fetch_range(self, file, offset, end):
+        data = self._read_assetstore_range(file, offset, end)
+        if data is None:
+            data = await self.async_gc.get('file/%s/download' % file['_id'],
+                                           parameters={'offset': offset, 'endByte': end},
+                                           jsonResp=False)
+
+        return data
+
+    async def _open_range(self, file, offset, end, chunk_size):
+        stream = self._open_local_range(file, offset, end, chunk_size)
+        if stream is not None:
+            return stream
+
+        return await self.async_gc.stream('file/%s/download' % file['_id'],
+                                          {'offset': offset, 'endByte': end})
+
+    async def _directory(self, path):
+        girder_path = self._get_girder_path(path)
+        resource = await self._resource(girder_path)
+        if self._is_item(resource):
+            files = await self._item_files(resource['_id'])
+            if self._container_file(path.split('/')[-1], files) is not None:
+                resource = None
+        if not self._is_type(resource, ['item', 'folder', 'user']):
+            raise web.HTTPError(404, 'No such directory: %s' % girder_path)
+
+        return resource
+
+    async def _zip_request(self, resource):
+        if self._is_folder(resource):
+            return 'folder/%s/download' % resource['_id'], None
+        if self._is_item(resource):
+            return 'item/%s/download' % resource['_id'], {'format': 'zip'}
+
+        folders = [child['_id'] for child in await self._list_resource(resource)]
+
+        return 'resource/download', {'resources': json.dumps({'folder': folders})}
+
+    async def _open_zip(self, path):
+        endpoint, parameters = await self._zip_request(await self._directory(path.strip('/')))
+
+        return await self.async_gc.stream(endpoint, parameters)
+
+    async def _archive_entries(self, path, names=None):
+        path = path.strip('/')
+        files = {}
+        if not names:
+            return [entry for entry in await self._walk_tree(await self._directory(path), files)
+                    if entry[0]]
+
+        entries = []
+        for name in names:
+            name = self._archive_name(name)
+            girder_path = self._get_girder_path(self._join(path, name))
+            resource = await self._resource(girder_path)
+            file = None
+            if self._is_item(resource):
+                file = self._container_file(name.split('/')[-1],
+                                            await self._item_files(resource['_id'], files))
+            if file is not None:
+                entries.append((name, file))
+            elif self._is_type(resource, ['item', 'folder', 'user']):
+                entries.extend(await self._walk_tree(resource, files, name))
+            else:
+                raise web.HTTPError(404, 'No such file or directory: %s' % girder_path)
+
+        return entries
+
+    @_traced
+    async def _file_model(self, path, file, content=True, format=None, access=None):
+        girder_path = self._get_girder_path(path)
+        model = await self._base_model(path, file, access)
+        model['type'] = 'file'
+        model['mimetype'] = file['mimeType']
+
+        if content:
+            data = await self._download(girder_path, file)
+            content, format = self._file_content(girder_path, data, format)
+
+            model.update(
+                content=content,
+                format=format
+            )
+
+        return model
+
+    @_traced
+    async def _item_model(self, path, item, content=True, format=None, access=None,
+                          files=None):
+        if access is None:
+            access = {}
+        name = path.split('/')[-1]
+        item_files = await self._item_files(item['_id'], files)
+        item_file = self._container_file(name, item_files)
+
+        if item_file is not None:
+            await self._has_write_access(item, access)
+            return await self._file_model(path, item_file, content, format, access)
+
+        # Other treat item as read-only directories
+        model = await self._base_model(path, item, access)
+        model['writable'] = False
+        model['type'] = 'directory'
+        if content:
+            model['content'] = await gen.multi([
+                self._get('%s/%s' % (path, file['name']), file,
+                          content=False, format=format, access=access)
+                for file in item_files
+            ])
+            model['format'] = 'json'
+
+        return model
+
+    @_traced
+    async def _notebook_model(self, path, resource, content=True, access=None, files=None):
+        if access is None:
+            access = {}
+        name = path.split('/')[-1]
+        # Shortcut item
+        if self._is_item(resource):
+            await self._has_write_access(resource, access)
+            resource = await self._file_by_name(resource['_id'], name, files)
+
+        model = await self._base_model(path, resource, access)
+        model['type'] = 'notebook'
+
+        if content:
+            cached = self._cached_notebook(path, resource)
+            if cached is None:
+                data = await self._download(self._get_girder_path(path), resource)
+                cached = self._parse_notebook(resource, data)
+            self._set_notebook_content(model, path, *cached)
+
+        return model
+
+    async def _get(self, path, resource, content=True, type=None, format=None, access=None,
+                   files=None):
+        girder_path = self._get_girder_path(path)
+
+        if not self._is_type(resource, ['file', 'item', 'folder', 'user']):
+            raise web.HTTPError(404, 'No such file or directory: %s' % girder_path)
+
+        if type == 'notebook' or (type is None and path.endswith('.ipynb')):
+            model = await self._notebook_model(path, resource, content, access, files)
+        elif self._is_folder(resource) or self._is_user(resource):
+            if type not in (None, 'directory'):
+                raise web.HTTPError(
+                    400, '%s is a directory, not a %s' % (girder_path, type), reason='bad type')
+            model = await self._dir_model(path, resource, content, format, access, files)
+        elif self._is_item(resource):
+            if type not in (None, 'file', 'notebook'):
+                raise web.HTTPError(
+                    400, '%s is a file, not a %s' % (girder_path, type), reason='bad type')
+            model = await self._item_model(path, resource, content, format, access, files)
+        else:
+            if type == 'directory':
+                raise web.HTTPError(
+                    400, '%s is not a directory' % girder_path, reason='bad type')
+            model = await self._file_model(path, resource, content=content, format=format,
+                                           access=access)
+
+        return model
+
+    @_operation('get')
+    async def get(self, path, content=True, type=None, format=None):
+        """Get a file or directory model."""
+        path = path.strip('/')
+        girder_path = self._get_girder_path(path)
+
+        resource = await self._resource(girder_path)
+
+        return await self._get(path, resource, content, type, format)
+
+    async def _upload_to_path(self, content, mime_type, format, path):
+        stream = self._content_stream(content, format)
+        await self._upload_stream_to_path(stream, stream.size, mime_type, path)
+
+    @_traced
+    async def _upload_stream_to_path(self, stream, size, mime_type, path):
+        parts = path.split('/')
+        name = parts[-1]
+        folder_path = parts[:-1]
+
+        parent = self._upload_parent(await self._create_folders('/'.join(folder_path)))
+
+        if self._is_item(parent):
+            item = parent
+        else:
+            item = await self.async_gc.loadOrCreateItem(name, parent['_id'])
+
+        file = await self._file_by_name(item['_id'], name)
+
+        if file is not None and self._unchanged(file, stream, size):
+            self.log.debug('Skipping upload of unchanged file: %s', path)
+            self._cache_upload(file, stream)
+            return
+
+        if file is None:
+            file = await self.async_gc.uploadFile(item['_id'], stream, name, size,
+                                                  mimeType=mime_type,
+                                                  chunkSize=self.upload_chunk_size)
+        else:
+            file = await self.async_gc.uploadFileContents(file['_id'], stream, size,
+                                                          chunkSize=self.upload_chunk_size)
+        self._cache_upload(file, stream)
+
+        self.resource_cache.invalidate(path)
+
+    @_traced
+    async def _create_folders(self, path):
+        parts = path.split('/')
+        async with self._folders_lock:
+            depth, current_resource = await self._deepest_resource(parts)
+
+            for depth in range(depth + 1, len(parts) + 1):
+                resource_name = parts[depth - 1]
+                # Can't create folder under an item so return permission denied
+                if self._is_item(current_resource):
+                    raise web.HTTPError(403, 'Permission denied: %s' % resource_name)
+
+                current_resource = await self.async_gc.createFolder(
+                    current_resource['_id'], resource_name,
+                    parentType=current_resource['_modelType'], reuseExisting=True)
+                self.resource_cache.set('/'.join(parts[:depth]), current_resource)
+
+        return current_resource
+
+    async def _deepest_resource(self, parts):
+        for depth in range(len(parts), 1, -1):
+            resource = await self._resource('/'.join(parts[:depth]))
+            if resource is not None:
+                return depth, resource
+
+        raise web.HTTPError(404, 'No such file or directory: %s' % '/'.join(parts[:2]))
+
+    @_operation('save')
+    async def save(self, model, path):
+        """
+        Save a file or directory model to path.
+        Should return the saved model with no content.
+        """
+        path = path.strip('/')
+        girder_path = self._get_girder_path(path)
+
+        self._check_save(model, path)
+
+        try:
+            if model.get('chunk') is not None:
+                spooled = self._spool_chunk(model, path)
+                if spooled is None:
+                    return self._spooled_model(path)
+                spool, size = spooled
+                with spool:
+                    await self._upload_stream_to_path(spool, size, model.get('mimetype'),
+                                                      girder_path)
+            elif model['type'] == 'notebook':
+                nb = self._serialize_notebook(model, path)
+                await self._upload_to_path(nb, 'application/json', 'text', girder_path)
+            elif model['type'] == 'file':
+                await self._upload_to_path(model.get('content'), model.get('mimetype'),
+                                           model.get('format'), girder_path)
+            elif model['type'] == 'directory':
+                await self._create_folders(girder_path)
+            else:
+                raise web.HTTPError(400, 'Unhandled contents type: %s' % model['type'])
+        except web.HTTPError:
+            raise
+        except Exception as e:  # noqa: B902
+            self._discard_spool(path)
+            self.log.error('Error while saving file: %s %s', path, e, exc_info=True)
+            raise web.HTTPError(500, 'Unexpected error while saving file: %s %s' % (path, e))
+
+        validation_message = None
+        if model['type'] == 'notebook':
+            self.validate_notebook_model(model)
+        validation_message = model.get('message', None)
+
+        model = await self.get(path, content=False)
+        model['message'] = validation_message
+
+        return model
+
+    @_operation('delete_file')
+    async def delete_file(self, path, allow_non_empty=False):
+        """Delete the file or directory at path."""
+        path = path.strip('/')
+        girder_path = self._get_girder_path(path)
+        resource = await self._resource(girder_path)
+        if resource is None:
+            raise web.HTTPError(404, 'Path does not exist: %s' % girder_path)
+
+        if self._is_folder(resource):
+            if not allow_non_empty and not await self._is_empty(resource):
+                raise web.HTTPError(400, 'Directory %s not empty' % girder_path)
+
+            await self.async_gc.delete('folder/%s' % resource['_id'])
+            self.resource_cache.invalidate(girder_path, recursive=True)
+        else:
+            name = path.split('/')[-1]
+            files = await self.async_gc.listFile(resource['_id'])
+            matching = [file for file in files if file['name'] == name]
+
+            if not matching:
+                raise web.HTTPError(404, 'File does not exist: %s' % girder_path)
+
+            await gen.multi([self.async_gc.delete('file/%s' % file['_id'])
+                             for file in matching])
+            await self.async_gc.delete('item/%s' % resource['_id'])
+
+            self.resource_cache.invalidate(girder_path)
+
+    @_operation('rename_file')
+    async def rename_file(self, old_path, new_path):
+        """Rename or move a file or directory."""
+        old_path = old_path.strip('/')
+        new_path = new_path.strip('/')
+        if new_path == old_path:
+            return
+        self._check_rename(old_path, new_path)
+
+        girder_path = self._get_girder_path(old_path)
+        new_girder_path = self._get_girder_path(new_path)
+        lookups = [
+            self._resource(girder_path),
+            self._resource(new_girder_path)
+        ]
+        moved = os.path.dirname(old_path) != os.path.dirname(new_path)
+        if moved:
+            parent_path = self._get_girder_path(os.path.dirname(new_path))
+            lookups.append(self._resource(parent_path))
+        resources = await gen.multi(lookups)
+        resource, existing_resource = resources[:2]
+        parent = resources[2] if moved else None
+        if resource is None:
+            raise web.HTTPError(404, 'Path does not exist: %s' % girder_path)
+
+        if existing_resource is not None:
+            raise web.HTTPError(409, u'File already exists: %s' % new_path)
+
+        if moved and parent is None:
+            raise web.HTTPError(404, 'No such directory: %s' % parent_path)
+
+        name = os.path.basename(new_path)
+        type, params = self._rename_params(resource, name, parent)
+
+        item_file = None
+        if self._is_item(resource) and name != resource['name']:
+            item_file = self._container_file(resource['name'],
+                                             await self.async_gc.listFile(resource['_id']))
+
+        await self.async_gc.put('%s/%s' % (type, resource['_id']), params)
+        if item_file is not None:
+            await self.async_gc.put('file/%s' % item_file['_id'], {'name': name})
+
+        self.resource_cache.invalidate(girder_path, recursive=True)
+        self.resource_cache.invalidate(new_girder_path, recursive=True)
+
+    async def delete(self, path):
+        """Delete a file/directory and any associated checkpoints."""
+        await self.delete_file(path, allow_non_empty=True)
+        await self._checkpoints_call('delete_all_checkpoints', path)
+
+    async def rename(self, old_path, new_path):
+        """Rename a file and any checkpoints associated with that file."""
+        await self.rename_file(old_path, new_path)
+        await self._checkpoints_call('rename_all_checkpoints', old_path, new_path)
+
+    async def update(self, model, path):
+        path = path.strip('/')
+        new_path = model.get('path', path).strip('/')
+        if path != new_path:
+            await self.rename(path, new_path)
+
+        return await self.get(new_path, content=False)
+
+    async def new(self, model=None, path=''):
+        path = path.strip('/')
+        if model is None:
+            model = {}
+
+        if path.endswith('.ipynb'):
+            model.setdefault('type', 'notebook')
+        else:
+            model.setdefault('type', 'file')
+
+        # no content, not a directory, so fill out new-file model
+        if 'content' not in model and model['type'] != 'directory':
+            if model['type'] == 'notebook':
+                model['content'] = new_notebook()
+                model['format'] = 'json'
+            else:
+                model['content'] = ''
+                model['type'] = 'file'
+                model['format'] = 'text'
+
+        return await self.save(model, path)
+
+    async def increment_filename(self, filename, path='', insert=''):
+        path = path.strip('/')
+        basename, ext = os.path.splitext(filename)
+        for i in itertools.count():
+            if i:
+                insert_i = '{}{}'.format(insert, i)
+            else:
+                insert_i = ''
+            name = u'{basename}{insert}{ext}'.format(basename=basename,
+                                                     insert=insert_i, ext=ext)
+            if not await self.exists(u'{}/{}'.format(path, name)):
+                break
+
+        return name
+
+    async def new_untitled(self, path='', type='', ext=''):
+        path = path.strip('/')
+        if not await self.dir_exists(path):
+            raise web.HTTPError(404, 'No such directory: %s' % path)
+
+        model = {}
+        if type:
+            model['type'] = type
+
+        if ext == '.ipynb':
+            model.setdefault('type', 'notebook')
+        else:
+            model.setdefault('type', 'file')
+
+        insert = ''
+        if model['type'] == 'directory':
+            untitled = self.untitled_directory
+            insert = ' '
+        elif model['type'] == 'notebook':
+            untitled = self.untitled_notebook
+            ext = '.ipynb'
+        elif model['type'] == 'file':
+            untitled = self.untitled_file
+        else:
+            raise web.HTTPError(400, 'Unexpected model type: %r' % model['type'])
+
+        name = await self.increment_filename(untitled + ext, path, insert=insert)
+        path = u'{0}/{1}'.format(path, name)
+
+        return await self.new(model, path)
+
+    async def copy(self, from_path, to_path=None):
+        path = from_path.strip('/')
+        if to_path is not None:
+            to_path = to_path.strip('/')
+
+        if '/' in path:
+            from_dir, from_name = path.rsplit('/', 1)
+        else:
+            from_dir = ''
+            from_name = path
+
+        model = await self.get(path)
+        model.pop('path', None)
+        model.pop('name', None)
+        if model['type'] == 'directory':
+            raise web.HTTPError(400, "Can't copy directories")
+
+        if to_path is None:
+            to_path = from_dir
+        if await self.dir_exists(to_path):
+            name = copy_pat.sub(u'.', from_name)
+            to_name = await self.increment_filename(name, to_path, insert='-Copy')
+            to_path = u'{0}/{1}'.format(to_path, to_name)
+
+        return await self.save(model, to_path)
+
+    async def trust_notebook(self, path):
+        model = await self.get(path)
+        nb = model['content']
+        self.log.warning('Trusting notebook %s', path)
+        self.notary.mark_cells(nb, True)
+        self.check_and_sign(nb, path)
+
+    async def _transfer(self, transfer, transfers):
+        semaphore = locks.Semaphore(max(1, self.bulk_concurrency))
+
+        async def run(args):
+            async with semaphore:
+                return await transfer(*args)
+
+        return sum(await gen.multi([run(args) for args in transfers]))
+
+    async def _upload_local_file(self, local_path, girder_path):
+        size = os.path.getsize(local_path)
+        with open(local_path, 'rb') as stream:
+            await self._upload_stream_to_path(stream, size, None, girder_path)
+
+        return size
+
+    async def _download_local_file(self, file, local_path):
+        # Written a chunk at a time as it arrives, rather than held in memory.
+        response = await self.async_gc.stream('file/%s/download' % file['_id'])
+        size = 0
+        try:
+            with open(local_path, 'wb') as f:
+                chunk = await response.read()
+                while chunk:
+                    f.write(chunk)
+                    size += len(chunk)
+                    chunk = await response.read()
+        finally:
+            response.close()
+
+        return size
+
+    async def _walk_tree(self, resource, files, path=''):
+        entries = [(path, None)]
+
+        if self._is_item(resource):
+            entries.extend((self._join(path, file['name']), file)
+                           for file in await self._item_files(resource['_id'], files))
+            return entries
+
+        children = [child for child in await self._list_resource(resource)
+                    if self.should_list(child['name']) and not child['name'].startswith('.')]
+        await self._prefetch_item_files(
+            [child['_id'] for child in children if self._is_item(child)], files)
+
+        for child in children:
+            child_path = self._join(path, child['name'])
+            item_file = None
+            if self._is_item(child):
+                item_file = self._container_file(child['name'], files[child['_id']])
+            if item_file is not None:
+                entries.append((child_path, item_file))
+            else:
+                entries.extend(await self._walk_tree(child, files, child_path))
+
+        return entries
+
+    async def _download_tree(self, resource, local_dir, files):
+        downloads = []
+        for path, file in await self._walk_tree(resource, files):
+            local_path = os.path.join(local_dir, *path.split('/')) if path else local_dir
+            if file is None:
+                self._makedirs(local_path)
+            else:
+                downloads.append((file, local_path))
+
+        return downloads
+
+    async def bulk_upload(self, local_dir, path=''):
+        """
+        Upload the contents of a local directory into the directory at path,
+        bulk_concurrency files at a time.
+        """
+        start = time.time()
+        folders, uploads = self._local_uploads(local_dir, path)
+        for folder in folders:
+            await self._create_folders(folder)
+        size = await self._transfer(self._upload_local_file, uploads)
+
+        return self._throughput('Uploaded', path, len(uploads), size, time.time() - start)
+
+    async def bulk_download(self, path, local_dir):
+        """
+        Download the contents of the directory at path into a local directory,
+        bulk_concurrency files at a time.
+        """
+        start = time.time()
+        path = path.strip('/')
+        girder_path = self._get_girder_path(path)
+        resource = await self._resource(girder_path)
+        if not self._is_type(resource, ['item', 'folder', 'user']):
+            raise web.HTTPError(404, 'No such directory: %s' % girder_path)
+        downloads = await self._download_tree(resource, local_dir, {})
+        size = await self._transfer(self._download_local_file, downloads)
+
+        return self._throughput('Downloaded', path, len(downloads), size, time.time() - start)
+
+    async def _checkpoints_call(self, method, *args):
+        """
+        Call a checkpoints method on the default executor, the checkpoints
+        classes are synchronous and would otherwise block the event loop.
+        """
+        return await IOLoop.current().run_in_executor(
+            None, getattr(self.checkpoints, method), *args)
+
+    async def list_checkpoints(self, path):
+        return await self._checkpoints_call('list_checkpoints', path)
+
+    async def delete_checkpoint(self, checkpoint_id, path):
+        return await self._checkpoints_call('delete_checkpoint', checkpoint_id, path)
+
+    async def create_checkpoint(self, path):
+        if not isinstance(self.checkpoints, GenericCheckpointsMixin):
+            return await self._checkpoints_call('create_checkpoint', self, path)
+
+        # The generic checkpoints call back into the contents manager synchronously,
+        # so drive them from here.
+        model = await self.get(path, content=True)
+        if model['type'] == 'notebook':
+            return self.checkpoints.create_notebook_checkpoint(model['content'], path)
+        elif model['type'] == 'file':
+            return self.checkpoints.create_file_checkpoint(model['content'],
+                                                           model['format'], path)
+
+        raise web.HTTPError(500, 'Unexpected type %s' % model['type'])
+
+    async def restore_checkpoint(self, checkpoint_id, path):
+        if not isinstance(self.checkpoints, GenericCheckpointsMixin):
+            return await self._checkpoints_call('restore_checkpoint', self, checkpoint_id, path)
+
+        model = await self.get(path, content=False)
+        if model['type'] == 'notebook':
+            model = self.checkpoints.get_notebook_checkpoint(checkpoint_id, path)
+        elif model['type'] == 'file':
+            model = self.checkpoints.get_file_checkpoint(checkpoint_id, path)
+        else:
+            raise web.HTTPError(500, 'Unexpected type %s' % model['type'])
+
+        await self.save(model, path)
@@ -0,0 +1,177 @@
+import errno
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from . import metrics
+
+TMP_PREFIX = '.tmp-'
+
+
+class BlobCache(object):
+    """
+    A cache of Girder file contents on the local disk, which survives server
+    restarts. Blobs are keyed by the file's sha512, or its id and last update
+    time when Girder has no sha512 for it, and the least recently used blobs
+    are evicted once the total size exceeds ``max_size`` bytes.
+
+    Several processes may share the same directory: blobs are written to a
+    temporary file and renamed into place, so readers only ever see complete
+    blobs, and a blob evicted by another process is just a miss. Errors using
+    the directory, such as it being full or not readable, are logged and make
+    the cache a miss or skip the write, they never fail the caller.
+    """
+
+    # Temporary files left behind by a crashed writer are removed after this long.
+    STALE_TMP_SECONDS = 3600
+
+    def __init__(self, directory, max_size=1024 * 1024 * 1024, clock=time.time, log=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.log = log or logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+    def key(self, file):
+        """
+        The key of a file's current contents, None if they can't be identified.
+        """
+        if file.get('sha512'):
+            key = 'sha512:%s' % file['sha512']
+        elif file.get('updated'):
+            key = 'id:%s:%s' % (file['_id'], file['updated'])
+        else:
+            return None
+
+        return hashlib.sha256(key.encode('utf8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, file):
+        """
+        Return the cached contents of a Girder file as a bytearray, or None.
+        """
+        key = self.key(file)
+        data = None
+        if key is not None:
+            data = self._read(self._path(key), file['size'])
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        metrics.cache_lookup('blob', data is not None)
+
+        return data
+
+    def _read(self, path, size):
+        try:
+            with open(path, 'rb') as f:
+                data = bytearray(size)
+                if f.readinto(data) != size or f.read(1):
+                    return None
+            # Mark as most recently used
+            os.utime(path, None)
+        except (IOError, OSError) as e:
+            if e.errno != errno.ENOENT:
+                self.log.warning('Error reading from the blob cache: %s', e)
+            return None
+
+        return data
+
+    def put(self, file, chunks):
+        """
+        Store the contents of a Girder file, given as an iterable of byte chunks.
+        Files larger than the cache, or whose contents can't be identified, are
+        not stored.
+        """
+        key = self.key(file)
+        if key is None or file['size'] > self.max_size:
+            return
+
+        try:
+            self._write(self._path(key), chunks)
+        except (IOError, OSError) as e:
+            self.log.warning('Error writing to the blob cache: %s', e)
+
+    def _write(self, path, chunks):
+        if os.path.exists(path):
+            os.utime(path, None)
+            return
+
+        fd, tmp_path = tempfile.mkstemp(prefix=TMP_PREFIX, dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.rename(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                # Evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        return entries
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """
+        Remove the least recently used blobs until the cache fits in max_size.
+        """
+        now = self._clock()
+        entries = []
+        for mtime, size, name in self._entries():
+            if name.startswith(TMP_PREFIX):
+                if now - mtime > self.STALE_TMP_SECONDS:
+                    self._remove(name)
+                continue
+            entries.append((mtime, size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            self._remove(name)
+            total -= size
+
+    def clear(self):
+        for _, _, name in self._entries():
+            self._remove(name)
+
+    def stats(self):
+        entries = [e for e in self._entries() if not e[2].startswith(TMP_PREFIX)]
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_size': self.max_size
+            }
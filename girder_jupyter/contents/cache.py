@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+
+
+class ResourceCache(object):
+    """
+    A bounded, thread safe, in-process cache mapping Girder paths to resource
+    documents. Entries expire after ``ttl`` seconds and the least recently used
+    entry is evicted once ``max_size`` entries are held.
+
+    A ``ttl`` or ``max_size`` of zero disables the cache.
+    """
+
+    def __init__(self, ttl=5.0, max_size=1024, clock=time.time):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_size > 0
+
+    def get(self, path):
+        """
+        Return the cached resource for path, or None if there is no live entry.
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                expires, resource = entry
+                if expires > self._clock():
+                    # Mark as most recently used
+                    del self._entries[path]
+                    self._entries[path] = entry
+                    self.hits += 1
+                    metrics.cache_lookup('resource', True)
+                    return resource
+                del self._entries[path]
+
+            self.misses += 1
+            metrics.cache_lookup('resource', False)
+
+            return None
+
+    def set(self, path, resource):
+        if not self.enabled or resource is None:
+            return
+
+        with self._lock:
+            self._entries.pop(path, None)
+            self._entries[path] = (self._clock() + self.ttl, resource)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path, recursive=False):
+        """
+        Drop the entry for path. If recursive is True, entries for all paths
+        below it are dropped as well.
+        """
+        with self._lock:
+            self._entries.pop(path, None)
+            if recursive:
+                prefix = '%s/' % path.rstrip('/')
+                for key in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[key]
+
+    def invalidate_resources(self, ids):
+        """
+        Drop the entries of resources changed in Girder: those whose id is in
+        ids, and everything below them, and those in a folder whose id is.
+        Returns the number of entries dropped.
+        """
+        with self._lock:
+            paths = set()
+            for path, (_, resource) in self._entries.items():
+                if resource['_id'] in ids:
+                    paths.add(path)
+                elif (resource.get('folderId') or resource.get('parentId')) in ids:
+                    paths.add(path)
+
+            prefixes = tuple('%s/' % path for path in paths)
+            dropped = [path for path in self._entries
+                       if path in paths or path.startswith(prefixes)]
+            for path in dropped:
+                del self._entries[path]
+
+        return len(dropped)
+
+    def containers(self):
+        """
+        The folders and users holding the cached resources, or cached
+        themselves, as a dict of their ids to their model types.
+        """
+        containers = {}
+        with self._lock:
+            for _, resource in self._entries.values():
+                if resource['_modelType'] in ('folder', 'user'):
+                    containers[resource['_id']] = resource['_modelType']
+                if resource['_modelType'] == 'item':
+                    containers[resource['folderId']] = 'folder'
+                elif resource.get('parentCollection') in ('folder', 'user'):
+                    containers[resource['parentId']] = resource['parentCollection']
+
+        return containers
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def copy_notebook(node):
+    """
+    Copy a parsed notebook's dicts and lists, which is much cheaper than a
+    deepcopy as the leaves (strings and numbers) are immutable.
+    """
+    if isinstance(node, dict):
+        return type(node)((key, copy_notebook(value)) for key, value in node.items())
+    if isinstance(node, list):
+        return [copy_notebook(value) for value in node]
+
+    return node
+
+
+class NotebookCache(object):
+    """
+    A bounded, thread safe, in-process cache of parsed and validated notebooks,
+    keyed by Girder file id and content (sha512, or the last update time if
+    Girder has no sha512). Entries are charged the size of the notebook's JSON
+    and the least recently used are evicted once ``max_size`` bytes are held.
+    Callers always get their own copy of a cached notebook.
+
+    A ``max_size`` of zero disables the cache.
+    """
+
+    def __init__(self, max_size=64 * 1024 * 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # The total time the cache has saved parsing and validating notebooks
+        self.saved_seconds = 0.0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def _key(self, file):
+        version = file.get('sha512') or file.get('updated')
+        if version is None:
+            return None
+
+        return (file['_id'], version)
+
+    def get(self, file):
+        """
+        Return a copy of the cached notebook for a Girder file, its validation
+        message and the time the cache saved, or None.
+        """
+        key = self._key(file)
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None:
+                self.misses += 1
+                metrics.cache_lookup('notebook', False)
+                return None
+
+            # Mark as most recently used
+            del self._entries[key]
+            self._entries[key] = entry
+            self.hits += 1
+            metrics.cache_lookup('notebook', True)
+            nb, message, size, seconds = entry
+            self.saved_seconds += seconds
+
+        return copy_notebook(nb), message, seconds
+
+    def set(self, file, nb, message, size, seconds):
+        """
+        Cache a notebook parsed from a Girder file, size is the size of its JSON
+        and seconds the time it took to parse and validate. The notebook must
+        not be modified afterwards.
+        """
+        key = self._key(file)
+        if not self.enabled or key is None or size > self.max_size:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            self._entries[key] = (nb, message, size, seconds)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, _, evicted, _) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'saved_seconds': self.saved_seconds,
+                'entries': len(self._entries),
+                'size': self.size,
+                'max_size': self.max_size
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,208 @@
+"""
+Invalidate the resource cache when resources change in Girder, through the
+web UI, another server or a pipeline, so long lived cache entries don't go
+stale. Changes are read from Girder's notification stream, or found by
+polling the folders the cache holds resources of.
+"""
+import json
+import threading
+import time
+
+import girder_client
+
+from . import metrics
+
+
+def parse_events(lines):
+    """
+    Generate the JSON documents sent as server-sent events, from the lines of
+    an event stream.
+    """
+    data = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf8')
+        line = line.rstrip('\r\n')
+        if not line:
+            # A blank line ends an event
+            if data:
+                yield json.loads('\n'.join(data))
+                data = []
+        elif line.startswith('data:'):
+            data.append(line[5:].lstrip(' '))
+
+    if data:
+        yield json.loads('\n'.join(data))
+
+
+def changed_ids(data):
+    """
+    The ids of the resources a change notification's data concerns, the
+    resource and the item of a file.
+    """
+    ids = [data.get(key) for key in ('_id', 'itemId')]
+
+    return set(id for id in ids if id)
+
+
+class NotificationSubscriber(object):
+    """
+    Read changes from Girder's notification stream, notifications of type
+    notification_type carry the changed resource document (or at least its
+    _id) as their data. Girder ends each stream after timeout seconds,
+    it is then reopened from the time of the last notification seen.
+    """
+
+    def __init__(self, gc, notification_type, timeout=30, connect_timeout=None):
+        self.gc = gc
+        self.notification_type = notification_type
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.since = int(time.time())
+
+    def read(self):
+        """
+        Generate the sets of resource ids changed, from a single stream. Raises
+        girder_client.HttpError if Girder doesn't have a notification stream.
+        """
+        response = self.gc.sendRestRequest(
+            'GET', 'notification/stream',
+            parameters={'timeout': self.timeout, 'since': self.since},
+            jsonResp=False, stream=True,
+            # Nothing is sent while there are no notifications
+            timeout=(self.connect_timeout, self.timeout + 10))
+        try:
+            for notification in parse_events(response.iter_lines()):
+                self.since = max(self.since, int(notification.get('time') or 0))
+                if notification.get('type') == self.notification_type:
+                    yield changed_ids(notification.get('data') or {})
+        finally:
+            response.close()
+
+
+class FolderPoller(object):
+    """
+    Find changes by polling the folders (and users) the resource cache holds
+    resources of. A folder has changed when the number of items or folders in
+    it, or the newest updated time among them, has. That's three small requests
+    a folder, two for a user.
+    """
+
+    def __init__(self, gc, cache):
+        self.gc = gc
+        self.cache = cache
+        # Girder id -> the last state seen
+        self._states = {}
+
+    def _newest(self, path, params):
+        params = dict(params, limit=1, sort='updated', sortdir=-1)
+        docs = self.gc.get(path, parameters=params)
+
+        return (docs[0]['_id'], docs[0].get('updated')) if docs else None
+
+    def _state(self, id, model_type):
+        details = self.gc.get('%s/%s/details' % (model_type, id))
+        state = [details.get('nItems'), details.get('nFolders'),
+                 self._newest('folder', {'parentType': model_type, 'parentId': id})]
+        if model_type == 'folder':
+            state.append(self._newest('item', {'folderId': id}))
+
+        return state
+
+    def poll(self):
+        """The set of ids of the watched folders that have changed."""
+        changed = set()
+        containers = self.cache.containers()
+        for id, model_type in containers.items():
+            try:
+                state = self._state(id, model_type)
+            except girder_client.HttpError:
+                # Deleted, or no longer readable
+                state = None
+
+            if id in self._states and self._states[id] != state:
+                changed.add(id)
+            self._states[id] = state
+
+        # Stop watching folders that are no longer cached
+        for id in set(self._states) - set(containers):
+            del self._states[id]
+
+        return changed
+
+
+class ChangeWatcher(object):
+    """
+    A background thread invalidating cache entries as resources change in
+    Girder. If subscriber is given changes are read from it, if it fails, or
+    without one, the folders are polled every interval seconds.
+    """
+
+    def __init__(self, cache, poller, subscriber=None, interval=5.0, log=None):
+        self.cache = cache
+        self.poller = poller
+        self.subscriber = subscriber
+        self.interval = interval
+        self.log = log
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='girder-changes')
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _invalidate(self, ids, source):
+        if not ids:
+            return
+
+        count = self.cache.invalidate_resources(ids)
+        metrics.cache_invalidation('resource', source, count)
+        if self.log is not None:
+            self.log.debug('Invalidated %d cached resources changed in Girder', count)
+
+    def _run(self):
+        if self.subscriber is not None:
+            try:
+                self._subscribe()
+            except girder_client.HttpError as e:
+                if self.log is not None:
+                    self.log.warning('Girder notification stream unavailable, polling for '
+                                     'changes instead: %s', e)
+        self._poll()
+
+    def _subscribe(self):
+        failures = 0
+        while not self._stopped.is_set():
+            start = time.time()
+            try:
+                for ids in self.subscriber.read():
+                    self._invalidate(ids, 'notification')
+                failures = 0
+            except girder_client.HttpError as e:
+                if e.status < 500:
+                    raise
+                failures += 1
+            except Exception as e:  # noqa: B902
+                # Dropped connections, timeouts, ...
+                failures += 1
+                if self.log is not None:
+                    self.log.debug('Girder notification stream failed: %s', e)
+
+            # Don't hammer a Girder that ends streams early.
+            if failures or time.time() - start < 1:
+                self._stopped.wait(min(self.interval * (failures or 1), 60))
+
+    def _poll(self):
+        while not self._stopped.is_set():
+            try:
+                self._invalidate(self.poller.poll(), 'poll')
+            except Exception as e:  # noqa: B902
+                if self.log is not None:
+                    self.log.warning('Failed to poll Girder for changes: %s', e)
+            self._stopped.wait(self.interval)
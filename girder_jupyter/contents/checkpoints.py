@@ -0,0 +1,161 @@
+import os
+
+from notebook.services.contents.checkpoints import Checkpoints
+
+from traitlets import Unicode
+
+from tornado import web
+
+
+class GirderCheckpoints(Checkpoints):
+    """
+    Checkpoints stored in Girder, as items in a hidden folder next to the file
+    they belong to. Checkpoints are created and restored using Girder's server
+    side copies (item/{id}/copy and file/{id}/copy), so the file contents never
+    pass through the Jupyter server.
+
+    The parent of this object must be the GirderContentsManager.
+    """
+
+    checkpoint_dir = Unicode(
+        '.ipynb_checkpoints',
+        config=True,
+        help='The name of the hidden folder checkpoints are stored in, alongside '
+        'the files they belong to.'
+    )
+
+    @property
+    def gc(self):
+        return self.parent.gc
+
+    def _lookup(self, girder_path):
+        import girder_client
+
+        try:
+            return self.gc.resourceLookup(girder_path)
+        except girder_client.HttpError:
+            return None
+
+    def _checkpoint_name(self, checkpoint_id, path):
+        name = path.strip('/').split('/')[-1]
+        basename, ext = os.path.splitext(name)
+
+        return '%s-%s%s' % (basename, checkpoint_id, ext)
+
+    def _checkpoint_girder_path(self, checkpoint_id, path):
+        parts = path.strip('/').split('/')
+        parts[-1:] = [self.checkpoint_dir, self._checkpoint_name(checkpoint_id, path)]
+
+        return self.parent._get_girder_path('/'.join(parts))
+
+    def _checkpoint_folder(self, folder_id):
+        return self.gc.createFolder(folder_id, self.checkpoint_dir, reuseExisting=True)
+
+    def _checkpoint_model(self, checkpoint_id, checkpoint):
+        return {
+            'id': checkpoint_id,
+            'last_modified': self.parent._parse_timestamp(
+                checkpoint.get('updated', checkpoint['created']))
+        }
+
+    def _item(self, path):
+        girder_path = self.parent._get_girder_path(path.strip('/'))
+        item = self._lookup(girder_path)
+        if item is None or item['_modelType'] != 'item':
+            raise web.HTTPError(404, 'No such file: %s' % girder_path)
+
+        return item
+
+    def _save_queue(self, contents_mgr, path):
+        """
+        The contents manager's write behind queue, if it has one, and the path
+        saves to path are queued under.
+        """
+        save_queue = getattr(contents_mgr, 'save_queue', None)
+
+        return save_queue, contents_mgr._get_girder_path(path.strip('/'))
+
+    def create_checkpoint(self, contents_mgr, path):
+        checkpoint_id = 'checkpoint'
+        # The checkpoint is of the latest save, upload it if it's still queued.
+        save_queue, girder_path = self._save_queue(contents_mgr, path)
+        if save_queue is not None:
+            save_queue.flush(girder_path)
+
+        item = self._item(path)
+        folder = self._checkpoint_folder(item['folderId'])
+        name = self._checkpoint_name(checkpoint_id, path)
+
+        # Only the latest checkpoint is kept. It is replaced once the new one
+        # has been copied, under another name, so a failed copy doesn't lose it.
+        existing = next(self.gc.listItem(folder['_id'], name=name), None)
+        checkpoint = self.gc.post('item/%s/copy' % item['_id'], parameters={
+            'folderId': folder['_id'],
+            'name': name if existing is None else '.new-' + name
+        })
+        if existing is not None:
+            self.gc.delete('item/%s' % existing['_id'])
+            checkpoint = self.gc.put('item/%s' % checkpoint['_id'], parameters={'name': name})
+
+        return self._checkpoint_model(checkpoint_id, checkpoint)
+
+    def restore_checkpoint(self, contents_mgr, checkpoint_id, path):
+        item = self._item(path)
+        checkpoint = self._lookup(self._checkpoint_girder_path(checkpoint_id, path))
+        if checkpoint is None:
+            raise web.HTTPError(404, 'Checkpoint does not exist: %s@%s' % (path, checkpoint_id))
+
+        source = next(self.gc.listFile(checkpoint['_id']), None)
+        if source is None:
+            raise web.HTTPError(500, 'Checkpoint is empty: %s@%s' % (path, checkpoint_id))
+
+        # Queued saves are older than the restore, they mustn't be uploaded over it.
+        save_queue, girder_path = self._save_queue(contents_mgr, path)
+        if save_queue is not None:
+            save_queue.discard(girder_path)
+
+        name = path.strip('/').split('/')[-1]
+        existing = [file for file in self.gc.listFile(item['_id']) if file['name'] == name]
+
+        # Copy the checkpoint before removing the file, so it isn't lost if the
+        # copy fails.
+        file = self.gc.post('file/%s/copy' % source['_id'], parameters={
+            'itemId': item['_id']
+        })
+        for old in existing:
+            if old['_id'] != file['_id']:
+                self.gc.delete('file/%s' % old['_id'])
+        if file['name'] != name:
+            self.gc.put('file/%s' % file['_id'], parameters={'name': name})
+
+        contents_mgr.resource_cache.invalidate(contents_mgr._get_girder_path(path.strip('/')))
+
+    def rename_checkpoint(self, checkpoint_id, old_path, new_path):
+        checkpoint = self._lookup(self._checkpoint_girder_path(checkpoint_id, old_path))
+        if checkpoint is None:
+            return
+
+        params = {
+            'name': self._checkpoint_name(checkpoint_id, new_path)
+        }
+        # Follow the file if it has moved to another folder
+        if os.path.dirname(old_path.strip('/')) != os.path.dirname(new_path.strip('/')):
+            item = self._item(new_path)
+            params['folderId'] = self._checkpoint_folder(item['folderId'])['_id']
+
+        self.gc.put('item/%s' % checkpoint['_id'], parameters=params)
+
+    def delete_checkpoint(self, checkpoint_id, path):
+        checkpoint = self._lookup(self._checkpoint_girder_path(checkpoint_id, path))
+        if checkpoint is None:
+            raise web.HTTPError(404, 'Checkpoint does not exist: %s@%s' % (path, checkpoint_id))
+
+        self.gc.delete('item/%s' % checkpoint['_id'])
+
+    def list_checkpoints(self, path):
+        checkpoint_id = 'checkpoint'
+        checkpoint = self._lookup(self._checkpoint_girder_path(checkpoint_id, path))
+        if checkpoint is None:
+            return []
+
+        return [self._checkpoint_model(checkpoint_id, checkpoint)]
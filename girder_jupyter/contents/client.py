@@ -0,0 +1,110 @@
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from six.moves.urllib.parse import urlsplit
+from tornado.ioloop import IOLoop
+from urllib3.util.retry import Retry
+
+import girder_client
+
+from . import metrics
+
+
+class PooledGirderClient(girder_client.GirderClient):
+    """
+    A GirderClient that sends all of its requests through a single pooled
+    requests session. Idempotent requests that fail with a transient status
+    are retried with an exponential backoff, and each request's latency is
+    logged at debug level.
+    """
+
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(self, apiUrl, pool_size=10, keep_alive=True, connect_timeout=None,
+                 read_timeout=None, max_retries=3, retry_backoff=0.5, log=None):
+        super(PooledGirderClient, self).__init__(apiUrl=apiUrl)
+        self.timeout = (connect_timeout or None, read_timeout or None)
+        self.log = log or logging.getLogger(__name__)
+        self._session = self._create_session(pool_size, keep_alive, max_retries,
+                                             retry_backoff)
+
+    def _create_session(self, pool_size, keep_alive, max_retries, retry_backoff):
+        session = requests.Session()
+        # By default Retry only retries idempotent methods, so uploads are never
+        # replayed. raise_on_status=False hands the last response back to
+        # girder_client so it can raise its usual HttpError.
+        retry = Retry(total=max_retries, backoff_factor=retry_backoff,
+                      status_forcelist=self.RETRY_STATUSES, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not keep_alive:
+            session.headers['Connection'] = 'close'
+        session.hooks['response'].append(self._log_response)
+
+        return session
+
+    def _log_response(self, response, *args, **kwargs):
+        request = response.request
+        seconds = response.elapsed.total_seconds()
+        self.log.debug('Girder %s %s %d %.2fms', request.method, request.path_url,
+                       response.status_code, seconds * 1000)
+        api_path = urlsplit(self.urlBase).path
+        metrics.girder_request(request.method, request.path_url[len(api_path):],
+                               response.status_code, seconds,
+                               sent=int(request.headers.get('Content-Length') or 0),
+                               received=int(response.headers.get('Content-Length') or 0))
+
+    def sendRestRequest(self, method, path, parameters=None, data=None, files=None,
+                        json=None, headers=None, jsonResp=True, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+
+        return super(PooledGirderClient, self).sendRestRequest(
+            method, path, parameters=parameters, data=data, files=files, json=json,
+            headers=headers, jsonResp=jsonResp, **kwargs)
+
+
+class StreamedResponse(object):
+    """
+    The body of a streamed response, read a chunk at a time from the IOLoop.
+    Each read is made in a thread so a slow Girder doesn't block the server.
+    """
+
+    def __init__(self, response, chunk_size):
+        self._response = response
+        self._chunks = response.iter_content(chunk_size)
+
+    def read(self):
+        """A future of the next chunk of the body, b'' at the end."""
+        return IOLoop.current().run_in_executor(None, next, self._chunks, b'')
+
+    def close(self):
+        self._response.close()
+
+
+class LocalRange(object):
+    """
+    A range of a local file, read a chunk at a time from the IOLoop like a
+    StreamedResponse.
+    """
+
+    def __init__(self, f, offset, end, chunk_size):
+        self._f = f
+        self._remaining = end - offset
+        self._chunk_size = chunk_size
+        f.seek(offset)
+
+    def _next(self):
+        data = self._f.read(min(self._chunk_size, self._remaining))
+        self._remaining -= len(data)
+
+        return data
+
+    def read(self):
+        """A future of the next chunk of the range, b'' at the end."""
+        return IOLoop.current().run_in_executor(None, self._next)
+
+    def close(self):
+        self._f.close()
@@ -0,0 +1,306 @@
+import calendar
+import collections
+import mimetypes
+import re
+import tarfile
+import time
+
+from notebook.base.handlers import IPythonHandler
+from notebook.files.handlers import FilesHandler
+
+from tornado import gen, web
+
+from .timestamps import parse_timestamp
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Parse a Range header against a file of size bytes. Returns the (start, end)
+    byte offsets to send, end exclusive, or None to send the whole file: when
+    there is no header, or it isn't a single byte range we understand, which
+    RFC 7233 lets us ignore. Raises RangeNotSatisfiable if no byte of the range
+    is in the file.
+    """
+    if not header:
+        return None
+
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # A suffix range, the last n bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size
+
+    start = int(first)
+    end = size if not last else min(int(last) + 1, size)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+
+    return start, end
+
+
+def tar_pieces(entries, chunk_size, now=None):
+    """
+    Lay out a tar archive of (archive path, file) entries, file being None for
+    directories. Returns a list of pieces, each either bytes or a (file, offset,
+    end) range of a file's contents of at most chunk_size bytes, which joined
+    up are the archive.
+    """
+    if now is None:
+        now = time.time()
+
+    pieces = []
+    for name, file in entries:
+        info = tarfile.TarInfo(name)
+        if file is None:
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            info.mtime = int(now)
+        else:
+            info.size = file['size']
+            info.mode = 0o644
+            timestamp = file.get('updated') or file.get('created')
+            if timestamp:
+                info.mtime = calendar.timegm(parse_timestamp(timestamp).utctimetuple())
+            else:
+                info.mtime = int(now)
+        pieces.append(info.tobuf(tarfile.PAX_FORMAT, 'utf8'))
+
+        if file is None:
+            continue
+
+        for offset in range(0, file['size'], chunk_size):
+            pieces.append((file, offset, min(offset + chunk_size, file['size'])))
+        remainder = file['size'] % tarfile.BLOCKSIZE
+        if remainder:
+            pieces.append(b'\0' * (tarfile.BLOCKSIZE - remainder))
+
+    # The end of archive marker
+    pieces.append(b'\0' * (2 * tarfile.BLOCKSIZE))
+
+    return pieces
+
+
+def _piece_size(piece):
+    if isinstance(piece, bytes):
+        return len(piece)
+
+    _, offset, end = piece
+
+    return end - offset
+
+
+@gen.coroutine
+def _resolve(value):
+    """Resolve the result of a sync or async contents manager method."""
+    if gen.is_future(value) or hasattr(value, '__await__'):
+        value = yield value
+
+    raise gen.Return(value)
+
+
+def _flush_saves(cm, path):
+    """
+    Upload the saves to (and below) path still waiting in the contents
+    manager's write behind queue, before reading its contents from Girder.
+    """
+    flush_saves = getattr(cm, 'flush_saves', None)
+    if flush_saves is not None:
+        flush_saves(path)
+
+
+class GirderFilesHandler(FilesHandler):
+    """
+    Serve the raw contents of Girder files at /files/, streamed in chunks
+    rather than buffered whole. Single byte range requests are answered with
+    the part asked for, and the Girder sha512 is used as the ETag.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    @web.authenticated
+    def head(self, path):
+        self.check_xsrf_cookie()
+        return self.get(path, include_body=False)
+
+    @web.authenticated
+    @gen.coroutine
+    def get(self, path, include_body=True):
+        # /files/ requests must originate from the same site
+        self.check_xsrf_cookie()
+        cm = self.contents_manager
+
+        if cm.is_hidden(path) and not cm.allow_hidden:
+            self.log.info('Refusing to serve hidden file, via 404 Error')
+            raise web.HTTPError(404)
+
+        path = path.strip('/')
+        name = path.rsplit('/', 1)[-1]
+        _flush_saves(cm, path)
+        file = yield _resolve(cm._file(cm._get_girder_path(path)))
+        if file is None:
+            raise web.HTTPError(404)
+
+        self._file = file
+        if self.get_argument('download', False):
+            self.set_attachment_header(name)
+        self.set_header('Content-Type', self._content_type(name, file))
+        self.set_header('Accept-Ranges', 'bytes')
+        self.set_etag_header()
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+
+        size = file['size']
+        try:
+            byte_range = parse_range(self.request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            # Not raised as an HTTPError, which would clear the Content-Range.
+            self.set_status(416)
+            self.set_header('Content-Range', 'bytes */%d' % size)
+            return
+
+        start, end = byte_range or (0, size)
+        if byte_range is not None:
+            self.set_status(206)
+            self.set_header('Content-Range', 'bytes %d-%d/%d' % (start, end - 1, size))
+        self.set_header('Content-Length', end - start)
+
+        if not include_body:
+            return
+
+        if start == end:
+            return
+
+        # A single request to Girder for the whole range, relayed as it arrives.
+        stream = yield _resolve(cm._open_range(file, start, end, self.CHUNK_SIZE))
+        try:
+            chunk = yield _resolve(stream.read())
+            while chunk:
+                self.write(bytes(chunk))
+                # Wait for the chunk to be sent before reading the next one, so a
+                # slow client never has more than a chunk buffered for it.
+                yield self.flush()
+                chunk = yield _resolve(stream.read())
+        finally:
+            stream.close()
+
+    def compute_etag(self):
+        file = getattr(self, '_file', None)
+        if file is None or not file.get('sha512'):
+            return None
+
+        return '"%s"' % file['sha512']
+
+    def _content_type(self, name, file):
+        if name.endswith('.ipynb'):
+            return 'application/x-ipynb+json'
+
+        mime_type = mimetypes.guess_type(name)[0] or file.get('mimeType')
+        if not mime_type:
+            return 'application/octet-stream'
+        if mime_type == 'text/plain':
+            return 'text/plain; charset=UTF-8'
+
+        return mime_type
+
+
+class GirderArchiveHandler(IPythonHandler):
+    """
+    Download a directory as a single archive at /girder/archive/, streamed to
+    the client. By default this is the zip Girder makes of the directory, passed
+    straight through. With format=tar, a tar of the directory, or of just the
+    paths in it given as path arguments, is built here from the contents of its
+    files, several chunks of which are requested from Girder at once.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    @web.authenticated
+    @gen.coroutine
+    def get(self, path):
+        # Archive downloads must originate from the same site
+        self.check_xsrf_cookie()
+        cm = self.contents_manager
+
+        if cm.is_hidden(path) and not cm.allow_hidden:
+            self.log.info('Refusing to archive hidden directory, via 404 Error')
+            raise web.HTTPError(404)
+
+        import girder_client
+
+        path = path.strip('/')
+        name = path.rsplit('/', 1)[-1] or 'archive'
+        format = self.get_argument('format', 'zip')
+        _flush_saves(cm, path)
+        try:
+            if format == 'zip':
+                yield self._zip(cm, path, name)
+            elif format == 'tar':
+                yield self._tar(cm, path, name, self.get_arguments('path'))
+            else:
+                raise web.HTTPError(400, 'Unsupported archive format: %s' % format)
+        except girder_client.HttpError as e:
+            raise web.HTTPError(e.status, 'Girder failed to archive %s: %s' % (path, e))
+
+    @gen.coroutine
+    def _zip(self, cm, path, name):
+        stream = yield _resolve(cm._open_zip(path))
+        try:
+            # Wait for the first chunk before sending the headers, so an error
+            # from Girder is still reported with its status.
+            chunk = yield _resolve(stream.read())
+            self.set_header('Content-Type', 'application/zip')
+            self.set_attachment_header(name + '.zip')
+            while chunk:
+                self.write(chunk)
+                yield self.flush()
+                chunk = yield _resolve(stream.read())
+        finally:
+            stream.close()
+
+    @gen.coroutine
+    def _tar(self, cm, path, name, names):
+        entries = yield _resolve(cm._archive_entries(path, names))
+        pieces = tar_pieces(entries, self.CHUNK_SIZE)
+
+        self.set_header('Content-Type', 'application/x-tar')
+        self.set_header('Content-Length', sum(_piece_size(piece) for piece in pieces))
+        self.set_attachment_header(name + '.tar')
+
+        # Chunks are requested up to archive_concurrency ahead of the one being
+        # sent, and sent in order.
+        concurrency = max(1, cm.archive_concurrency)
+        pending = collections.deque()
+        for piece in pieces:
+            if not isinstance(piece, bytes):
+                piece = _resolve(cm._fetch_range(*piece))
+            pending.append(piece)
+            if len(pending) > concurrency:
+                yield self._send(pending.popleft())
+
+        while pending:
+            yield self._send(pending.popleft())
+
+    @gen.coroutine
+    def _send(self, piece):
+        if not isinstance(piece, bytes):
+            piece = yield piece
+        self.write(bytes(piece))
+        yield self.flush()
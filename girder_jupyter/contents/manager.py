@@ -1,22 +1,49 @@
+import atexit
+import codecs
+import mmap
 import os
-from six import BytesIO
-import dateutil
+import datetime
+import hashlib
+import json
+import mimetypes
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import dateutil.tz
 import base64
 import nbformat
 
 
+from jupyter_core.paths import jupyter_data_dir
 from notebook.services.contents.manager import ContentsManager
 from notebook.services.contents.filecheckpoints import GenericFileCheckpoints
 
-from traitlets import default, Unicode, Instance
+from traitlets import default, Unicode, Instance, Float, Integer, Bool, Dict, Enum
 
 from tornado import web
+from tornado.ioloop import IOLoop
 
-import girder_client
+from .blob_cache import BlobCache
+from .cache import copy_notebook, NotebookCache, ResourceCache
+from .checkpoints import GirderCheckpoints
+from . import metrics, tracing
+from .handlers import GirderArchiveHandler, GirderFilesHandler
+from .save_queue import SaveQueue
+from .timestamps import parse_timestamp
+from .upload import Base64Reader, TextReader, upload_chunks
+
+# girder_client and requests are slow to import, they are imported where they
+# are first used rather than holding up the server starting.
 
 
 class GirderContentsManager(ContentsManager):
 
+    # Must be a multiple of 3 so each chunk encodes without padding.
+    BASE64_CHUNK_SIZE = 3 * 1024 * 1024
+
+    ARCHIVE_CHUNK_SIZE = 1024 * 1024
+
     api_url = Unicode(
         allow_none=True,
         config=True,
@@ -37,7 +64,44 @@ class GirderContentsManager(ContentsManager):
         help='A Girder token.'
     )
 
-    gc = Instance(girder_client.GirderClient)
+    gc = Instance('girder_client.GirderClient')
+
+    pool_size = Integer(
+        config=True,
+        help='The number of connections to Girder kept in the pool.',
+        default_value=10
+    )
+
+    keep_alive = Bool(
+        config=True,
+        help='Keep connections to Girder open between requests.',
+        default_value=True
+    )
+
+    connect_timeout = Float(
+        config=True,
+        help='The number of seconds to wait for a connection to Girder, 0 waits forever.',
+        default_value=10.0
+    )
+
+    read_timeout = Float(
+        config=True,
+        help='The number of seconds to wait for Girder to respond, 0 waits forever.',
+        default_value=60.0
+    )
+
+    max_retries = Integer(
+        config=True,
+        help='The number of times an idempotent request is retried when Girder '
+        'is unavailable (502, 503 or 504) or the connection fails.',
+        default_value=3
+    )
+
+    retry_backoff = Float(
+        config=True,
+        help='The backoff factor, in seconds, applied between retries.',
+        default_value=0.5
+    )
 
     root = Unicode(
         allow_none=True,
@@ -47,11 +111,219 @@ class GirderContentsManager(ContentsManager):
         default_value='user/{login}'
     )
 
+    prewarm = Bool(
+        config=True,
+        help='Look up the root and list its contents into the resource cache in the '
+        'background when the server starts, so the first listing is answered from '
+        'the cache.',
+        default_value=False
+    )
+
+    resource_cache_ttl = Float(
+        config=True,
+        help='The number of seconds a Girder path lookup is cached for, 0 disables '
+        'the cache.',
+        default_value=5.0
+    )
+
+    resource_cache_size = Integer(
+        config=True,
+        help='The maximum number of Girder path lookups to cache.',
+        default_value=1024
+    )
+
+    list_page_size = Integer(
+        config=True,
+        help='The number of folders or items to request from Girder per page when '
+        'listing a directory, 0 requests everything at once.',
+        default_value=1000
+    )
+
+    list_concurrency = Integer(
+        config=True,
+        help='The number of listing pages to request from Girder concurrently.',
+        default_value=1
+    )
+
+    file_list_concurrency = Integer(
+        config=True,
+        help='The number of items whose files are requested from Girder concurrently '
+        'when listing a directory.',
+        default_value=8
+    )
+
+    bulk_concurrency = Integer(
+        config=True,
+        help='The number of files transferred concurrently by bulk_upload and '
+        'bulk_download.',
+        default_value=4
+    )
+
+    archive_concurrency = Integer(
+        config=True,
+        help='The number of file chunks requested from Girder concurrently when '
+        'building a tar archive for download.',
+        default_value=4
+    )
+
+    max_inline_size = Integer(
+        config=True,
+        help='The maximum size, in bytes, of a file whose content is returned through '
+        'the contents API, 0 for no limit.',
+        default_value=0
+    )
+
+    upload_chunk_size = Integer(
+        config=True,
+        help='The size, in bytes, of the chunks files are uploaded to Girder in.',
+        default_value=32 * 1024 * 1024
+    )
+
+    skip_unchanged_uploads = Bool(
+        config=True,
+        help="Don't upload a file if its content matches the sha512 Girder holds for it.",
+        default_value=True
+    )
+
+    assetstore_paths = Dict(
+        config=True,
+        help='A map of Girder filesystem assetstore ids to the local directories they '
+        'are mounted at. Files in these assetstores are read from the local disk '
+        'rather than downloaded, when Girder reveals their path.'
+    )
+
+    assetstore_mmap_size = Integer(
+        config=True,
+        help='The size, in bytes, from which files read from a local assetstore are '
+        'memory mapped rather than read into memory.',
+        default_value=16 * 1024 * 1024
+    )
+
+    blob_cache_dir = Unicode(
+        '',
+        config=True,
+        help='A local directory to cache the contents of Girder files in, across '
+        'restarts. It may be shared by several servers. Empty disables the cache.'
+    )
+
+    blob_cache_size = Integer(
+        config=True,
+        help='The maximum size, in bytes, of the local file contents cache.',
+        default_value=1024 * 1024 * 1024
+    )
+
+    notebook_cache_size = Integer(
+        config=True,
+        help='The size, in bytes of notebook JSON, of the cache of parsed and '
+        'validated notebooks. 0 disables the cache.',
+        default_value=64 * 1024 * 1024
+    )
+
+    write_behind = Bool(
+        config=True,
+        help='Journal saves of notebooks and files to the local disk and upload them '
+        'to Girder in the background, only uploading the latest of several saves '
+        'to the same path.',
+        default_value=False
+    )
+
+    write_behind_dir = Unicode(
+        config=True,
+        help='The local directory saves are journaled in when write_behind is enabled. '
+        'It must not be shared with other servers.'
+    )
+
+    write_behind_delay = Float(
+        config=True,
+        help='The number of seconds after a save that it is uploaded to Girder when '
+        'write_behind is enabled.',
+        default_value=2.0
+    )
+
+    change_events = Enum(
+        ['', 'notifications', 'poll'],
+        config=True,
+        help='Invalidate cached resources when they change in Girder, so a long '
+        'resource_cache_ttl is safe. "notifications" reads the changes from Girder\'s '
+        'notification stream, falling back to polling if it is unavailable, "poll" '
+        'polls the folders of the cached resources for changes. Disabled by default.',
+        default_value=''
+    )
+
+    change_notification_type = Unicode(
+        config=True,
+        help='The type of the Girder notifications of resource changes, their data '
+        'is the changed resource.',
+        default_value='girder_jupyter.change'
+    )
+
+    change_poll_interval = Float(
+        config=True,
+        help='The number of seconds between polls of Girder for changes.',
+        default_value=5.0
+    )
+
+    trace_operations = Bool(
+        config=True,
+        help='Record a tree of spans for each contents operation: the manager methods '
+        'it calls and the Girder requests they make, with their timings and sizes. '
+        'The trace is included in the slow operation log.',
+        default_value=False
+    )
+
+    slow_operation_threshold = Float(
+        config=True,
+        help='Log contents operations taking longer than this many seconds as JSON, '
+        'with the Girder requests they made. 0 disables the log.',
+        default_value=0.0
+    )
+
+    slow_operation_log = Unicode(
+        config=True,
+        help='A file slow operations are appended to, one JSON document per line. '
+        'By default they are logged as warnings.'
+    )
+
+    resource_cache = Instance(ResourceCache)
+
+    notebook_cache = Instance(NotebookCache)
+
+    blob_cache = Instance(BlobCache, allow_none=True)
+
+    @default('resource_cache')
+    def _resource_cache(self):
+        return ResourceCache(ttl=self.resource_cache_ttl,
+                             max_size=self.resource_cache_size)
+
+    @default('write_behind_dir')
+    def _write_behind_dir(self):
+        return os.path.join(jupyter_data_dir(), 'girder_jupyter', 'journal')
+
+    @default('notebook_cache')
+    def _notebook_cache(self):
+        return NotebookCache(max_size=self.notebook_cache_size)
+
+    @default('blob_cache')
+    def _blob_cache(self):
+        if not self.blob_cache_dir:
+            return None
+
+        return BlobCache(os.path.expanduser(self.blob_cache_dir),
+                         max_size=self.blob_cache_size, log=self.log)
+
     @default('gc')
     def _gc(self):
-        gc = girder_client.GirderClient(apiUrl=self.api_url)
+        from .client import PooledGirderClient
+
+        gc = PooledGirderClient(self.api_url,
+                                pool_size=self.pool_size,
+                                keep_alive=self.keep_alive,
+                                connect_timeout=self.connect_timeout,
+                                read_timeout=self.read_timeout,
+                                max_retries=self.max_retries,
+                                retry_backoff=self.retry_backoff,
+                                log=self.log)
         if self.api_key is not None:
-            gc = girder_client.GirderClient(apiUrl=self.api_url)
             gc.authenticate(apiKey=self.api_key)
         elif self.token is not None:
             gc.token = self.token
@@ -61,16 +333,31 @@ class GirderContentsManager(ContentsManager):
     @default('checkpoints_class')
     def _checkpoints_class(self):
 
-        return GenericFileCheckpoints
+        return GirderCheckpoints
+
+    @default('files_handler_class')
+    def _files_handler_class(self):
+        return GirderFilesHandler
+
+    def get_extra_handlers(self):
+        handlers = super(GirderContentsManager, self).get_extra_handlers()
+        handlers.append((r'/girder/archive/(.*)', GirderArchiveHandler))
+
+        return handlers
 
     @default('checkpoints_kwargs')
     def _checkpoints_kwargs(self):
-        home = os.path.expanduser('~')
-
-        return {
-            'root_dir': os.path.join(home, '.ipynb_checkpoints')
+        kwargs = {
+            'parent': self,
+            'log': self.log
         }
 
+        if issubclass(self.checkpoints_class, GenericFileCheckpoints):
+            home = os.path.expanduser('~')
+            kwargs['root_dir'] = os.path.join(home, '.ipynb_checkpoints')
+
+        return kwargs
+
     def _render_login(self, root):
         if '{login}' in self.root:
             me = self.gc.get('user/me')
@@ -84,15 +371,135 @@ class GirderContentsManager(ContentsManager):
 
     def __init__(self, *args, **kwargs):
         super(GirderContentsManager, self).__init__(*args, **kwargs)
-        # Render {login}
-        self.root = self._render_login(self.root)
+        # Chunked uploads in progress, by path
+        self._spools = {}
+        # Concurrent saves into the same tree resolve its folders one at a time,
+        # so all but the first find them in the resource cache.
+        self._folders_lock = threading.Lock()
+        # The sha512 and time of the last write behind save, by path
+        self._queued_saves = {}
+        self._slow_log_lock = threading.Lock()
+        self.save_queue = self._create_save_queue()
+        self.change_watcher = self._create_change_watcher()
+        # Held while {login} is rendered in the background
+        self._root_lock = threading.Lock()
+        self._warm_up_thread = self._start_warm_up()
+
+    def _start_warm_up(self):
+        """
+        Render {login} in the root, which takes a request of Girder, and prewarm
+        the resource cache in the background, rather than holding up the server
+        starting.
+        """
+        if '{login}' not in self.root and not self.prewarm:
+            return None
+
+        # Released once the root is rendered, any use of it before then waits.
+        self._root_lock.acquire()
+        thread = threading.Thread(target=self._warm_up, name='girder-warm-up')
+        thread.daemon = True
+        thread.start()
+
+        return thread
+
+    def _warm_up(self):
+        try:
+            try:
+                self.root = self._render_login(self.root)
+            finally:
+                self._root_lock.release()
+
+            if self.prewarm:
+                self._prewarm()
+        except Exception as e:  # noqa: B902
+            # The error is raised again when the root is first used.
+            self.log.warning('Failed to warm up the Girder contents manager: %s', e)
+
+    def _prewarm(self):
+        """Cache the root and the folders and items in it."""
+        root = self.root
+        resource = self.gc.resourceLookup(root)
+        self.resource_cache.set(root, resource)
+
+        children = []
+        if self._is_folder(resource):
+            children += self.gc.listItem(resource['_id'])
+        children += self.gc.listFolder(resource['_id'], parentFolderType=resource['_modelType'])
+        for child in children:
+            self.resource_cache.set('%s/%s' % (root, child['name']), child)
+
+    def _operation_finished(self, operation):
+        """Log an operation if it took longer than slow_operation_threshold."""
+        if not self.slow_operation_threshold or \
+                operation.seconds < self.slow_operation_threshold:
+            return
+
+        record = json.dumps(operation.to_dict(), sort_keys=True)
+        if not self.slow_operation_log:
+            self.log.warning('Slow contents operation: %s', record)
+            return
+
+        with self._slow_log_lock:
+            with open(os.path.expanduser(self.slow_operation_log), 'a') as f:
+                f.write(record + '\n')
+
+    def _create_change_watcher(self):
+        if not self.change_events or not self.resource_cache.enabled:
+            return None
 
+        from .changes import ChangeWatcher, FolderPoller, NotificationSubscriber
+
+        subscriber = None
+        if self.change_events == 'notifications':
+            subscriber = NotificationSubscriber(self.gc, self.change_notification_type,
+                                                connect_timeout=self.connect_timeout or None)
+        watcher = ChangeWatcher(self.resource_cache, FolderPoller(self.gc, self.resource_cache),
+                                subscriber, interval=self.change_poll_interval, log=self.log)
+        atexit.register(watcher.stop)
+
+        return watcher.start()
+
+    def _create_save_queue(self):
+        if not self.write_behind:
+            return None
+
+        queue = SaveQueue(os.path.expanduser(self.write_behind_dir),
+                          self._upload_stream_to_path, delay=self.write_behind_delay,
+                          log=self.log)
+        atexit.register(queue.close)
+
+        return queue
+
+    def flush_saves(self, path=None):
+        """
+        Upload the saves waiting in the write behind queue now, all of them or
+        those of (and below) path.
+        """
+        if self.save_queue is None:
+            return
+
+        if path is None:
+            self.save_queue.flush()
+        else:
+            self.save_queue.flush(self._get_girder_path(path.strip('/')), recursive=True)
+
+    @tracing.traced
     def _resource(self, path):
+        resource = self.resource_cache.get(path)
+        if resource is not None:
+            return resource
+
+        import girder_client
+
         try:
-            return self.gc.resourceLookup(path)
+            resource = self.gc.resourceLookup(path)
         except girder_client.HttpError:
             return None
 
+        self.resource_cache.set(path, resource)
+
+        return resource
+
     def _resource_exists(self, path, model_type):
         resource = self._resource(path)
 
@@ -129,36 +536,127 @@ class GirderContentsManager(ContentsManager):
 
         return None
 
-    def _file_by_name(self, item_id, name):
-        for file in self.gc.listFile(item_id):
+    def _file_by_name(self, item_id, name, files=None):
+        for file in self._item_files(item_id, files):
             if file['name'] == name:
                 return file
 
         return None
 
-    def _list_resource(self, resource):
-        listing = []
+    @tracing.traced
+    def _item_files(self, item_id, files=None):
+        """
+        The files in an item. files is a memo of item ids to their files, shared
+        across a single request so each item is only listed once.
+        """
+        if files is None:
+            files = {}
+
+        if item_id not in files:
+            files[item_id] = list(self.gc.listFile(item_id))
+
+        return files[item_id]
+
+    @tracing.traced
+    def _prefetch_item_files(self, item_ids, files):
+        """
+        List the files of many items into the files memo, making up to
+        file_list_concurrency requests at once.
+        """
+        item_ids = [item_id for item_id in item_ids if item_id not in files]
+        concurrency = min(max(1, self.file_list_concurrency), len(item_ids))
+
+        if concurrency <= 1:
+            for item_id in item_ids:
+                self._item_files(item_id, files)
+            return
+
+        def fetch(item_id):
+            return list(self.gc.listFile(item_id))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for item_id, item_files in zip(item_ids, executor.map(tracing.bind(fetch), item_ids)):
+                files[item_id] = item_files
+
+    def _list_pages(self, path, params, page_size):
+        """
+        Generate the documents returned by a Girder listing endpoint, requesting
+        them one page at a time. If list_concurrency is greater than one, that
+        many pages are requested at once.
+        """
+        def fetch(offset):
+            page_params = dict(params, limit=page_size, offset=offset)
+            return self.gc.get(path, page_params)
+
+        if page_size <= 0:
+            for doc in fetch(0):
+                yield doc
+            return
+
+        concurrency = max(1, self.list_concurrency)
+        offset = 0
+
+        if concurrency == 1:
+            while True:
+                page = fetch(offset)
+                for doc in page:
+                    yield doc
+                if len(page) < page_size:
+                    return
+                offset += page_size
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                futures = [executor.submit(tracing.bind(fetch), offset + i * page_size)
+                           for i in range(concurrency)]
+                offset += concurrency * page_size
+                for future in futures:
+                    page = future.result()
+                    for doc in page:
+                        yield doc
+                    # A short page is the last one, drop any we requested beyond it.
+                    if len(page) < page_size:
+                        for f in futures:
+                            f.cancel()
+                        return
+
+    @tracing.traced
+    def _list_resource(self, resource, page_size=None):
+        """
+        Generate the items and folders contained in a resource.
+        """
+        if page_size is None:
+            page_size = self.list_page_size
 
         if self._is_folder(resource):
             params = {
                 'folderId': resource['_id']
             }
 
-            listing += self.gc.get('item', params)
+            for item in self._list_pages('item', params, page_size):
+                yield item
 
         params = {
             'parentId': resource['_id'],
             'parentType': resource['_modelType']
         }
 
-        listing += self.gc.get('folder', params)
+        for folder in self._list_pages('folder', params, page_size):
+            yield folder
 
-        return listing
+    def _girder_root(self):
+        if '{login}' in self.root:
+            with self._root_lock:
+                # Rendered while we waited, unless that failed
+                self.root = self._render_login(self.root)
+
+        return self.root
 
     def _get_girder_path(self, path):
 
-        return ('%s/%s' % (self.root, path)).rstrip('/')
+        return ('%s/%s' % (self._girder_root(), path)).rstrip('/')
 
+    @metrics.operation('dir_exists')
     def dir_exists(self, path):
         """Does a directory exist at the given path?
         Like os.path.isdir
@@ -195,6 +693,7 @@ class GirderContentsManager(ContentsManager):
 
         return False
 
+    @metrics.operation('file_exists')
     def file_exists(self, path=''):
         """Does a file exist at the given path?
         Like os.path.isfile
@@ -212,24 +711,52 @@ class GirderContentsManager(ContentsManager):
         path = path.strip('/')
         girder_path = self._get_girder_path(path)
 
+        if self._is_queued(girder_path):
+            return True
+
         return self._file(girder_path) is not None
 
-    def _has_write_access(self, resource):
+    @tracing.traced
+    def _has_write_access(self, resource, access=None):
+        """Can the current user write to a resource?
+
+        Parameters
+        ----------
+        resource : dict
+            The Girder resource
+        access : dict
+            A memo of Girder ids to write access, shared across a single
+            request so that siblings don't refetch their common parent.
+        """
+        if access is None:
+            access = {}
+
+        if resource['_id'] in access:
+            return access[resource['_id']]
+
         if self._is_folder(resource) or self._is_user(resource):
-            return resource['_accessLevel'] > 0
+            writable = resource['_accessLevel'] > 0
         elif self._is_item(resource):
             # Get the containing folder to check access
-            folder = self.gc.getFolder(resource['folderId'])
-            return self._has_write_access(folder)
+            writable = access.get(resource['folderId'])
+            if writable is None:
+                folder = self.gc.getFolder(resource['folderId'])
+                writable = self._has_write_access(folder, access)
         elif self._is_file(resource):
             # Get the containing item to check access
-            folder = self.gc.getItem(resource['itemId'])
-            return self._has_write_access(folder)
+            writable = access.get(resource['itemId'])
+            if writable is None:
+                item = self.gc.getItem(resource['itemId'])
+                writable = self._has_write_access(item, access)
         else:
             # TODO Need to work out error reporting
             raise Exception('Unexpected resource type: %s' % resource['_modelType'])
 
-    def _base_model(self, path, resource):
+        access[resource['_id']] = writable
+
+        return writable
+
+    def _base_model(self, path, resource, access=None):
         """Build the common base of a contents model
         Parameters
         ----------
@@ -237,8 +764,16 @@ class GirderContentsManager(ContentsManager):
             The path to the resource
         resource : dict
             The Girder file or folder model
+        access : dict
+            The write access memo for this request, see _has_write_access
         """
 
+        return self._new_model(path, resource, self._has_write_access(resource, access))
+
+    def _new_model(self, path, resource, writable):
+        """Build the common base of a contents model, given the resource's
+        write access.
+        """
         created = resource['created']
         updated = resource.get('updated', created)
 
@@ -246,36 +781,58 @@ class GirderContentsManager(ContentsManager):
         model = {}
         model['name'] = resource.get('name', resource.get('login'))
         model['path'] = path
-        model['last_modified'] = dateutil.parser.parse(updated)
-        model['created'] = dateutil.parser.parse(created)
+        model['last_modified'] = self._parse_timestamp(updated)
+        model['created'] = self._parse_timestamp(created)
         model['content'] = None
         model['format'] = None
         model['mimetype'] = None
-        model['writable'] = self._has_write_access(resource)
+        model['writable'] = writable
+
+        queued = self._queued_saves.get(path)
+        if queued is not None and queued[0] == resource.get('sha512'):
+            # Report when the content was saved rather than when it was uploaded,
+            # otherwise the frontend sees a newer version on disk than it saved.
+            model['last_modified'] = queued[1]
 
         return model
 
-    def _dir_model(self, path, resource, content=True, format=None):
+    def _parse_timestamp(self, timestamp):
+        return parse_timestamp(timestamp)
+
+    @tracing.traced
+    def _dir_model(self, path, resource, content=True, format=None, access=None,
+                   files=None):
         """Build a model for a directory
         if content is requested, will include a listing of the directory
         """
-        model = self._base_model(path, resource)
+        if access is None:
+            access = {}
+        if files is None:
+            files = {}
+        # The children's access is checked against this folder, which is now memoized.
+        model = self._base_model(path, resource, access)
         model['type'] = 'directory'
         if content:
+            children = [child for child in self._list_resource(resource)
+                        if self.should_list(child['name']) and not child['name'].startswith('.')]
+            # Each child item needs its files to tell whether it is a file, list
+            # them all up front rather than one at a time.
+            self._prefetch_item_files(
+                [child['_id'] for child in children if self._is_item(child)], files)
+
             model['content'] = contents = []
-            for resource in self._list_resource(resource):
-                name = resource['name']
-                if self.should_list(name) and not name.startswith('.'):
-                    contents.append(self._get(
-                        '%s/%s' % (path, name), resource,
-                        content=False, format=format)
-                    )
+            for child in children:
+                contents.append(self._get(
+                    '%s/%s' % (path, child['name']), child,
+                    content=False, format=format, access=access, files=files)
+                )
 
             model['format'] = 'json'
 
         return model
 
-    def _file_model(self, path, file, content=True, format=None):
+    @tracing.traced
+    def _file_model(self, path, file, content=True, format=None, access=None):
         """Build a model for a file
         if content is requested, include the file contents.
         format:
@@ -284,32 +841,13 @@ class GirderContentsManager(ContentsManager):
           If not specified, try to decode as UTF-8, and fall back to base64
         """
         girder_path = self._get_girder_path(path)
-        model = self._base_model(path, file)
+        model = self._base_model(path, file, access)
         model['type'] = 'file'
         model['mimetype'] = file['mimeType']
 
         if content:
-            stream = BytesIO()
-            self.gc.downloadFile(file['_id'], stream)
-
-            if format == 'text':
-                try:
-                    content = stream.getvalue().decode('utf8')
-                except UnicodeError:
-                    if format == 'text':
-                        raise web.HTTPError(
-                            400, '%s is not UTF-8 encoded' % girder_path,
-                            reason='bad format')
-            elif format == 'base64':
-                content = base64.b64encode(stream.getvalue()).decode('ascii')
-            # If not specified, try to decode as UTF-8, and fall back to base64
-            else:
-                try:
-                    content = stream.getvalue().decode('utf8')
-                    format = 'text'
-                except UnicodeError:
-                    content = base64.b64encode(stream.getvalue()).decode('ascii')
-                    format = 'base64'
+            data = self._download(girder_path, file)
+            content, format = self._file_content(girder_path, data, format)
 
             model.update(
                 content=content,
@@ -318,57 +856,389 @@ class GirderContentsManager(ContentsManager):
 
         return model
 
-    def _item_model(self, path, item, content=True, format=None):
-        name = path.split('/')[-1]
-        files = list(self.gc.listFile(item['_id']))
-        # We short cut an item just create to contain a file
-        item_is_container = False
+    def _check_inline_size(self, girder_path, file):
+        if self.max_inline_size and file['size'] > self.max_inline_size:
+            msg = '%s is too large to open (%d bytes, the limit is %d bytes).' % (
+                girder_path, file['size'], self.max_inline_size)
+            raise web.HTTPError(413, msg, reason='too large')
 
-        for file in files:
-            if file['name'] == name:
-                item_is_container = len(files) == 1
-                item_file = file
+    @tracing.traced
+    def _download(self, girder_path, file):
+        """
+        Get the contents of a file, read from its local assetstore or the blob
+        cache if possible. Otherwise the file is downloaded into a single buffer
+        allocated up front, chunks are copied into it through a memoryview as
+        they arrive.
+        """
+        self._check_inline_size(girder_path, file)
+        tracing.annotate(size=file.get('size'))
+
+        data = self._read_assetstore(file)
+        if data is not None:
+            tracing.annotate(source='assetstore')
+            return data
+
+        if self.blob_cache is not None:
+            data = self.blob_cache.get(file)
+            if data is not None:
+                tracing.annotate(source='blob_cache')
+                return data
+
+        tracing.annotate(source='girder')
+        data = bytearray(file['size'])
+        view = memoryview(data)
+        offset = 0
+        for chunk in self.gc.downloadFileAsIterator(file['_id']):
+            end = offset + len(chunk)
+            if end > len(data):
+                raise web.HTTPError(502, 'Girder sent more data than expected for %s'
+                                    % girder_path)
+            view[offset:end] = chunk
+            offset = end
+        del view
+
+        if offset != len(data):
+            raise web.HTTPError(502, 'Incomplete download of %s' % girder_path)
+
+        if self.blob_cache is not None:
+            self.blob_cache.put(file, [data])
+
+        return data
+
+    def _assetstore_path(self, file):
+        """
+        The local path of a file in a mounted filesystem assetstore, or None. The
+        path is only in the file document if Girder shows it to the user.
+        """
+        root = self.assetstore_paths.get(file.get('assetstoreId'))
+        if root is None or not file.get('path'):
+            return None
+
+        root = os.path.realpath(os.path.expanduser(root))
+        path = os.path.realpath(os.path.join(root, file['path']))
+        if not path.startswith(root + os.sep) or not os.access(path, os.R_OK):
+            return None
+
+        return path
 
-        if item_is_container:
-            return self._file_model(path, item_file, content, format)
+    def _read_assetstore(self, file):
+        """
+        Read a file's contents from its local assetstore, large files are memory
+        mapped. Returns None if the file can't be read locally.
+        """
+        path = self._assetstore_path(file)
+        if path is None:
+            return None
+
+        size = file['size']
+        try:
+            with open(path, 'rb') as f:
+                # The file may have been replaced since the document was fetched.
+                if os.fstat(f.fileno()).st_size != size:
+                    return None
+                if 0 < self.assetstore_mmap_size <= size:
+                    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+                data = bytearray(size)
+                if f.readinto(data) != size:
+                    return None
+        except (IOError, OSError) as e:
+            self.log.debug('Falling back to downloading %s: %s', path, e)
+            return None
+
+        return data
+
+    def _read_assetstore_range(self, file, offset, end):
+        """
+        Read the bytes from offset up to end of a file from its local assetstore,
+        or None if the file can't be read locally.
+        """
+        path = self._assetstore_path(file)
+        if path is None:
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size != file['size']:
+                    return None
+                f.seek(offset)
+                data = f.read(end - offset)
+        except (IOError, OSError) as e:
+            self.log.debug('Falling back to downloading %s: %s', path, e)
+            return None
+
+        return data if len(data) == end - offset else None
+
+    def _read_range(self, file, offset, end):
+        """
+        Read the bytes from offset up to end of a Girder file, without getting
+        the rest of it.
+        """
+        data = self._read_assetstore_range(file, offset, end)
+        if data is None:
+            data = self.gc.get('file/%s/download' % file['_id'],
+                               parameters={'offset': offset, 'endByte': end},
+                               jsonResp=False).content
+
+        return data
+
+    def _open_local_range(self, file, offset, end, chunk_size):
+        """
+        A LocalRange of the bytes from offset up to end of a file in its local
+        assetstore, or None if the file can't be read locally.
+        """
+        from .client import LocalRange
+
+        path = self._assetstore_path(file)
+        if path is None:
+            return None
+
+        try:
+            f = open(path, 'rb')
+        except (IOError, OSError) as e:
+            self.log.debug('Falling back to downloading %s: %s', path, e)
+            return None
+
+        if os.fstat(f.fileno()).st_size != file['size']:
+            f.close()
+            return None
+
+        return LocalRange(f, offset, end, chunk_size)
+
+    def _open_range(self, file, offset, end, chunk_size):
+        """
+        Start streaming the bytes from offset up to end of a Girder file, with a
+        single ranged request unless it is read from its local assetstore.
+        Returns a stream to read them from chunk_size bytes at a time.
+        """
+        from .client import StreamedResponse
+
+        stream = self._open_local_range(file, offset, end, chunk_size)
+        if stream is not None:
+            return stream
+
+        response = self.gc.sendRestRequest(
+            'GET', 'file/%s/download' % file['_id'],
+            parameters={'offset': offset, 'endByte': end}, jsonResp=False, stream=True)
+
+        return StreamedResponse(response, chunk_size)
+
+    def _fetch_range(self, file, offset, end):
+        """
+        A future of _read_range, which is run in a thread so reading a file from
+        Girder doesn't block the server while it is streamed to a client.
+        """
+        return IOLoop.current().run_in_executor(None, self._read_range, file, offset, end)
+
+    def _directory(self, path):
+        """The folder, user or multi-file item at path, raises a 404 otherwise."""
+        girder_path = self._get_girder_path(path)
+        resource = self._resource(girder_path)
+        if self._is_item(resource):
+            files = self._item_files(resource['_id'])
+            if self._container_file(path.split('/')[-1], files) is not None:
+                resource = None
+        if not self._is_type(resource, ['item', 'folder', 'user']):
+            raise web.HTTPError(404, 'No such directory: %s' % girder_path)
+
+        return resource
+
+    def _zip_request(self, resource):
+        """The Girder endpoint, and its parameters, that zips a directory."""
+        if self._is_folder(resource):
+            return 'folder/%s/download' % resource['_id'], None
+        if self._is_item(resource):
+            return 'item/%s/download' % resource['_id'], {'format': 'zip'}
+
+        folders = [child['_id'] for child in self._list_resource(resource)]
+
+        return 'resource/download', {'resources': json.dumps({'folder': folders})}
+
+    def _open_zip(self, path):
+        """
+        Start streaming the zip Girder makes of the directory at path, returns a
+        StreamedResponse to read it from.
+        """
+        from .client import StreamedResponse
+
+        endpoint, parameters = self._zip_request(self._directory(path.strip('/')))
+        response = self.gc.sendRestRequest('GET', endpoint, parameters, jsonResp=False,
+                                           stream=True)
+
+        return StreamedResponse(response, self.ARCHIVE_CHUNK_SIZE)
+
+    def _archive_name(self, name):
+        name = name.strip('/')
+        if not name or '..' in name.split('/'):
+            raise web.HTTPError(400, 'Invalid path to archive: %s' % name)
+
+        return name
+
+    def _archive_entries(self, path, names=None):
+        """
+        The (archive path, file) pairs to archive the files and directories
+        named in the directory at path, or all of its contents. Archive paths
+        are relative to path, file is None for directories.
+        """
+        path = path.strip('/')
+        files = {}
+        if not names:
+            return [entry for entry in self._walk_tree(self._directory(path), files)
+                    if entry[0]]
+
+        entries = []
+        for name in names:
+            name = self._archive_name(name)
+            girder_path = self._get_girder_path(self._join(path, name))
+            resource = self._resource(girder_path)
+            file = None
+            if self._is_item(resource):
+                file = self._container_file(name.split('/')[-1],
+                                            self._item_files(resource['_id'], files))
+            if file is not None:
+                entries.append((name, file))
+            elif self._is_type(resource, ['item', 'folder', 'user']):
+                entries.extend(self._walk_tree(resource, files, name))
+            else:
+                raise web.HTTPError(404, 'No such file or directory: %s' % girder_path)
+
+        return entries
+
+    def _base64(self, data):
+        """
+        Base64 encode data a chunk at a time, so no encoded copy of the whole
+        payload is held as bytes as well as text.
+        """
+        view = memoryview(data)
+        chunk_size = self.BASE64_CHUNK_SIZE
+
+        return ''.join(base64.b64encode(view[i:i + chunk_size]).decode('ascii')
+                       for i in range(0, len(view), chunk_size))
+
+    def _file_content(self, girder_path, data, format=None):
+        """Decode the raw bytes of a file, returns the content and its format."""
+        if format == 'text':
+            try:
+                content = codecs.decode(data, 'utf8')
+            except UnicodeError:
+                raise web.HTTPError(
+                    400, '%s is not UTF-8 encoded' % girder_path,
+                    reason='bad format')
+        elif format == 'base64':
+            content = self._base64(data)
+        # If not specified, try to decode as UTF-8, and fall back to base64.
+        # Decoding stops at the first invalid byte, so binary files fail fast.
+        else:
+            try:
+                content = codecs.decode(data, 'utf8')
+                format = 'text'
+            except UnicodeError:
+                content = self._base64(data)
+                format = 'base64'
+
+        return content, format
+
+    @tracing.traced
+    def _item_model(self, path, item, content=True, format=None, access=None, files=None):
+        if access is None:
+            access = {}
+        name = path.split('/')[-1]
+        item_files = self._item_files(item['_id'], files)
+        item_file = self._container_file(name, item_files)
+
+        if item_file is not None:
+            # Seed the memo so the file doesn't have to fetch its item again.
+            self._has_write_access(item, access)
+            return self._file_model(path, item_file, content, format, access)
 
         # Other treat item as read-only directories
-        model = self._base_model(path, item)
+        model = self._base_model(path, item, access)
         model['writable'] = False
         model['type'] = 'directory'
         if content:
             model['content'] = contents = []
-            for file in files:
+            for file in item_files:
                 contents.append(self._get(
                     '%s/%s' % (path, file['name']), file,
-                    content=False, format=format)
+                    content=False, format=format, access=access)
                 )
 
             model['format'] = 'json'
 
         return model
 
-    def _notebook_model(self, path, resource, content=True):
+    def _container_file(self, name, files):
+        """
+        We short cut an item just created to contain a file, returns that file
+        if the item is such a container.
+        """
+        if len(files) == 1 and files[0]['name'] == name:
+            return files[0]
+
+        return None
+
+    @tracing.traced
+    def _notebook_model(self, path, resource, content=True, access=None, files=None):
+        if access is None:
+            access = {}
         name = path.split('/')[-1]
         # Shortcut item
         if self._is_item(resource):
-            resource = self._file_by_name(resource['_id'], name)
+            self._has_write_access(resource, access)
+            resource = self._file_by_name(resource['_id'], name, files)
 
-        model = self._base_model(path, resource)
+        model = self._base_model(path, resource, access)
         model['type'] = 'notebook'
 
         if content:
-            stream = BytesIO()
-            self.gc.downloadFile(resource['_id'], stream)
-            nb = nbformat.reads(stream.getvalue().decode('utf8'), as_version=4)
-            self.mark_trusted_cells(nb, path)
-            model['content'] = nb
-            model['format'] = 'json'
-            self.validate_notebook_model(model)
+            cached = self._cached_notebook(path, resource)
+            if cached is None:
+                data = self._download(self._get_girder_path(path), resource)
+                cached = self._parse_notebook(resource, data)
+            self._set_notebook_content(model, path, *cached)
 
         return model
 
-    def _get(self, path, resource, content=True, type=None, format=None):
+    def _cached_notebook(self, path, file):
+        """
+        The parsed notebook and validation message cached for a file, or None.
+        """
+        cached = self.notebook_cache.get(file)
+        if cached is None:
+            return None
+
+        nb, message, seconds = cached
+        self.log.debug('Notebook cache hit for %s, saved %.2fms', path, seconds * 1000)
+
+        return nb, message
+
+    @tracing.traced
+    def _parse_notebook(self, file, data):
+        """
+        Parse and validate a notebook's contents, returns the notebook and its
+        validation message, which are added to the notebook cache.
+        """
+        start = time.time()
+        nb = nbformat.reads(codecs.decode(data, 'utf8'), as_version=4)
+        message = self.validate_notebook_model({'content': nb}).get('message')
+        self.notebook_cache.set(file, nb, message, len(data), time.time() - start)
+
+        if self.notebook_cache.enabled:
+            # The cached notebook must not be modified
+            nb = copy_notebook(nb)
+
+        return nb, message
+
+    def _set_notebook_content(self, model, path, nb, message):
+        # Trust isn't cached, it changes when a notebook is signed.
+        self.mark_trusted_cells(nb, path)
+        model['content'] = nb
+        model['format'] = 'json'
+        if message is not None:
+            model['message'] = message
+
+    def _get(self, path, resource, content=True, type=None, format=None, access=None,
+             files=None):
         """Get a file or directory model."""
 
         girder_path = self._get_girder_path(path)
@@ -377,117 +1247,228 @@ class GirderContentsManager(ContentsManager):
             raise web.HTTPError(404, 'No such file or directory: %s' % girder_path)
 
         if type == 'notebook' or (type is None and path.endswith('.ipynb')):
-            model = self._notebook_model(path, resource, content)
+            model = self._notebook_model(path, resource, content, access, files)
         elif self._is_folder(resource) or self._is_user(resource):
             if type not in (None, 'directory'):
                 raise web.HTTPError(
                     400, '%s is a directory, not a %s' % (girder_path, type), reason='bad type')
-            model = self._dir_model(path, resource, content, format)
+            model = self._dir_model(path, resource, content, format, access, files)
         elif self._is_item(resource):
             if type not in (None, 'file', 'notebook'):
                 raise web.HTTPError(
                     400, '%s is a file, not a %s' % (girder_path, type), reason='bad type')
-            model = self._item_model(path, resource, content, format)
+            model = self._item_model(path, resource, content, format, access, files)
         else:
             if type == 'directory':
                 raise web.HTTPError(
                     400, '%s is not a directory' % girder_path, reason='bad type')
-            model = self._file_model(path, resource, content=content, format=format)
+            model = self._file_model(path, resource, content=content, format=format,
+                                     access=access)
 
         return model
 
+    @metrics.operation('get')
     def get(self, path, content=True, type=None, format=None):
         """Get a file or directory model."""
         path = path.strip('/')
         girder_path = self._get_girder_path(path)
 
+        queued = self._queued_model(path, girder_path, content, type, format)
+        if queued is not None:
+            return queued
+
         resource = self._resource(girder_path)
 
         return self._get(path, resource, content, type, format)
 
     def _upload_to_path(self, content, mime_type, format, path):
+        stream = self._content_stream(content, format)
+        self._upload_stream_to_path(stream, stream.size, mime_type, path)
+
+    @tracing.traced
+    def _upload_stream_to_path(self, stream, size, mime_type, path):
         parts = path.split('/')
         name = parts[-1]
         folder_path = parts[:-1]
 
-        parent = self._create_folders('/'.join(folder_path))
+        parent = self._upload_parent(self._create_folders('/'.join(folder_path)))
 
-        if self._is_user(parent):
-            msg = "The Girder user's home location may only contain " \
-                'folders. Create or navigate to another folder before ' \
-                'creating or uploading a file.'
-            raise web.HTTPError(400, msg, reason=msg)
-        elif self._is_item(parent):
+        if self._is_item(parent):
             item = parent
         else:
             item = self.gc.loadOrCreateItem(name, parent['_id'], reuseExisting=True)
 
         file = self._file_by_name(item['_id'], name)
 
-        # Get content in right format
-        if format == 'text':
-            content = content.encode('utf8')
-        else:
-            b64_content = content.encode('ascii')
-            content = base64.b64decode(b64_content)
-        size = len(content)
-
-        stream = BytesIO(content)
+        if file is not None and self._unchanged(file, stream, size):
+            self.log.debug('Skipping upload of unchanged file: %s', path)
+            self._cache_upload(file, stream)
+            return
 
+        # Initialize the upload, the contents are then sent in chunks.
         if file is None:
-            self.gc.uploadFile(item['_id'], stream, name, size, mimeType=mime_type)
+            upload = self.gc.post('file', parameters={
+                'parentType': 'item',
+                'parentId': item['_id'],
+                'name': name,
+                'size': size,
+                'mimeType': mime_type or mimetypes.guess_type(name)[0]
+            })
         else:
-            self.gc.uploadFileContents(file['_id'], stream, size)
+            upload = self.gc.put('file/%s/contents' % file['_id'], parameters={
+                'size': size
+            })
 
-    def _create_folders(self, path):
+        file = upload_chunks(self.gc, upload, stream, size, self.upload_chunk_size,
+                             max_retries=self.max_retries, log=self.log)
+        self._cache_upload(file, stream)
+
+        # The item (and its timestamps) may have changed underneath us.
+        self.resource_cache.invalidate(path)
+
+    def _cache_upload(self, file, stream):
+        """Add the contents just saved to a file to the blob cache."""
+        if self.blob_cache is None or not self._is_file(file):
+            return
+
+        stream.seek(0)
+        self.blob_cache.put(file, iter(lambda: stream.read(self.upload_chunk_size), b''))
+
+    def _unchanged(self, file, stream, size):
         """
-        Create all necessary folder for a given path.
+        Does the content of stream match the Girder file? Girder stores the
+        sha512 of the files in most assetstores, if it doesn't we can't tell.
         """
-        parts = path.split('/')
-        root = '/'.join(parts[:2])
-        path = parts[2:]
+        if not self.skip_unchanged_uploads or 'sha512' not in file \
+                or file.get('size') != size:
+            return False
 
-        current_resource = self._resource(root)
-        if current_resource is None:
-            raise web.HTTPError(404, 'No such file or directory: %s' % path)
+        sha512 = hashlib.sha512()
+        stream.seek(0)
+        while True:
+            data = stream.read(self.upload_chunk_size)
+            if not data:
+                break
+            sha512.update(data)
+        stream.seek(0)
 
-        for resource_name in path:
-            # Can't create folder under an item so return permission denied
-            if self._is_item(current_resource):
-                raise web.HTTPError(403, 'Permission denied: %s' % resource_name)
+        return sha512.hexdigest() == file['sha512']
 
-            next_resource = next(
-                self.gc.listFolder(current_resource['_id'],
-                                   name=resource_name,
-                                   parentFolderType=current_resource['_modelType']), None)
+    def _content_stream(self, content, format):
+        """
+        Get a stream over the bytes to upload for the content of a model, the
+        content is encoded or decoded lazily as it is read.
+        """
+        if format == 'text':
+            return TextReader(content)
 
-            # Check for items
-            if next_resource is None:
-                next_resource = next(self.gc.listItem(current_resource['_id'],
-                                                      name=resource_name), None)
+        return Base64Reader(content)
 
-            if next_resource is None:
+    def _spool_chunk(self, model, path):
+        """
+        Handle a chunk of a JupyterLab chunked upload, chunks are numbered from 1
+        with the last one being -1. Each chunk is appended to a temporary file
+        and, once the last one arrives, the file and its size are returned so it
+        can be uploaded. Returns None for the other chunks.
+        """
+        if model['type'] != 'file':
+            raise web.HTTPError(
+                400, 'File type "%s" is not supported for chunked upload' % model['type'])
+
+        chunk = model['chunk']
+        if chunk == 1:
+            self._discard_spool(path)
+            self._spools[path] = tempfile.TemporaryFile()
+
+        spool = self._spools.get(path)
+        if spool is None:
+            raise web.HTTPError(400, 'No chunked upload in progress for: %s' % path)
+
+        stream = self._content_stream(model['content'], model.get('format'))
+        while True:
+            data = stream.read(self.upload_chunk_size)
+            if not data:
+                break
+            spool.write(data)
+
+        if chunk != -1:
+            return None
+
+        del self._spools[path]
+
+        return spool, spool.tell()
+
+    def _discard_spool(self, path):
+        spool = self._spools.pop(path, None)
+        if spool is not None:
+            spool.close()
+
+    def _spooled_model(self, path, type='file', now=None):
+        """
+        The model returned for a save that hasn't reached Girder yet, a chunk of a
+        chunked upload still in progress or a write behind save.
+        """
+        if now is None:
+            now = datetime.datetime.now(dateutil.tz.tzutc())
+
+        return {
+            'name': path.rsplit('/', 1)[-1],
+            'path': path,
+            'type': type,
+            'last_modified': now,
+            'created': now,
+            'content': None,
+            'format': None,
+            'mimetype': None,
+            'writable': True
+        }
+
+    def _upload_parent(self, parent):
+        if self._is_user(parent):
+            msg = "The Girder user's home location may only contain " \
+                'folders. Create or navigate to another folder before ' \
+                'creating or uploading a file.'
+            raise web.HTTPError(400, msg, reason=msg)
+
+        return parent
+
+    @tracing.traced
+    def _create_folders(self, path):
+        """
+        Create all necessary folder for a given path. The deepest ancestor that
+        already exists is looked up first, bottom up, so only the missing folders
+        cost any requests.
+        """
+        parts = path.split('/')
+        with self._folders_lock:
+            depth, current_resource = self._deepest_resource(parts)
+
+            for depth in range(depth + 1, len(parts) + 1):
+                resource_name = parts[depth - 1]
                 # Can't create folder under an item so return permission denied
                 if self._is_item(current_resource):
                     raise web.HTTPError(403, 'Permission denied: %s' % resource_name)
-                current_resource = self.gc.createFolder(current_resource['_id'],
-                                                        resource_name,
-                                                        parentType=current_resource['_modelType'])
-            else:
-                current_resource = next_resource
+
+                current_resource = self.gc.createFolder(
+                    current_resource['_id'], resource_name,
+                    parentType=current_resource['_modelType'], reuseExisting=True)
+                self.resource_cache.set('/'.join(parts[:depth]), current_resource)
 
         return current_resource
 
-    def save(self, model, path):
+    def _deepest_resource(self, parts):
         """
-        Save a file or directory model to path.
-        Should return the saved model with no content.  Save implementations
-        should call self.run_pre_save_hook(model=model, path=path) prior to
-        writing any data.
+        Find the deepest existing resource along a Girder path, returns its depth
+        and the resource. The root (user/<login> or collection/<name>) must exist.
         """
-        path = path.strip('/')
-        girder_path = self._get_girder_path(path)
+        for depth in range(len(parts), 1, -1):
+            resource = self._resource('/'.join(parts[:depth]))
+            if resource is not None:
+                return depth, resource
+
+        raise web.HTTPError(404, 'No such file or directory: %s' % '/'.join(parts[:2]))
 
+    def _check_save(self, model, path):
         if 'type' not in model:
             raise web.HTTPError(400, 'No file type provided')
         if 'content' not in model and model['type'] != 'directory':
@@ -496,11 +1477,108 @@ class GirderContentsManager(ContentsManager):
             if segment.startswith('.'):
                 raise web.HTTPError(400, 'Hidden files and folders are not allowed.')
 
+    def _serialize_notebook(self, model, path):
+        nb = nbformat.from_dict(model['content'])
+        self.check_and_sign(nb, path)
+
+        return nbformat.writes(nb, version=nbformat.NO_CONVERT)
+
+    def _is_queued(self, girder_path):
+        return self.save_queue is not None and girder_path in self.save_queue.pending(girder_path)
+
+    def _queued_model(self, path, girder_path, content=True, type=None, format=None):
+        """
+        The model of a save waiting in the write behind queue, its content read
+        from the journal, or None if there's no save to path waiting.
+        """
+        if self.save_queue is None:
+            return None
+
+        queued = self.save_queue.get(girder_path)
+        if queued is None:
+            return None
+
+        data, mime_type = queued
+        if type == 'directory':
+            raise web.HTTPError(400, '%s is not a directory' % girder_path, reason='bad type')
+        if type is None:
+            type = 'notebook' if path.endswith('.ipynb') else 'file'
+
+        saved = self._queued_saves.get(path)
+        model = self._spooled_model(path, type, saved[1] if saved is not None else None)
+        if type == 'file':
+            model['mimetype'] = mime_type
+
+        if content:
+            if type == 'notebook':
+                nb = nbformat.reads(codecs.decode(data, 'utf8'), as_version=4)
+                message = self.validate_notebook_model({'content': nb}).get('message')
+                self._set_notebook_content(model, path, nb, message)
+            else:
+                model['content'], model['format'] = self._file_content(girder_path, data,
+                                                                       format)
+
+        return model
+
+    def _check_destination(self, girder_path):
+        """
+        Raise the error uploading to girder_path would, before a save to it is
+        journaled, as it can't be reported once the upload is made.
+        """
+        parts = girder_path.split('/')
+        depth, parent = self._deepest_resource(parts[:-1])
+        if depth == len(parts) - 1:
+            self._upload_parent(parent)
+        elif self._is_item(parent):
+            # Folders can't be created in an item
+            raise web.HTTPError(403, 'Permission denied: %s' % parts[depth])
+
+        if not self._has_write_access(parent):
+            raise web.HTTPError(403, 'Permission denied: %s' % girder_path)
+
+    def _queue_save(self, model, path, girder_path):
+        """Journal a save in the write behind queue, returns the saved model."""
+        self._check_destination(girder_path)
+        if model['type'] == 'notebook':
+            stream = TextReader(self._serialize_notebook(model, path))
+            mime_type = 'application/json'
+        else:
+            stream = self._content_stream(model.get('content'), model.get('format'))
+            mime_type = model.get('mimetype')
+
+        sha512 = self.save_queue.put(girder_path, stream, stream.size, mime_type)
+        saved = self._spooled_model(path, model['type'])
+        self._queued_saves[path] = (sha512, saved['last_modified'])
+
+        return saved
+
+    @metrics.operation('save')
+    def save(self, model, path):
+        """
+        Save a file or directory model to path.
+        Should return the saved model with no content.  Save implementations
+        should call self.run_pre_save_hook(model=model, path=path) prior to
+        writing any data.
+        """
+        path = path.strip('/')
+        girder_path = self._get_girder_path(path)
+
+        self._check_save(model, path)
+
+        saved = None
         try:
-            if model['type'] == 'notebook':
-                nb = nbformat.from_dict(model['content'])
-                self.check_and_sign(nb, path)
-                nb = nbformat.writes(nb, version=nbformat.NO_CONVERT)
+            if model.get('chunk') is not None:
+                spooled = self._spool_chunk(model, path)
+                if spooled is None:
+                    return self._spooled_model(path)
+                spool, size = spooled
+                with spool:
+                    self._upload_stream_to_path(spool, size, model.get('mimetype'),
+                                                girder_path)
+            elif self.save_queue is not None and model['type'] in ('notebook', 'file'):
+                saved = self._queue_save(model, path, girder_path)
+            elif model['type'] == 'notebook':
+                nb = self._serialize_notebook(model, path)
                 self._upload_to_path(nb, 'application/json', 'text', girder_path)
             elif model['type'] == 'file':
                 self._upload_to_path(model.get('content'), model.get('mimetype'),
@@ -512,6 +1590,7 @@ class GirderContentsManager(ContentsManager):
         except web.HTTPError:
             raise
         except Exception as e:
+            self._discard_spool(path)
             self.log.error('Error while saving file: %s %s', path, e, exc_info=True)
             raise web.HTTPError(500, 'Unexpected error while saving file: %s %s' % (path, e))
 
@@ -520,28 +1599,45 @@ class GirderContentsManager(ContentsManager):
             self.validate_notebook_model(model)
         validation_message = model.get('message', None)
 
-        model = self.get(path, content=False)
+        if saved is not None:
+            # Getting the model would upload the save now
+            model = saved
+        else:
+            model = self.get(path, content=False)
         model['message'] = validation_message
 
         return model
 
+    @metrics.operation('delete_file')
     def delete_file(self, path, allow_non_empty=False):
         """Delete the file or directory at path."""
         path = path.strip('/')
         girder_path = self._get_girder_path(path)
+        queued = self._is_queued(girder_path)
+        if queued:
+            # It would only be uploaded to be deleted.
+            self.save_queue.discard(girder_path)
+            self._queued_saves.pop(path, None)
+        else:
+            # Saves below a directory are uploaded to tell whether it is empty.
+            self.flush_saves(path)
         resource = self._resource(girder_path)
         if resource is None:
+            if queued:
+                # The file was never uploaded
+                return
             raise web.HTTPError(404, 'Path does not exist: %s' % girder_path)
 
         if self._is_folder(resource):
             # Don't delete non-empty directories.
             # TODO A directory containing only leftover checkpoints is
             # considered empty.
-            resources = self._list_resource(resource)
-            if not allow_non_empty and resources:
+            if not allow_non_empty and \
+                    next(self._list_resource(resource, page_size=1), None) is not None:
                 raise web.HTTPError(400, 'Directory %s not empty' % girder_path)
 
             self.gc.delete('folder/%s' % resource['_id'])
+            self.resource_cache.invalidate(girder_path, recursive=True)
         else:
             name = path.split('/')[-1]
             files = list(self.gc.listFile(resource['_id']))
@@ -559,14 +1655,58 @@ class GirderContentsManager(ContentsManager):
             if len(files):
                 self.gc.delete('item/%s' % resource['_id'])
 
-    def rename_file(self, old_path, new_path):
+            self.resource_cache.invalidate(girder_path)
+
+    def _check_rename(self, old_path, new_path):
+        if new_path.startswith(old_path + '/'):
+            raise web.HTTPError(400, 'Cannot move %s into itself' % old_path)
+
+    def _rename_params(self, resource, name, parent=None):
+        """
+        The Girder update that renames a resource, and moves it into parent if
+        one is given, returns the resource type and the update's parameters.
+        Girder moves a folder's contents along with it.
         """
-        Rename a file or directory.
+        params = {
+            'name': name
+        }
 
-        N.B. Note currently we only support renaming, not moving to another folder.
-        Its not clear that this operation can be performed using rename, it doesn't
-        seem to be exposed through jlab.
+        if self._is_folder(resource):
+            type = 'folder'
+            if parent is not None:
+                if not self._is_type(parent, ['folder', 'user', 'collection']):
+                    raise web.HTTPError(400, 'A directory can only be moved into a directory')
+                params['parentId'] = parent['_id']
+                params['parentType'] = parent['_modelType']
+        elif self._is_item(resource):
+            type = 'item'
+            if parent is not None:
+                if not self._is_folder(parent):
+                    raise web.HTTPError(400, 'A file can only be moved into a folder')
+                params['folderId'] = parent['_id']
+        elif self._is_file(resource):
+            type = 'file'
+            if parent is not None:
+                raise web.HTTPError(400, 'A file can not be moved out of its item')
+        else:
+            raise web.HTTPError(400, 'Cannot rename %s' % resource['_modelType'])
+
+        return type, params
+
+    @metrics.operation('rename_file')
+    def rename_file(self, old_path, new_path):
+        """
+        Rename or move a file or directory. A move updates the resource's parent
+        in the same request as its name, so moving or renaming a directory costs
+        the same however much it contains.
         """
+        old_path = old_path.strip('/')
+        new_path = new_path.strip('/')
+        if new_path == old_path:
+            return
+        self._check_rename(old_path, new_path)
+        self.flush_saves(old_path)
+
         girder_path = self._get_girder_path(old_path)
         resource = self._resource(girder_path)
         if resource is None:
@@ -578,31 +1718,176 @@ class GirderContentsManager(ContentsManager):
         if existing_resource is not None:
             raise web.HTTPError(409, u'File already exists: %s' % new_path)
 
-        def _update_name(type, resource, name):
-            params = {
-                'name': name
-            }
-            self.gc.put('%s/%s' % (type, resource['_id']), params)
+        parent = None
+        if os.path.dirname(old_path) != os.path.dirname(new_path):
+            parent_path = self._get_girder_path(os.path.dirname(new_path))
+            parent = self._resource(parent_path)
+            if parent is None:
+                raise web.HTTPError(404, 'No such directory: %s' % parent_path)
 
         name = os.path.basename(new_path)
-        if self._is_folder(resource):
-            _update_name('folder', resource, name)
-        elif self._is_file(resource):
-            _update_name('file', resource, name)
-        elif self._is_item(resource):
-            item_id = resource['_id']
-            item = self.gc.getItem(item_id)
-            files = list(self.gc.listFile(item_id))
-            _update_name('item', resource, name)
-            # If we have one file and the names match then rename both.
-            # This may or may not be the right behavior.
-            if len(files) == 1 and item['name'] == resource['name']:
-                _update_name('file', files[0], name)
+        type, params = self._rename_params(resource, name, parent)
+
+        # An item containing just the file of the same name is presented as that
+        # file, so the file is renamed along with it.
+        item_file = None
+        if self._is_item(resource) and name != resource['name']:
+            item_file = self._container_file(resource['name'],
+                                             list(self.gc.listFile(resource['_id'])))
+
+        self.gc.put('%s/%s' % (type, resource['_id']), params)
+        if item_file is not None:
+            self.gc.put('file/%s' % item_file['_id'], {'name': name})
+
+        self.resource_cache.invalidate(girder_path, recursive=True)
+        self.resource_cache.invalidate(new_girder_path, recursive=True)
 
     def delete(self, path):
         """Delete a file/directory and any associated checkpoints."""
         self.delete_file(path, allow_non_empty=True)
+        self.checkpoints.delete_all_checkpoints(path)
 
     def rename(self, old_path, new_path):
         """Rename a file and any checkpoints associated with that file."""
         self.rename_file(old_path, new_path)
+        self.checkpoints.rename_all_checkpoints(old_path, new_path)
+
+    def _local_uploads(self, local_dir, path):
+        """
+        Walk a local directory to upload into path, returns the Girder paths of
+        the empty directories to create and the (local path, Girder path) pairs
+        of the files to upload.
+        """
+        path = path.strip('/')
+        folders = []
+        uploads = []
+        for dirpath, dirnames, filenames in os.walk(local_dir):
+            relpath = os.path.relpath(dirpath, local_dir)
+            parts = [path] if relpath == os.curdir else [path] + relpath.split(os.sep)
+            dir_path = '/'.join(part for part in parts if part)
+            if not dirnames and not filenames:
+                folders.append(self._get_girder_path(dir_path))
+            for filename in filenames:
+                uploads.append((os.path.join(dirpath, filename),
+                                self._get_girder_path('/'.join(
+                                    part for part in (dir_path, filename) if part))))
+
+        return folders, uploads
+
+    def _makedirs(self, local_dir):
+        try:
+            os.makedirs(local_dir)
+        except OSError:
+            if not os.path.isdir(local_dir):
+                raise
+
+    def _throughput(self, action, path, count, size, seconds):
+        stats = {
+            'files': count,
+            'bytes': size,
+            'seconds': seconds,
+            'bytes_per_second': size / seconds if seconds > 0 else 0.0
+        }
+        self.log.info('%s %d files (%d bytes) for %s in %.2fs, %.2f MB/s', action, count,
+                      size, path, seconds, stats['bytes_per_second'] / (1024 * 1024))
+
+        return stats
+
+    def _transfer(self, transfer, transfers):
+        """
+        Call transfer for each of transfers, on a pool of bulk_concurrency
+        threads. transfer returns the number of bytes it transferred.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.bulk_concurrency)) as executor:
+            return sum(executor.map(tracing.bind(lambda args: transfer(*args)), transfers))
+
+    def _upload_local_file(self, local_path, girder_path):
+        size = os.path.getsize(local_path)
+        with open(local_path, 'rb') as stream:
+            self._upload_stream_to_path(stream, size, None, girder_path)
+
+        return size
+
+    def _download_local_file(self, file, local_path):
+        self.gc.downloadFile(file['_id'], local_path)
+
+        return os.path.getsize(local_path)
+
+    def _walk_tree(self, resource, files, path=''):
+        """
+        Generate the (path, file) pairs of the contents of a folder or item,
+        relative to it and starting with path, file is None for directories.
+        Only what a directory listing would show is included.
+        """
+        yield path, None
+
+        if self._is_item(resource):
+            for file in self._item_files(resource['_id'], files):
+                yield self._join(path, file['name']), file
+            return
+
+        children = [child for child in self._list_resource(resource)
+                    if self.should_list(child['name']) and not child['name'].startswith('.')]
+        self._prefetch_item_files(
+            [child['_id'] for child in children if self._is_item(child)], files)
+
+        for child in children:
+            child_path = self._join(path, child['name'])
+            item_file = None
+            if self._is_item(child):
+                item_file = self._container_file(child['name'], files[child['_id']])
+            if item_file is not None:
+                yield child_path, item_file
+            else:
+                for entry in self._walk_tree(child, files, child_path):
+                    yield entry
+
+    def _join(self, path, name):
+        return '%s/%s' % (path, name) if path else name
+
+    def _download_tree(self, resource, local_dir, files):
+        """
+        Generate the (file, local path) pairs to download the contents of a folder
+        or item into local_dir, creating the local directories as it goes.
+        """
+        for path, file in self._walk_tree(resource, files):
+            local_path = os.path.join(local_dir, *path.split('/')) if path else local_dir
+            if file is None:
+                self._makedirs(local_path)
+            else:
+                yield file, local_path
+
+    def bulk_upload(self, local_dir, path=''):
+        """
+        Upload the contents of a local directory into the directory at path,
+        bulk_concurrency files at a time.
+
+        :returns: A dict of the number of files and bytes uploaded, the time
+            taken in seconds and the throughput in bytes per second.
+        """
+        start = time.time()
+        folders, uploads = self._local_uploads(local_dir, path)
+        for folder in folders:
+            self._create_folders(folder)
+        size = self._transfer(self._upload_local_file, uploads)
+
+        return self._throughput('Uploaded', path, len(uploads), size, time.time() - start)
+
+    def bulk_download(self, path, local_dir):
+        """
+        Download the contents of the directory at path into a local directory,
+        bulk_concurrency files at a time.
+
+        :returns: A dict of the number of files and bytes downloaded, the time
+            taken in seconds and the throughput in bytes per second.
+        """
+        start = time.time()
+        path = path.strip('/')
+        girder_path = self._get_girder_path(path)
+        resource = self._resource(girder_path)
+        if not self._is_type(resource, ['item', 'folder', 'user']):
+            raise web.HTTPError(404, 'No such directory: %s' % girder_path)
+        downloads = list(self._download_tree(resource, local_dir, {}))
+        size = self._transfer(self._download_local_file, downloads)
+
+        return self._throughput('Downloaded', path, len(downloads), size, time.time() - start)
@@ -0,0 +1,138 @@
+"""
+Prometheus metrics of the contents managers and the requests they make of
+Girder. They are registered with the default registry, which the notebook
+server exposes at /metrics.
+"""
+import functools
+import re
+import time
+
+from prometheus_client import Counter, Histogram
+
+from . import tracing
+
+OPERATION_DURATION_SECONDS = Histogram(
+    'girder_jupyter_operation_duration_seconds',
+    'Duration in seconds of contents manager operations',
+    ['operation', 'status']
+)
+
+OPERATION_GIRDER_REQUESTS = Histogram(
+    'girder_jupyter_operation_girder_requests',
+    'The number of Girder requests made by each contents manager operation',
+    ['operation'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, float('inf'))
+)
+
+GIRDER_REQUEST_DURATION_SECONDS = Histogram(
+    'girder_jupyter_girder_request_duration_seconds',
+    'Duration in seconds of requests made to Girder',
+    ['method', 'endpoint', 'status_code']
+)
+
+GIRDER_BYTES = Counter(
+    'girder_jupyter_girder_bytes',
+    'Bytes sent to and received from Girder',
+    ['direction']
+)
+
+CACHE_LOOKUPS = Counter(
+    'girder_jupyter_cache_lookups',
+    'Lookups in the contents manager caches',
+    ['cache', 'result']
+)
+
+CACHE_INVALIDATIONS = Counter(
+    'girder_jupyter_cache_invalidations',
+    'Cache entries dropped because their resources changed in Girder',
+    ['cache', 'source']
+)
+
+# Girder ids are mongo ObjectIds
+_ID_RE = re.compile(r'/[0-9a-f]{24}(?=/|$)')
+
+
+def endpoint(path):
+    """The Girder endpoint of a path relative to the API root, without ids."""
+    path = path.split('?', 1)[0].strip('/')
+
+    return _ID_RE.sub('/{id}', '/' + path)[1:]
+
+
+class track(object):
+    """
+    A context manager recording the duration and Girder requests of a contents
+    manager operation. Operations made by another one, like a save calling get,
+    are part of the outer operation.
+
+    owner is the contents manager, the operation is traced if its
+    trace_operations is set, and is passed to its _operation_finished.
+    """
+
+    def __init__(self, name, owner=None):
+        self.name = name
+        self.owner = owner
+        self.operation = None
+
+    def __enter__(self):
+        if tracing.current_operation() is None:
+            self.operation = tracing.Operation(
+                self.name, trace=getattr(self.owner, 'trace_operations', False))
+            self._token = tracing.enter(self.operation)
+            self._start = time.time()
+
+        return self.operation
+
+    def __exit__(self, type, value, traceback):
+        if self.operation is None:
+            return
+
+        tracing.exit(self._token)
+        status = 'ok' if type is None else 'error'
+        self.operation.finish(status, time.time() - self._start)
+        OPERATION_DURATION_SECONDS.labels(self.name, status).observe(self.operation.seconds)
+        OPERATION_GIRDER_REQUESTS.labels(self.name).observe(
+            self.operation.girder_requests)
+
+        finished = getattr(self.owner, '_operation_finished', None)
+        if finished is not None:
+            finished(self.operation)
+
+
+def operation(name):
+    """Decorate a contents manager method to be tracked as an operation."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with track(name, self):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def girder_request(method, path, status_code, seconds, sent=0, received=0):
+    """Record a request made to Girder, path being relative to the API root."""
+    GIRDER_REQUEST_DURATION_SECONDS.labels(method, endpoint(path), status_code).observe(
+        seconds)
+    if sent:
+        GIRDER_BYTES.labels('sent').inc(sent)
+    if received:
+        GIRDER_BYTES.labels('received').inc(received)
+
+    operation = tracing.current_operation()
+    if operation is not None:
+        name = endpoint(path)
+        operation.count_request(method, name)
+        tracing.record('%s %s' % (method, name), seconds, status=status_code,
+                       sent=sent, received=received)
+
+
+def cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def cache_invalidation(cache, source, count):
+    if count:
+        CACHE_INVALIDATIONS.labels(cache, source).inc(count)
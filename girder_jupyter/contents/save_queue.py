@@ -0,0 +1,307 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+TMP_PREFIX = '.tmp-'
+JOURNAL_SUFFIX = '.journal'
+# Saves Girder refused are kept under this suffix, and not retried.
+FAILED_SUFFIX = '.failed'
+
+
+def _refused(e):
+    """Was an upload refused by Girder, or the contents manager, with a 4xx?"""
+    status = getattr(e, 'status', None) or getattr(e, 'status_code', None)
+
+    return isinstance(status, int) and 400 <= status < 500
+
+
+class JournalReader(object):
+    """
+    A read only, seekable, stream over the contents saved in a journal file,
+    which follow a one line JSON header.
+    """
+
+    def __init__(self, f, offset, size):
+        self._f = f
+        self._start = offset
+        self.size = size
+        f.seek(offset)
+
+    def seek(self, offset):
+        self._f.seek(self._start + offset)
+
+    def tell(self):
+        return self._f.tell() - self._start
+
+    def read(self, size=-1):
+        remaining = self.size - self.tell()
+        if size < 0 or size > remaining:
+            size = remaining
+
+        return self._f.read(size)
+
+
+class SaveQueue(object):
+    """
+    A write behind queue of saves. Saving writes the content to a journal file
+    in a local directory, fsynced before returning, and a background thread
+    uploads it ``delay`` seconds later. Saves made to the same path in the
+    meantime replace the journaled content, so only the latest version is
+    uploaded.
+
+    Journal files are removed once uploaded, any left behind by a server that
+    stopped before uploading them are uploaded when the queue is next created.
+
+    upload is called with (stream, size, mime_type, path), as
+    GirderContentsManager._upload_stream_to_path is.
+    """
+
+    def __init__(self, directory, upload, delay=2.0, retry_delay=10.0, log=None,
+                 clock=time.time):
+        self.directory = directory
+        self.delay = delay
+        self.retry_delay = retry_delay
+        self.log = log or logging.getLogger(__name__)
+        self.saves = 0
+        self.uploads = 0
+        self._upload = upload
+        self._clock = clock
+        self._versions = itertools.count()
+        # path -> (version, upload deadline)
+        self._pending = {}
+        self._cond = threading.Condition()
+        # Uploads are made one at a time, by the worker or a flush.
+        self._upload_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+        self._replay()
+
+    def _journal_path(self, path):
+        name = hashlib.sha256(path.encode('utf8')).hexdigest()
+
+        return os.path.join(self.directory, name + JOURNAL_SUFFIX)
+
+    def _replay(self):
+        for name in os.listdir(self.directory):
+            if not name.endswith(JOURNAL_SUFFIX):
+                continue
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                header = json.loads(f.readline().decode('utf8'))
+            self.log.info('Uploading unsaved changes to %s', header['path'])
+            self._pending[header['path']] = (header['version'], self._clock())
+
+        if self._pending:
+            # New versions must not collide with the journaled ones.
+            self._versions = itertools.count(
+                max(version for version, _ in self._pending.values()) + 1)
+            self._start()
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='girder-save-queue')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def put(self, path, stream, size, mime_type=None):
+        """
+        Journal the content of a save to path, it is uploaded after the delay.
+        Returns the sha512 of the content.
+        """
+        if self._closed:
+            raise RuntimeError('The save queue is closed')
+
+        with self._cond:
+            version = next(self._versions)
+            header = json.dumps({
+                'path': path,
+                'version': version,
+                'size': size,
+                'mimeType': mime_type
+            })
+            sha512 = hashlib.sha512()
+            fd, tmp_path = tempfile.mkstemp(prefix=TMP_PREFIX, dir=self.directory)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(header.encode('utf8') + b'\n')
+                    stream.seek(0)
+                    while True:
+                        data = stream.read(1024 * 1024)
+                        if not data:
+                            break
+                        sha512.update(data)
+                        f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.rename(tmp_path, self._journal_path(path))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            # The first save of a burst sets when it is uploaded.
+            pending = self._pending.get(path)
+            deadline = pending[1] if pending is not None else self._clock() + self.delay
+            self._pending[path] = (version, deadline)
+            self.saves += 1
+            self._cond.notify()
+
+        self._start()
+
+        return sha512.hexdigest()
+
+    def pending(self, path=None):
+        """The paths with saves waiting to be uploaded, below path if given."""
+        with self._cond:
+            return [p for p in self._pending if path is None or self._below(p, path)]
+
+    def _below(self, p, path):
+        return p == path or p.startswith(path.rstrip('/') + '/')
+
+    def get(self, path):
+        """
+        The latest content saved to path that is waiting to be uploaded, as a
+        (data, mime_type) tuple, or None if there isn't any.
+        """
+        with self._cond:
+            if path not in self._pending:
+                return None
+            # The journal may be replaced or removed once the lock is released,
+            # the open file keeps the version read.
+            f = open(self._journal_path(path), 'rb')
+
+        with f:
+            header = json.loads(f.readline().decode('utf8'))
+            data = f.read(header['size'])
+
+        return data, header['mimeType']
+
+    def discard(self, path):
+        """Drop the save to path waiting to be uploaded, if any."""
+        with self._upload_lock:
+            with self._cond:
+                if self._pending.pop(path, None) is not None:
+                    os.remove(self._journal_path(path))
+
+    def flush(self, path=None, recursive=False):
+        """
+        Upload the pending saves now, of just path if given (and the paths below
+        it if recursive is True). Upload errors are raised.
+        """
+        with self._cond:
+            if path is None:
+                paths = list(self._pending)
+            elif recursive:
+                paths = [p for p in self._pending if self._below(p, path)]
+            else:
+                paths = [path] if path in self._pending else []
+
+        for p in paths:
+            self._upload_path(p)
+
+    def _upload_path(self, path):
+        with self._upload_lock:
+            journal_path = self._journal_path(path)
+            with self._cond:
+                if path not in self._pending:
+                    # Uploaded by someone else while we waited
+                    return
+                f = open(journal_path, 'rb')
+
+            with f:
+                header = json.loads(f.readline().decode('utf8'))
+                stream = JournalReader(f, f.tell(), header['size'])
+                self._upload(stream, header['size'], header['mimeType'], path)
+
+            with self._cond:
+                self.uploads += 1
+                # Keep the journal if the path was saved again during the upload.
+                if self._pending.get(path, (None,))[0] == header['version']:
+                    del self._pending[path]
+                    os.remove(journal_path)
+
+    def _due(self):
+        now = self._clock()
+        due = [path for path, (_, deadline) in self._pending.items() if deadline <= now]
+        if due or not self._pending:
+            return due, None
+
+        return due, min(deadline for _, deadline in self._pending.values()) - now
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due, timeout = self._due()
+                while not due and not self._closed:
+                    self._cond.wait(timeout)
+                    due, timeout = self._due()
+                if self._closed:
+                    return
+
+            for path in due:
+                with self._cond:
+                    version = self._pending.get(path, (None,))[0]
+                try:
+                    self._upload_path(path)
+                except Exception as e:  # noqa: B902
+                    if _refused(e):
+                        self._park(path, version, e)
+                        continue
+                    self.log.exception('Error uploading %s, retrying in %ss', path,
+                                       self.retry_delay)
+                    with self._cond:
+                        if path in self._pending:
+                            version, _ = self._pending[path]
+                            self._pending[path] = (version, self._clock() + self.retry_delay)
+
+    def _park(self, path, version, error):
+        """
+        Stop trying to upload a save that was refused, its journal is renamed
+        so it isn't replayed but can still be recovered.
+        """
+        with self._cond:
+            if self._pending.get(path, (None,))[0] != version:
+                # Saved again since, the new version gets its own chance.
+                return
+            del self._pending[path]
+            journal_path = self._journal_path(path)
+            failed_path = journal_path[:-len(JOURNAL_SUFFIX)] + FAILED_SUFFIX
+            os.rename(journal_path, failed_path)
+
+        self.log.error('Girder refused the save to %s, it is kept in %s: %s', path,
+                       failed_path, error)
+
+    def close(self):
+        """
+        Upload everything pending and stop the worker. Saves that fail to upload
+        stay in the journal.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+        try:
+            self.flush()
+        except Exception:  # noqa: B902
+            self.log.exception('Error uploading pending saves, they are kept in %s',
+                               self.directory)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'saves': self.saves,
+                'uploads': self.uploads,
+                'pending': len(self._pending)
+            }
@@ -0,0 +1,51 @@
+import datetime
+import re
+
+import dateutil.parser
+import dateutil.tz
+
+# The format Girder serializes its timestamps in, e.g. 2018-01-01T12:00:00.123000+00:00
+_TIMESTAMP_RE = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?'
+    r'(Z|([+-])(\d{2}):?(\d{2}))?$')
+
+_UTC = dateutil.tz.tzutc()
+
+_MEMO_SIZE = 4096
+_memo = {}
+
+
+def _parse(timestamp):
+    match = _TIMESTAMP_RE.match(timestamp)
+    if match is None:
+        return dateutil.parser.parse(timestamp)
+
+    (year, month, day, hour, minute, second, fraction,
+     zone, sign, zone_hours, zone_minutes) = match.groups()
+
+    tzinfo = None
+    if zone is not None:
+        offset = 0 if zone == 'Z' else int(zone_hours) * 3600 + int(zone_minutes) * 60
+        if offset == 0:
+            tzinfo = _UTC
+        else:
+            tzinfo = dateutil.tz.tzoffset(None, -offset if sign == '-' else offset)
+
+    return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute),
+                             int(second), int((fraction or '0').ljust(6, '0')), tzinfo)
+
+
+def parse_timestamp(timestamp):
+    """
+    Parse a Girder timestamp. Girder always emits the same ISO 8601 format, so
+    that is parsed with a precompiled expression, anything else falls back to
+    dateutil. Results are memoized as listings repeat the same timestamps.
+    """
+    parsed = _memo.get(timestamp)
+    if parsed is None:
+        parsed = _parse(timestamp)
+        if len(_memo) >= _MEMO_SIZE:
+            _memo.clear()
+        _memo[timestamp] = parsed
+
+    return parsed
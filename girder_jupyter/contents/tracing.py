@@ -0,0 +1,246 @@
+"""
+The contents manager operation in progress, and the tree of spans it is
+traced as when tracing is enabled: the manager methods it calls, down to the
+requests made to Girder, with their timings and payload sizes.
+"""
+import collections
+import functools
+import inspect
+import threading
+import time
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+
+class Span(object):
+
+    def __init__(self, name, attrs=None, start=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.time() if start is None else start
+        self.seconds = None
+        self.children = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        # Children may be added from several threads or coroutines at once.
+        with self._lock:
+            self.children.append(span)
+
+    def finish(self):
+        self.seconds = time.time() - self.start
+
+    def to_dict(self):
+        span = {
+            'name': self.name,
+            'ms': round((self.seconds or 0) * 1000, 3)
+        }
+        span.update(self.attrs)
+        if self.children:
+            span['children'] = [child.to_dict()
+                                for child in sorted(self.children, key=lambda c: c.start)]
+
+        return span
+
+
+class Operation(object):
+    """
+    A contents manager operation in progress, counting the Girder requests it
+    makes by method and endpoint. If trace is True its spans are recorded
+    under the root span.
+    """
+
+    def __init__(self, name, trace=False):
+        self.name = name
+        self.requests = collections.Counter()
+        self.root = Span(name) if trace else None
+        self.seconds = None
+        self.status = None
+        self._lock = threading.Lock()
+
+    @property
+    def girder_requests(self):
+        return sum(self.requests.values())
+
+    def count_request(self, method, endpoint):
+        with self._lock:
+            self.requests['%s %s' % (method, endpoint)] += 1
+
+    def finish(self, status, seconds):
+        self.status = status
+        self.seconds = seconds
+        if self.root is not None:
+            self.root.seconds = seconds
+
+    def to_dict(self):
+        operation = {
+            'operation': self.name,
+            'status': self.status,
+            'ms': round((self.seconds or 0) * 1000, 3),
+            'girder_requests': self.girder_requests,
+            'requests': dict(self.requests)
+        }
+        if self.root is not None:
+            operation['trace'] = self.root.to_dict().get('children', [])
+
+        return operation
+
+
+# The current (operation, span), which follows coroutines where contextvars
+# are available.
+if contextvars is not None:
+    _current = contextvars.ContextVar('girder_jupyter_operation', default=(None, None))
+
+    def _get():
+        return _current.get()
+
+    def _set(current):
+        return _current.set(current)
+
+    def _reset(token):
+        _current.reset(token)
+
+    def bind(func):
+        """Wrap func to run in the current operation, from another thread."""
+        context = contextvars.copy_context()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return context.copy().run(func, *args, **kwargs)
+
+        return wrapper
+else:
+    _local = threading.local()
+
+    def _get():
+        return getattr(_local, 'current', (None, None))
+
+    def _set(current):
+        previous = _get()
+        _local.current = current
+        return previous
+
+    def _reset(previous):
+        _local.current = previous
+
+    def bind(func):
+        """Wrap func to run in the current operation, from another thread."""
+        current = _get()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            previous = _set(current)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _reset(previous)
+
+        return wrapper
+
+
+def current_operation():
+    return _get()[0]
+
+
+def enter(operation):
+    """Make operation the current one, returns a token to pass to exit."""
+    return _set((operation, operation.root))
+
+
+def exit(token):
+    _reset(token)
+
+
+class span(object):
+    """
+    A context manager timing a span of the current operation, if it is being
+    traced, as a child of the current span.
+    """
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.span = None
+
+    def __enter__(self):
+        operation, parent = _get()
+        if parent is not None:
+            self.span = Span(self.name, self.attrs)
+            parent.add(self.span)
+            self._token = _set((operation, self.span))
+
+        return self.span
+
+    def __exit__(self, *args):
+        if self.span is not None:
+            self.span.finish()
+            _reset(self._token)
+
+
+def traced(func):
+    """
+    Decorate a method to be traced as a span named after it. The span of a
+    generator lasts until it is exhausted.
+    """
+    if inspect.isgeneratorfunction(func):
+        return _traced_generator(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _get()[1] is None:
+            return func(*args, **kwargs)
+
+        with span(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _traced_generator(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        operation, parent = _get()
+        if parent is None:
+            for value in func(*args, **kwargs):
+                yield value
+            return
+
+        current = Span(func.__name__)
+        parent.add(current)
+        generator = func(*args, **kwargs)
+        try:
+            while True:
+                # The span is only current while the generator runs, not while
+                # its caller handles what it yields.
+                token = _set((operation, current))
+                try:
+                    value = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    _reset(token)
+                yield value
+        finally:
+            current.finish()
+            generator.close()
+
+    return wrapper
+
+
+def annotate(**attrs):
+    """Add attributes, like payload sizes, to the current span."""
+    current = _get()[1]
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def record(name, seconds, **attrs):
+    """Record a span that has just finished, like a Girder request."""
+    parent = _get()[1]
+    if parent is not None:
+        child = Span(name, attrs, start=time.time() - seconds)
+        child.seconds = seconds
+        parent.add(child)
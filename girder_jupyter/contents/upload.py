@@ -0,0 +1,121 @@
+import base64
+
+
+class Base64Reader(object):
+    """
+    A read only, seekable, stream over the bytes encoded in a base64 string.
+    Only the requested part of the string is decoded on each read.
+    """
+
+    def __init__(self, content):
+        if '\n' in content or '\r' in content:
+            content = content.replace('\n', '').replace('\r', '')
+        self._content = content
+        self._offset = 0
+        self.size = len(content) // 4 * 3 - content[-2:].count('=')
+
+    def seek(self, offset):
+        self._offset = offset
+
+    def tell(self):
+        return self._offset
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.size
+        size = min(size, self.size - self._offset)
+        if size <= 0:
+            return b''
+
+        # Decode whole 4 character groups covering the requested range
+        start = self._offset // 3 * 4
+        end = -(-(self._offset + size) // 3) * 4
+        skip = self._offset % 3
+        data = base64.b64decode(self._content[start:end])[skip:skip + size]
+        self._offset += len(data)
+
+        return data
+
+
+class TextReader(object):
+    """
+    A read only stream over the UTF-8 encoding of a string, the string is
+    encoded a slice at a time as it is read.
+    """
+
+    def __init__(self, content, chunk_chars=1024 * 1024):
+        self._content = content
+        self._chunk_chars = chunk_chars
+        self.size = sum(len(part.encode('utf8')) for part in self._slices())
+        self._rewind()
+
+    def _slices(self):
+        for i in range(0, len(self._content), self._chunk_chars):
+            yield self._content[i:i + self._chunk_chars]
+
+    def _rewind(self):
+        self._offset = 0
+        self._buffer = b''
+        self._parts = (part.encode('utf8') for part in self._slices())
+
+    def seek(self, offset):
+        # Seeking backwards only happens when resuming an upload, so just start over.
+        if offset < self._offset:
+            self._rewind()
+        while self._offset < offset:
+            if not self.read(min(offset - self._offset, self._chunk_chars)):
+                break
+
+    def tell(self):
+        return self._offset
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.size
+        while len(self._buffer) < size:
+            part = next(self._parts, None)
+            if part is None:
+                break
+            self._buffer += part
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self._offset += len(data)
+
+        return data
+
+
+def upload_chunks(gc, upload, stream, size, chunk_size, max_retries=3, log=None):
+    """
+    Upload the contents of stream to an upload initialized with Girder, one
+    chunk at a time using Girder's chunked upload protocol (``file/chunk``).
+    If sending a chunk fails, the offset Girder has acknowledged is requested
+    and the upload resumes from there, up to max_retries times in a row.
+
+    :returns: The file document once the upload is complete.
+    """
+    import requests
+
+    upload_id = upload['_id']
+    offset = 0
+    retries = 0
+    while offset < size:
+        stream.seek(offset)
+        chunk = stream.read(min(chunk_size, size - offset))
+        try:
+            upload = gc.post('file/chunk', parameters={
+                'offset': offset,
+                'uploadId': upload_id
+            }, data=chunk)
+        except requests.RequestException as e:
+            if retries >= max_retries:
+                raise
+            retries += 1
+            offset = gc.get('file/offset', {'uploadId': upload_id})['offset']
+            if log is not None:
+                log.warning('Upload %s failed (%s), resuming at offset %d',
+                            upload_id, e, offset)
+            continue
+
+        offset += len(chunk)
+        retries = 0
+
+    return upload
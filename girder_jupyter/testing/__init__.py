@@ -0,0 +1,2 @@
+from .budget import request_budget  # noqa: F401
+from .fake_girder import FakeGirder  # noqa: F401
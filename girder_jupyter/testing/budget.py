@@ -0,0 +1,41 @@
+import json
+
+from girder_jupyter.contents import tracing
+
+
+class request_budget(object):
+    """
+    A context manager failing a test if the contents manager makes more than
+    max_requests requests of Girder within it, the failure lists them by
+    endpoint::
+
+        with request_budget(4):
+            manager.get('data/a.txt')
+
+    The operations made within it are counted together, as a single one. With
+    trace=True they are traced, and the span tree is part of the failure.
+    """
+
+    def __init__(self, max_requests, trace=False):
+        self.max_requests = max_requests
+        self.operation = tracing.Operation('request_budget', trace=trace)
+
+    def __enter__(self):
+        self._token = tracing.enter(self.operation)
+
+        return self.operation
+
+    def __exit__(self, type, value, traceback):
+        tracing.exit(self._token)
+        if type is not None:
+            return
+
+        if self.operation.girder_requests > self.max_requests:
+            requests = '\n'.join('    %s: %d' % request
+                                 for request in sorted(self.operation.requests.items()))
+            message = '%d Girder requests were made, the budget is %d:\n%s' % (
+                self.operation.girder_requests, self.max_requests, requests)
+            if self.operation.root is not None:
+                message += '\n' + json.dumps(self.operation.to_dict()['trace'], indent=2)
+
+            raise AssertionError(message)
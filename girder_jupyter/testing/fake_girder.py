@@ -0,0 +1,539 @@
+import collections
+import datetime
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import parse_qsl, urlsplit
+
+API_ROOT = '/api/v1/'
+DEFAULT_LIMIT = 50
+
+
+class FakeGirderError(Exception):
+
+    def __init__(self, status, message):
+        super(FakeGirderError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _timestamp():
+    return datetime.datetime.utcnow().isoformat() + '+00:00'
+
+
+def _true(value):
+    return str(value).lower() == 'true'
+
+
+def _page(docs, params):
+    offset = int(params.get('offset') or 0)
+    limit = int(params.get('limit') if params.get('limit') is not None else DEFAULT_LIMIT)
+    sort = params.get('sort') or 'name'
+    docs = sorted(docs, key=lambda doc: doc[sort].lower() if sort == 'name' else doc[sort],
+                  reverse=str(params.get('sortdir')) == '-1')[offset:]
+
+    return docs[:limit] if limit else docs
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one write, rather than waiting on delayed ACKs.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        self.server.girder._handle(self)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def route(method, pattern):
+    def decorator(func):
+        func.route = (method, pattern)
+        return func
+
+    return decorator
+
+
+class FakeGirder(object):
+    """
+    An in-memory Girder serving the subset of its REST API the contents
+    managers use, from a background thread, so they can be tested and
+    benchmarked without a real Girder:
+
+        with FakeGirder(latency=0.005) as girder:
+            girder.add_folder(girder.user, 'data')
+            manager = GirderContentsManager(api_url=girder.api_url, root='user/user')
+
+    Every request waits ``latency`` seconds before it is answered, and is
+    counted in ``requests`` by its method and route, e.g. ``GET item/{id}/files``.
+    """
+
+    def __init__(self, login='user', latency=0.0):
+        self.latency = latency
+        self.requests = collections.Counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._docs = {}
+        # parent id -> the ids of the folders, items or files in it
+        self._index = collections.defaultdict(set)
+        self._contents = {}
+        self._uploads = {}
+        self._notifications = []
+        self._routes = self._compile_routes()
+        self._server = None
+        self._thread = None
+        self.user = self._add('user', {'login': login, 'name': login, '_accessLevel': 2})
+
+    def _compile_routes(self):
+        routes = []
+        for name in dir(type(self)):
+            method, pattern = getattr(getattr(type(self), name), 'route', (None, None))
+            if method is None:
+                continue
+            regex = re.compile('^%s$' % pattern.replace('{id}', '([^/]+)'))
+            routes.append((method, regex, pattern, getattr(self, name)))
+
+        # Literal routes, like file/offset, take precedence over file/{id}.
+        return sorted(routes, key=lambda route: '{id}' in route[2])
+
+    def start(self):
+        self._server = _Server(('127.0.0.1', 0), _RequestHandler)
+        self._server.girder = self
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={'poll_interval': 0.05}, name='fake-girder')
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def api_url(self):
+        host, port = self._server.server_address
+
+        return 'http://%s:%d%s' % (host, port, API_ROOT.rstrip('/'))
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    def reset_requests(self):
+        with self._lock:
+            self.requests.clear()
+
+    # Populating the fake, these calls aren't counted as requests.
+
+    def add_folder(self, parent, name):
+        return self._create_folder(parent, name)
+
+    def add_item(self, folder, name):
+        return self._create_item(folder, name)
+
+    def add_file(self, item, name, contents, mime_type=None):
+        return self._store_file(None, item['_id'], name, contents, mime_type)
+
+    def add_path(self, path, contents, mime_type=None):
+        """
+        Add a file at a path below the user's home, creating the folders and
+        item it is in. Returns the file.
+        """
+        parts = path.strip('/').split('/')
+        with self._lock:
+            parent = self.user
+            for name in parts[:-1]:
+                parent = self._child(parent, name) or self._create_folder(parent, name)
+            item = self._child(parent, parts[-1]) or self._create_item(parent, parts[-1])
+
+            return self._store_file(None, item['_id'], parts[-1], contents, mime_type)
+
+    def contents(self, file_id):
+        return bytes(self._contents[file_id])
+
+    # The model
+
+    def _add(self, model_type, doc):
+        now = _timestamp()
+        doc = dict(doc, _id='%024x' % next(self._ids), _modelType=model_type,
+                   created=now, updated=now)
+        self._docs[doc['_id']] = doc
+        self._index[self._parent_id(doc)].add(doc['_id'])
+
+        return doc
+
+    def _parent_id(self, doc):
+        return doc.get('parentId') or doc.get('folderId') or doc.get('itemId')
+
+    def _move(self, doc, **fields):
+        self._index[self._parent_id(doc)].discard(doc['_id'])
+        doc.update(fields, updated=_timestamp())
+        self._index[self._parent_id(doc)].add(doc['_id'])
+
+    def _load(self, id, model_type):
+        doc = self._docs.get(id)
+        if doc is None or doc['_modelType'] != model_type:
+            raise FakeGirderError(400, 'Invalid %s id (%s).' % (model_type, id))
+
+        return doc
+
+    def _children(self, parent, model_type=None):
+        children = [self._docs[id] for id in self._index[parent['_id']]]
+        if model_type is not None:
+            children = [doc for doc in children if doc['_modelType'] == model_type]
+
+        return children
+
+    def _child(self, parent, name):
+        return next((doc for doc in self._children(parent) if doc['name'] == name), None)
+
+    def _create_folder(self, parent, name):
+        return self._add('folder', {
+            'name': name,
+            'parentId': parent['_id'],
+            'parentCollection': parent['_modelType'],
+            '_accessLevel': 2
+        })
+
+    def _create_item(self, folder, name):
+        return self._add('item', {'name': name, 'folderId': folder['_id']})
+
+    def _store_file(self, file_id, item_id, name, contents, mime_type):
+        contents = bytes(contents)
+        fields = {
+            'name': name,
+            'itemId': item_id,
+            'size': len(contents),
+            'mimeType': mime_type or 'application/octet-stream',
+            'sha512': hashlib.sha512(contents).hexdigest()
+        }
+        if file_id is None:
+            file = self._add('file', fields)
+        else:
+            file = self._load(file_id, 'file')
+            file.update(fields, updated=_timestamp())
+        self._contents[file['_id']] = contents
+        self._docs[item_id]['updated'] = file['updated']
+
+        return file
+
+    def notify(self, type, data):
+        """
+        Send a notification to the user, read by the next request of the
+        notification stream.
+        """
+        with self._lock:
+            self._notifications.append({
+                '_id': '%024x' % next(self._ids),
+                'type': type,
+                'data': data,
+                'time': int(time.time()),
+                'userId': self.user['_id']
+            })
+
+    def _remove(self, doc):
+        for child in self._children(doc):
+            self._remove(child)
+        self._index[self._parent_id(doc)].discard(doc['_id'])
+        self._index.pop(doc['_id'], None)
+        self._docs.pop(doc['_id'], None)
+        self._contents.pop(doc['_id'], None)
+
+    def _lookup(self, path):
+        parts = path.strip('/').split('/')
+        if len(parts) < 2 or parts[0] != 'user' or parts[1] != self.user['login']:
+            raise FakeGirderError(400, 'Path not found: %s' % path)
+
+        doc = self.user
+        for name in parts[2:]:
+            doc = self._child(doc, name)
+            if doc is None:
+                raise FakeGirderError(400, 'Path not found: %s' % path)
+
+        return doc
+
+    def _parent(self, params):
+        parent_type = params.get('parentType', 'folder')
+        if parent_type not in ('folder', 'user'):
+            raise FakeGirderError(400, 'Invalid parentType: %s' % parent_type)
+
+        return self._load(params['parentId'], parent_type)
+
+    # Serving requests
+
+    def _handle(self, request):
+        url = urlsplit(request.path)
+        params = dict(parse_qsl(url.query))
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else b''
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        status, response, content_type = 404, {'message': 'No matching route'}, None
+        path = url.path[len(API_ROOT):] if url.path.startswith(API_ROOT) else None
+        for method, regex, pattern, func in self._routes:
+            match = regex.match(path or '') if method == request.command else None
+            if match is None:
+                continue
+            with self._lock:
+                self.requests['%s %s' % (method, pattern)] += 1
+                try:
+                    status, response = 200, func(params, body, *match.groups())
+                except FakeGirderError as e:
+                    status, response = e.status, {'message': e.message, 'type': 'rest'}
+            break
+
+        if isinstance(response, bytes):
+            content_type = 'application/octet-stream'
+        else:
+            content_type = 'application/json'
+            response = json.dumps(response).encode('utf8')
+
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(response)))
+        request.end_headers()
+        request.wfile.write(response)
+
+    @route('POST', 'api_key/token')
+    def _token(self, params, body):
+        return {'authToken': {'token': 'fake-token'}}
+
+    @route('GET', 'notification/stream')
+    def _notification_stream(self, params, body):
+        # Girder holds the stream open for timeout seconds, this sends the
+        # pending notifications and ends it.
+        notifications, self._notifications = self._notifications, []
+
+        return b''.join(('data: %s\n\n' % json.dumps(n)).encode('utf8')
+                        for n in notifications)
+
+    @route('GET', 'user/{id}/details')
+    def _user_details(self, params, body, id):
+        return {'nFolders': len(self._children(self._load(id, 'user'), 'folder'))}
+
+    @route('GET', 'user/me')
+    def _me(self, params, body):
+        return self.user
+
+    @route('GET', 'resource/lookup')
+    def _resource_lookup(self, params, body):
+        return self._lookup(params['path'])
+
+    @route('GET', 'folder')
+    def _list_folders(self, params, body):
+        folders = self._children(self._parent(params), 'folder')
+        if params.get('name') is not None:
+            folders = [f for f in folders if f['name'] == params['name']]
+
+        return _page(folders, params)
+
+    @route('POST', 'folder')
+    def _post_folder(self, params, body):
+        parent = self._parent(params)
+        existing = self._child(parent, params['name'])
+        if existing is not None and existing['_modelType'] == 'folder':
+            if _true(params.get('reuseExisting')):
+                return existing
+            raise FakeGirderError(400, 'A folder with that name already exists here.')
+
+        return self._create_folder(parent, params['name'])
+
+    @route('GET', 'folder/{id}')
+    def _get_folder(self, params, body, id):
+        return self._load(id, 'folder')
+
+    @route('GET', 'folder/{id}/details')
+    def _folder_details(self, params, body, id):
+        folder = self._load(id, 'folder')
+
+        return {
+            'nItems': len(self._children(folder, 'item')),
+            'nFolders': len(self._children(folder, 'folder'))
+        }
+
+    @route('PUT', 'folder/{id}')
+    def _put_folder(self, params, body, id):
+        folder = self._load(id, 'folder')
+        if params.get('parentId'):
+            parent = self._parent(params)
+            self._move(folder, parentId=parent['_id'], parentCollection=parent['_modelType'])
+        folder.update(name=params.get('name', folder['name']), updated=_timestamp())
+
+        return folder
+
+    @route('DELETE', 'folder/{id}')
+    def _delete_folder(self, params, body, id):
+        self._remove(self._load(id, 'folder'))
+
+        return {'message': 'Deleted folder.'}
+
+    @route('GET', 'item')
+    def _list_items(self, params, body):
+        items = self._children(self._load(params['folderId'], 'folder'), 'item')
+        if params.get('name') is not None:
+            items = [i for i in items if i['name'] == params['name']]
+
+        return _page(items, params)
+
+    @route('POST', 'item')
+    def _post_item(self, params, body):
+        folder = self._load(params['folderId'], 'folder')
+        if _true(params.get('reuseExisting')):
+            existing = self._child(folder, params['name'])
+            if existing is not None and existing['_modelType'] == 'item':
+                return existing
+
+        return self._create_item(folder, params['name'])
+
+    @route('GET', 'item/{id}')
+    def _get_item(self, params, body, id):
+        return self._load(id, 'item')
+
+    @route('PUT', 'item/{id}')
+    def _put_item(self, params, body, id):
+        item = self._load(id, 'item')
+        if params.get('folderId'):
+            self._move(item, folderId=self._load(params['folderId'], 'folder')['_id'])
+        item.update(name=params.get('name', item['name']), updated=_timestamp())
+
+        return item
+
+    @route('DELETE', 'item/{id}')
+    def _delete_item(self, params, body, id):
+        self._remove(self._load(id, 'item'))
+
+        return {'message': 'Deleted item.'}
+
+    @route('GET', 'item/{id}/files')
+    def _list_files(self, params, body, id):
+        return _page(self._children(self._load(id, 'item')), params)
+
+    @route('POST', 'item/{id}/copy')
+    def _copy_item(self, params, body, id):
+        item = self._load(id, 'item')
+        folder = self._load(params.get('folderId', item['folderId']), 'folder')
+        copy = self._create_item(folder, params.get('name', item['name']))
+        for file in self._children(item):
+            self._store_file(None, copy['_id'], file['name'], self._contents[file['_id']],
+                             file['mimeType'])
+
+        return copy
+
+    @route('GET', 'file/{id}')
+    def _get_file(self, params, body, id):
+        return self._load(id, 'file')
+
+    @route('PUT', 'file/{id}')
+    def _put_file(self, params, body, id):
+        file = self._load(id, 'file')
+        file.update(name=params.get('name', file['name']), updated=_timestamp())
+
+        return file
+
+    @route('DELETE', 'file/{id}')
+    def _delete_file(self, params, body, id):
+        self._remove(self._load(id, 'file'))
+
+        return {'message': 'Deleted file.'}
+
+    @route('POST', 'file/{id}/copy')
+    def _copy_file(self, params, body, id):
+        file = self._load(id, 'file')
+        item = self._load(params['itemId'], 'item')
+
+        return self._store_file(None, item['_id'], file['name'], self._contents[id],
+                                file['mimeType'])
+
+    @route('GET', 'file/{id}/download')
+    def _download(self, params, body, id):
+        self._load(id, 'file')
+        contents = self._contents[id]
+        offset = int(params.get('offset') or 0)
+        end = int(params['endByte']) if params.get('endByte') else len(contents)
+
+        return contents[offset:end]
+
+    def _upload(self, file_id, item_id, name, size, mime_type):
+        upload = {
+            '_id': '%024x' % next(self._ids),
+            '_modelType': 'upload',
+            'fileId': file_id,
+            'parentId': item_id,
+            'name': name,
+            'size': size,
+            'mimeType': mime_type,
+            'received': 0
+        }
+        if not size:
+            return self._store_file(file_id, item_id, name, b'', mime_type)
+        self._uploads[upload['_id']] = (upload, bytearray())
+
+        return upload
+
+    @route('POST', 'file')
+    def _post_file(self, params, body):
+        if params.get('parentType', 'item') != 'item':
+            raise FakeGirderError(400, 'Only uploads to items are supported.')
+        item = self._load(params['parentId'], 'item')
+
+        return self._upload(None, item['_id'], params['name'], int(params['size']),
+                            params.get('mimeType'))
+
+    @route('PUT', 'file/{id}/contents')
+    def _put_contents(self, params, body, id):
+        file = self._load(id, 'file')
+
+        return self._upload(id, file['itemId'], file['name'], int(params['size']),
+                            file['mimeType'])
+
+    @route('POST', 'file/chunk')
+    def _post_chunk(self, params, body):
+        upload, data = self._uploads.get(params['uploadId'], (None, None))
+        if upload is None:
+            raise FakeGirderError(400, 'Invalid upload id.')
+        if int(params['offset']) != len(data):
+            raise FakeGirderError(400, 'Server has received %d bytes, but client sent '
+                                  'offset %s.' % (len(data), params['offset']))
+
+        data.extend(body)
+        upload['received'] = len(data)
+        if len(data) < upload['size']:
+            return upload
+
+        del self._uploads[upload['_id']]
+
+        return self._store_file(upload['fileId'], upload['parentId'], upload['name'],
+                                data, upload['mimeType'])
+
+    @route('GET', 'file/offset')
+    def _offset(self, params, body):
+        upload, data = self._uploads.get(params['uploadId'], (None, None))
+        if upload is None:
+            raise FakeGirderError(400, 'Invalid upload id.')
+
+        return {'offset': len(data)}
@@ -0,0 +1,269 @@
+import json
+
+import girder_client
+import mock
+import pytest
+from tornado import gen, web
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+
+from girder_jupyter.contents.async_client import AsyncGirderClient, StreamedResponse
+from girder_jupyter.contents.async_manager import AsyncGirderContentsManager
+from girder_jupyter.testing import FakeGirder
+
+from .test_manager import _file, _folder, _item
+
+NOTEBOOK = json.dumps({
+    'cells': [],
+    'metadata': {},
+    'nbformat': 4,
+    'nbformat_minor': 2
+}).encode('utf8')
+
+
+class FakeAsyncGirderClient(AsyncGirderClient):
+    def __init__(self, folder, items):
+        super(FakeAsyncGirderClient, self).__init__('http://localhost:8080/api/v1')
+        self.folder = folder
+        self.items = items
+        self.calls = []
+
+    async def resourceLookup(self, path):
+        self.calls.append('resourceLookup')
+        if path == 'user/test/data':
+            return self.folder
+        name = path.split('/')[-1]
+        return next(i for i in self.items if i['name'] == name)
+
+    async def get(self, path, parameters=None):
+        self.calls.append(path)
+        if path == 'item':
+            offset = parameters['offset']
+            return self.items[offset:offset + parameters['limit']]
+        return []
+
+    async def listFile(self, itemId):
+        self.calls.append('listFile')
+        item = next(i for i in self.items if i['_id'] == itemId)
+        return [_file('f%s' % itemId, item['name'], itemId)]
+
+    async def downloadFile(self, fileId, size=None):
+        return NOTEBOOK
+
+    async def stream(self, path, parameters=None):
+        response = StreamedResponse(path, 'GET')
+        response._chunk(NOTEBOOK[:10])
+        response._chunk(NOTEBOOK[10:])
+        response._chunks.put_nowait(b'')
+        return response
+
+
+def _run(coroutine):
+    return IOLoop.current().run_sync(lambda: coroutine)
+
+
+def test_async_listing():
+    items = [_item(str(i), 'nb%d.ipynb' % i, 'folder') for i in range(10)]
+    gc = FakeAsyncGirderClient(_folder('folder', 'data'), items)
+    manager = AsyncGirderContentsManager(async_gc=gc, root='user/test')
+
+    model = _run(manager.get('data'))
+
+    assert model['type'] == 'directory'
+    assert [m['name'] for m in model['content']] == [i['name'] for i in items]
+    assert all(m['type'] == 'notebook' and m['writable'] for m in model['content'])
+    assert _run(manager.dir_exists('data'))
+    assert gc.calls.count('listFile') == len(items)
+
+
+def test_async_listing_bounds_concurrent_requests():
+    class Client(FakeAsyncGirderClient):
+        in_flight = peak = 0
+
+        async def listFile(self, itemId):
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            await gen.sleep(0.001)
+            self.in_flight -= 1
+            return await super(Client, self).listFile(itemId)
+
+    items = [_item(str(i), 'nb%d.ipynb' % i, 'folder') for i in range(25)]
+    gc = Client(_folder('folder', 'data'), items)
+    manager = AsyncGirderContentsManager(async_gc=gc, root='user/test',
+                                         max_concurrent_requests=3)
+
+    model = _run(manager.get('data'))
+
+    assert len(model['content']) == 25
+    assert gc.peak == 3
+
+
+def test_async_notebook():
+    items = [_item('0', 'nb.ipynb', 'folder')]
+    gc = FakeAsyncGirderClient(_folder('folder', 'data'), items)
+    manager = AsyncGirderContentsManager(async_gc=gc, root='user/test')
+
+    model = _run(manager._notebook_model('data/nb.ipynb', items[0], access={'folder': True}))
+
+    assert model['type'] == 'notebook'
+    assert model['content']['nbformat'] == 4
+    assert model['writable']
+
+
+def test_async_bulk_download(tmpdir):
+    items = [_item(str(i), 'nb%d.ipynb' % i, 'folder') for i in range(5)]
+    gc = FakeAsyncGirderClient(_folder('folder', 'data'), items)
+    manager = AsyncGirderContentsManager(async_gc=gc, root='user/test', bulk_concurrency=2)
+
+    stats = _run(manager.bulk_download('data', str(tmpdir)))
+
+    assert stats['files'] == 5
+    assert stats['bytes'] == 5 * len(NOTEBOOK)
+    assert sorted(f.basename for f in tmpdir.listdir()) == [i['name'] for i in items]
+
+
+def test_streamed_response():
+    async def read(code):
+        response = StreamedResponse('http://localhost:8080/api/v1/folder/f/download', 'GET')
+        response._header('HTTP/1.1 %d Status\r\n' % code)
+        response._chunk(b'body')
+        future = Future()
+        future.set_result(mock.Mock(code=code, request_time=0.1))
+        response._done(future)
+        return [await response.read(), await response.read()]
+
+    assert _run(read(200)) == [b'body', b'']
+    # The body of an error is raised rather than streamed
+    with pytest.raises(girder_client.HttpError) as error:
+        _run(read(403))
+    assert error.value.status == 403
+    assert error.value.responseText == 'body'
+
+
+def test_download_file():
+    data = bytes(bytearray(range(256))) * 1024
+
+    async def download(girder, file, size=None):
+        gc = AsyncGirderClient(girder.api_url, token='token')
+        return await gc.downloadFile(file['_id'], size)
+
+    with FakeGirder() as girder:
+        file = girder.add_path('data/a.bin', data)
+
+        assert AsyncGirderClient(girder.api_url).http_client.max_body_size > 100 * 1024 ** 2
+        assert _run(download(girder, file, len(data))) == data
+        assert _run(download(girder, file)) == data
+        with pytest.raises(girder_client.IncompleteResponseError):
+            _run(download(girder, file, len(data) + 1))
+        with pytest.raises(girder_client.IncompleteResponseError):
+            _run(download(girder, file, len(data) - 1))
+
+
+def test_streamed_response_holds_back_download():
+    data = b'x' * (32 * 1024 ** 2)
+
+    async def stream(girder, file):
+        gc = AsyncGirderClient(girder.api_url, token='token')
+        response = await gc.stream('file/%s/download' % file['_id'])
+        chunks = [await response.read()]
+        await gen.sleep(0.2)
+        # Nothing more is read from Girder once the queue is full
+        held_back = response.received
+
+        while chunks[-1]:
+            chunks.append(await response.read())
+        return held_back, b''.join(chunks)
+
+    with FakeGirder() as girder:
+        file = girder.add_path('data/a.bin', data)
+        held_back, body = _run(stream(girder, file))
+
+    assert held_back < len(data) // 4
+    assert body == data
+
+
+def test_closed_streamed_response_aborts_request():
+    data = b'x' * (32 * 1024 ** 2)
+
+    async def stream(girder, file):
+        gc = AsyncGirderClient(girder.api_url, token='token')
+        response = await gc.stream('file/%s/download' % file['_id'])
+        await response.read()
+        await gen.sleep(0.1)
+        response.close()
+        for _ in range(100):
+            if response.finished:
+                break
+            await gen.sleep(0.01)
+        return response
+
+    with FakeGirder() as girder:
+        file = girder.add_path('data/a.bin', data)
+        response = _run(stream(girder, file))
+
+    assert response.finished
+    assert response.received < len(data)
+
+
+def test_async_range_is_a_single_request():
+    data = bytes(bytearray(range(256))) * 1024
+
+    async def read(manager, file):
+        stream = await manager._open_range(file, 1000, 200000, 1024)
+        chunks = [await stream.read()]
+        while chunks[-1]:
+            chunks.append(await stream.read())
+        return b''.join(chunks)
+
+    with FakeGirder() as girder:
+        file = girder.add_path('data/a.bin', data)
+        manager = AsyncGirderContentsManager(api_url=girder.api_url, root='user/user',
+                                             token='token')
+
+        assert _run(read(manager, file)) == data[1000:200000]
+        assert girder.requests['GET file/{id}/download'] == 1
+
+
+def test_async_api_key_authentication():
+    with FakeGirder() as girder:
+        girder.add_path('data/a.txt', b'data')
+        manager = AsyncGirderContentsManager(api_url=girder.api_url, root='user/user',
+                                             api_key='key')
+
+        assert _run(manager.file_exists('data/a.txt'))
+        assert manager.async_gc.token == 'fake-token'
+        assert girder.requests['POST api_key/token'] == 1
+
+
+def test_async_delete_non_empty_folder():
+    with FakeGirder() as girder:
+        for i in range(20):
+            girder.add_path('data/%d.txt' % i, b'data')
+        manager = AsyncGirderContentsManager(api_url=girder.api_url, root='user/user',
+                                             token='token')
+        _run(manager.dir_exists('data'))
+        girder.requests.clear()
+
+        with pytest.raises(web.HTTPError) as e:
+            _run(manager.delete_file('data'))
+
+        assert e.value.status_code == 400
+        assert dict(girder.requests) == {'GET item': 1}
+
+        girder.add_folder(girder.user, 'empty')
+        _run(manager.delete_file('empty'))
+        assert not _run(manager.dir_exists('empty'))
+
+
+def test_async_bulk_download_streams_to_disk(tmpdir):
+    data = bytes(bytearray(range(256))) * 4096
+
+    with FakeGirder() as girder:
+        girder.add_path('data/a.bin', data)
+        manager = AsyncGirderContentsManager(api_url=girder.api_url, root='user/user',
+                                             token='token')
+
+        stats = _run(manager.bulk_download('data', str(tmpdir)))
+
+    assert stats['bytes'] == len(data)
+    assert tmpdir.join('a.bin').read_binary() == data
@@ -0,0 +1,109 @@
+import errno
+import os
+
+import mock
+
+from girder_jupyter.contents.blob_cache import BlobCache, TMP_PREFIX
+
+
+def _file(id, data, sha512=None, updated=None):
+    file = {
+        '_id': id,
+        'size': len(data)
+    }
+    if sha512 is not None:
+        file['sha512'] = sha512
+    if updated is not None:
+        file['updated'] = updated
+    return file
+
+
+def test_round_trip(tmpdir):
+    cache = BlobCache(str(tmpdir))
+    file = _file('a', b'data', sha512='abc')
+
+    assert cache.get(file) is None
+    cache.put(file, [b'da', b'ta'])
+
+    assert cache.get(file) == b'data'
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_keys(tmpdir):
+    cache = BlobCache(str(tmpdir))
+
+    # Files with the same sha512 share a blob
+    assert cache.key(_file('a', b'', sha512='abc')) == cache.key(_file('b', b'', sha512='abc'))
+    assert cache.key(_file('a', b'', updated='1')) != cache.key(_file('a', b'', updated='2'))
+    # Without either the contents can't be identified, so aren't cached
+    assert cache.key(_file('a', b'')) is None
+    cache.put(_file('a', b'data'), [b'data'])
+    assert not tmpdir.listdir()
+
+
+def test_size_mismatch_is_a_miss(tmpdir):
+    cache = BlobCache(str(tmpdir))
+    cache.put(_file('a', b'data', sha512='abc'), [b'data'])
+
+    assert cache.get(_file('a', b'longer data', sha512='abc')) is None
+
+
+def test_lru_eviction(tmpdir):
+    cache = BlobCache(str(tmpdir), max_size=8)
+    files = [_file(str(i), b'abcd', sha512=str(i)) for i in range(3)]
+    cache.put(files[0], [b'abcd'])
+    cache.put(files[1], [b'abcd'])
+    for i, file in enumerate(files[:2]):
+        os.utime(os.path.join(str(tmpdir), cache.key(file)), (i, i))
+    # Reading the oldest makes it the most recently used
+    assert cache.get(files[0]) is not None
+
+    cache.put(files[2], [b'abcd'])
+
+    assert cache.get(files[0]) is not None
+    assert cache.get(files[1]) is None
+    assert cache.get(files[2]) is not None
+    assert cache.stats()['bytes'] == 8
+
+
+def test_shared_directory(tmpdir):
+    writer = BlobCache(str(tmpdir))
+    reader = BlobCache(str(tmpdir))
+    file = _file('a', b'data', updated='2018-01-01T00:00:00+00:00')
+
+    writer.put(file, [b'data'])
+    assert reader.get(file) == b'data'
+
+    writer.clear()
+    assert reader.get(file) is None
+
+
+def test_stale_temporary_files_are_removed(tmpdir):
+    cache = BlobCache(str(tmpdir))
+    stale = tmpdir.join(TMP_PREFIX + 'stale')
+    stale.write('partial')
+    os.utime(str(stale), (0, 0))
+    fresh = tmpdir.join(TMP_PREFIX + 'fresh')
+    fresh.write('partial')
+
+    cache.put(_file('a', b'data', sha512='abc'), [b'data'])
+
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+def test_errors_are_misses(tmpdir):
+    cache = BlobCache(str(tmpdir))
+    file = _file('a', b'data', sha512='abc')
+
+    with mock.patch('girder_jupyter.contents.blob_cache.tempfile.mkstemp',
+                    side_effect=OSError(errno.ENOSPC, 'No space left on device')):
+        cache.put(file, [b'data'])
+    assert cache.get(file) is None
+
+    cache.put(file, [b'data'])
+    with mock.patch('girder_jupyter.contents.blob_cache.open', create=True,
+                    side_effect=IOError(errno.EACCES, 'Permission denied')):
+        assert cache.get(file) is None
+    assert cache.get(file) == b'data'
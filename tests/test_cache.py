@@ -0,0 +1,110 @@
+import girder_client
+import mock
+import nbformat
+
+from girder_jupyter.contents.cache import NotebookCache, ResourceCache
+from girder_jupyter.contents.manager import GirderContentsManager
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry():
+    clock = Clock()
+    cache = ResourceCache(ttl=10, max_size=10, clock=clock)
+    cache.set('user/test/a', {'_id': 'a'})
+
+    assert cache.get('user/test/a') == {'_id': 'a'}
+    clock.now = 11
+    assert cache.get('user/test/a') is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_lru_eviction():
+    cache = ResourceCache(ttl=10, max_size=2)
+    cache.set('a', {'_id': 'a'})
+    cache.set('b', {'_id': 'b'})
+    # Touch 'a' so 'b' becomes the least recently used entry
+    cache.get('a')
+    cache.set('c', {'_id': 'c'})
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert len(cache) == 2
+
+
+def test_recursive_invalidation():
+    cache = ResourceCache()
+    cache.set('user/test/a', {'_id': 'a'})
+    cache.set('user/test/a/b', {'_id': 'b'})
+    cache.set('user/test/ab', {'_id': 'ab'})
+    cache.invalidate('user/test/a', recursive=True)
+
+    assert cache.get('user/test/a') is None
+    assert cache.get('user/test/a/b') is None
+    assert cache.get('user/test/ab') is not None
+
+
+def test_disabled():
+    cache = ResourceCache(ttl=0)
+    cache.set('a', {'_id': 'a'})
+
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_manager_caches_lookups():
+    gc = mock.Mock(spec=girder_client.GirderClient)
+    gc.resourceLookup.return_value = {'_id': 'a', '_modelType': 'folder'}
+    gc.get.return_value = []
+    manager = GirderContentsManager(gc=gc, root='user/test')
+
+    assert manager.dir_exists('a')
+    assert manager.dir_exists('a')
+    assert gc.resourceLookup.call_count == 1
+    assert manager.resource_cache.stats()['hits'] == 1
+
+    manager.delete_file('a')
+    assert manager.dir_exists('a')
+    assert gc.resourceLookup.call_count == 2
+
+
+def _nb_file(id, sha512='abc'):
+    return {'_id': id, 'sha512': sha512}
+
+
+def test_notebook_cache_returns_copies():
+    cache = NotebookCache(max_size=100)
+    nb = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell('x = 1')])
+    cache.set(_nb_file('a'), nb, None, 10, 0.5)
+
+    first, message, seconds = cache.get(_nb_file('a'))
+    first.cells[0].metadata['trusted'] = True
+    second, _, _ = cache.get(_nb_file('a'))
+
+    assert 'trusted' not in nb.cells[0].metadata
+    assert 'trusted' not in second.cells[0].metadata
+    assert isinstance(second, nbformat.NotebookNode)
+    assert cache.get(_nb_file('a', sha512='changed')) is None
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+    assert cache.saved_seconds == 1.0
+
+
+def test_notebook_cache_budget():
+    cache = NotebookCache(max_size=100)
+    for i in range(3):
+        cache.set(_nb_file(str(i)), {}, None, 40, 0)
+    cache.set(_nb_file('big'), {}, None, 101, 0)
+
+    assert cache.get(_nb_file('0')) is None
+    assert cache.get(_nb_file('1')) is not None
+    assert cache.get(_nb_file('big')) is None
+    assert cache.size == 80
@@ -0,0 +1,143 @@
+import time
+
+import girder_client
+import mock
+import pytest
+
+from girder_jupyter.contents.cache import ResourceCache
+from girder_jupyter.contents.changes import (
+    ChangeWatcher, FolderPoller, NotificationSubscriber, parse_events)
+from girder_jupyter.contents.manager import GirderContentsManager
+from girder_jupyter.testing import FakeGirder
+
+
+@pytest.fixture
+def girder():
+    with FakeGirder() as girder:
+        girder.add_path('data/a.txt', b'data')
+        girder.add_path('data/sub/b.txt', b'data')
+        yield girder
+
+
+def _client(girder):
+    gc = girder_client.GirderClient(apiUrl=girder.api_url)
+    gc.token = 'token'
+
+    return gc
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('Timed out waiting for the cache to be invalidated')
+        time.sleep(0.01)
+
+
+def test_parse_events():
+    lines = [b'data: {"a": 1}', b'', b'event: ignored', b'data: {"b":', b'data: 2}', b'',
+             b'data: {"c": 3}']
+
+    assert list(parse_events(lines)) == [{'a': 1}, {'b': 2}, {'c': 3}]
+
+
+def test_invalidate_resources():
+    cache = ResourceCache(ttl=60)
+    cache.set('user/u/data', {'_id': 'f1', '_modelType': 'folder', 'parentId': 'u',
+                              'parentCollection': 'user'})
+    cache.set('user/u/data/sub', {'_id': 'f2', '_modelType': 'folder', 'parentId': 'f1',
+                                  'parentCollection': 'folder'})
+    cache.set('user/u/data/sub/b.txt', {'_id': 'i2', '_modelType': 'item', 'folderId': 'f2'})
+    cache.set('user/u/data/a.txt', {'_id': 'i1', '_modelType': 'item', 'folderId': 'f1'})
+    cache.set('user/u/other', {'_id': 'f3', '_modelType': 'folder', 'parentId': 'u',
+                               'parentCollection': 'user'})
+
+    assert cache.containers() == {'f1': 'folder', 'f2': 'folder', 'f3': 'folder', 'u': 'user'}
+
+    # The children of a changed folder, and everything below them, are dropped.
+    assert cache.invalidate_resources({'f2'}) == 2
+    assert cache.get('user/u/data/sub/b.txt') is None
+    assert cache.invalidate_resources({'f1'}) == 2
+    assert cache.get('user/u/other') is not None
+
+
+def test_poller(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user',
+                                    resource_cache_ttl=3600)
+    manager.get('data')
+    data = manager.resource_cache.get('user/user/data')
+    poller = FolderPoller(_client(girder), manager.resource_cache)
+
+    assert poller.poll() == set()
+    assert poller.poll() == set()
+
+    girder.add_path('data/c.txt', b'data')
+    assert poller.poll() == {data['_id']}
+    assert poller.poll() == set()
+
+    item = _client(girder).resourceLookup('user/user/data/a.txt')
+    _client(girder).put('item/%s' % item['_id'], parameters={'name': 'renamed.txt'})
+    assert poller.poll() == {data['_id']}
+
+
+def test_notification_subscriber(girder):
+    subscriber = NotificationSubscriber(_client(girder), 'girder_jupyter.change')
+    girder.notify('progress', {'_id': 'ignored'})
+    girder.notify('girder_jupyter.change', {'_id': 'f1', '_modelType': 'folder'})
+    girder.notify('girder_jupyter.change', {'_id': 'file1', 'itemId': 'i1'})
+
+    assert list(subscriber.read()) == [{'f1'}, {'file1', 'i1'}]
+    assert list(subscriber.read()) == []
+
+
+def test_watch_notifications(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user',
+                                    resource_cache_ttl=3600, change_events='notifications',
+                                    change_poll_interval=0.05)
+    try:
+        manager.get('data/a.txt')
+        item = manager.resource_cache.get('user/user/data/a.txt')
+        assert item is not None
+
+        girder.notify('girder_jupyter.change', item)
+        _wait_for(lambda: 'user/user/data/a.txt' not in manager.resource_cache._entries)
+    finally:
+        manager.change_watcher.stop()
+
+
+def test_watch_polling(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user',
+                                    resource_cache_ttl=3600, change_events='poll',
+                                    change_poll_interval=0.05)
+    try:
+        manager.get('data/sub/b.txt')
+        # Let the poller see the folder before it changes
+        _wait_for(lambda: girder.requests['GET folder/{id}/details'] > 0)
+
+        item = _client(girder).resourceLookup('user/user/data/sub/b.txt')
+        _client(girder).delete('item/%s' % item['_id'])
+        _wait_for(lambda: 'user/user/data/sub/b.txt' not in manager.resource_cache._entries)
+        assert not manager.file_exists('data/sub/b.txt')
+    finally:
+        manager.change_watcher.stop()
+
+
+def test_fallback_to_polling():
+    cache = ResourceCache(ttl=60)
+    subscriber = mock.Mock()
+    subscriber.read.side_effect = girder_client.HttpError(400, 'No matching route', '', 'GET')
+    poller = mock.Mock()
+    poller.poll.return_value = {'f1'}
+    cache.set('user/u/a', {'_id': 'i1', '_modelType': 'item', 'folderId': 'f1'})
+
+    watcher = ChangeWatcher(cache, poller, subscriber, interval=0.01).start()
+    try:
+        _wait_for(lambda: len(cache) == 0)
+    finally:
+        watcher.stop()
+
+
+def test_disabled(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user')
+
+    assert manager.change_watcher is None
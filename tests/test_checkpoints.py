@@ -0,0 +1,142 @@
+import girder_client
+import mock
+import pytest
+
+from girder_jupyter.contents.checkpoints import GirderCheckpoints
+from girder_jupyter.contents.manager import GirderContentsManager
+from girder_jupyter.testing import FakeGirder
+
+from .test_manager import _file, _folder, _item
+
+
+def _manager():
+    gc = mock.Mock(spec=girder_client.GirderClient)
+    manager = GirderContentsManager(gc=gc, root='user/test')
+
+    return manager, gc
+
+
+def test_default_checkpoints():
+    manager, gc = _manager()
+
+    assert isinstance(manager.checkpoints, GirderCheckpoints)
+    assert manager.checkpoints.parent is manager
+
+
+def test_create_checkpoint_copies_server_side():
+    manager, gc = _manager()
+    item = _item('item', 'nb.ipynb', 'folder')
+    gc.resourceLookup.return_value = item
+    gc.createFolder.return_value = _folder('checkpoints', '.ipynb_checkpoints')
+    gc.listItem.return_value = iter([])
+    gc.post.return_value = _item('copy', 'nb-checkpoint.ipynb', 'checkpoints')
+
+    checkpoint = manager.create_checkpoint('data/nb.ipynb')
+
+    assert checkpoint['id'] == 'checkpoint'
+    gc.resourceLookup.assert_called_once_with('user/test/data/nb.ipynb')
+    gc.createFolder.assert_called_once_with('folder', '.ipynb_checkpoints', reuseExisting=True)
+    gc.post.assert_called_once_with('item/item/copy', parameters={
+        'folderId': 'checkpoints',
+        'name': 'nb-checkpoint.ipynb'
+    })
+    assert not gc.downloadFile.called
+    assert not gc.downloadFileAsIterator.called
+
+
+def test_create_checkpoint_replaces_existing():
+    manager, gc = _manager()
+    gc.resourceLookup.return_value = _item('item', 'nb.ipynb', 'folder')
+    gc.createFolder.return_value = _folder('checkpoints', '.ipynb_checkpoints')
+    gc.listItem.return_value = iter([_item('old', 'nb-checkpoint.ipynb', 'checkpoints')])
+    gc.post.return_value = _item('copy', '.new-nb-checkpoint.ipynb', 'checkpoints')
+    gc.put.return_value = _item('copy', 'nb-checkpoint.ipynb', 'checkpoints')
+
+    manager.create_checkpoint('data/nb.ipynb')
+
+    assert gc.method_calls[-3:] == [
+        mock.call.post('item/item/copy', parameters={
+            'folderId': 'checkpoints',
+            'name': '.new-nb-checkpoint.ipynb'
+        }),
+        mock.call.delete('item/old'),
+        mock.call.put('item/copy', parameters={'name': 'nb-checkpoint.ipynb'})
+    ]
+
+
+def test_failed_create_keeps_checkpoint():
+    manager, gc = _manager()
+    gc.resourceLookup.return_value = _item('item', 'nb.ipynb', 'folder')
+    gc.createFolder.return_value = _folder('checkpoints', '.ipynb_checkpoints')
+    gc.listItem.return_value = iter([_item('old', 'nb-checkpoint.ipynb', 'checkpoints')])
+    gc.post.side_effect = girder_client.HttpError(500, '', '', 'POST')
+
+    with pytest.raises(girder_client.HttpError):
+        manager.create_checkpoint('data/nb.ipynb')
+
+    assert not gc.delete.called
+
+
+def test_restore_checkpoint_copies_server_side():
+    manager, gc = _manager()
+    item = _item('item', 'nb.ipynb', 'folder')
+    checkpoint = _item('copy', 'nb-checkpoint.ipynb', 'checkpoints')
+    gc.resourceLookup.side_effect = lambda path: {
+        'user/test/data/nb.ipynb': item,
+        'user/test/data/.ipynb_checkpoints/nb-checkpoint.ipynb': checkpoint
+    }[path]
+    gc.listFile.side_effect = lambda item_id: iter([_file('f' + item_id, 'nb.ipynb', item_id)])
+    gc.post.return_value = _file('restored', 'nb.ipynb', 'item')
+
+    manager.restore_checkpoint('checkpoint', 'data/nb.ipynb')
+
+    # The file is only deleted once the checkpoint has been copied
+    assert gc.method_calls[-2:] == [
+        mock.call.post('file/fcopy/copy', parameters={'itemId': 'item'}),
+        mock.call.delete('file/fitem')
+    ]
+    assert not gc.put.called
+
+
+def test_failed_restore_keeps_file():
+    manager, gc = _manager()
+    item = _item('item', 'nb.ipynb', 'folder')
+    checkpoint = _item('copy', 'nb-checkpoint.ipynb', 'checkpoints')
+    gc.resourceLookup.side_effect = lambda path: item if path.endswith('/nb.ipynb') \
+        else checkpoint
+    gc.listFile.side_effect = lambda item_id: iter([_file('f' + item_id, 'nb.ipynb', item_id)])
+    gc.post.side_effect = girder_client.HttpError(500, '', '', 'POST')
+
+    with pytest.raises(girder_client.HttpError):
+        manager.restore_checkpoint('checkpoint', 'data/nb.ipynb')
+
+    assert not gc.delete.called
+
+
+def test_list_checkpoints():
+    manager, gc = _manager()
+    gc.resourceLookup.side_effect = girder_client.HttpError(400, '', '', 'GET')
+
+    assert manager.list_checkpoints('data/nb.ipynb') == []
+
+
+def test_checkpoints_with_write_behind(tmpdir):
+    with FakeGirder() as girder:
+        manager = GirderContentsManager(api_url=girder.api_url, root='user/user',
+                                        write_behind=True, write_behind_dir=str(tmpdir),
+                                        write_behind_delay=3600)
+
+        def save(content):
+            manager.save({'type': 'file', 'format': 'text', 'content': content}, 'data/a.txt')
+
+        save(u'v1')
+        manager.create_checkpoint('data/a.txt')
+        save(u'v2')
+        assert manager.get('data/a.txt')['content'] == u'v2'
+
+        manager.restore_checkpoint('checkpoint', 'data/a.txt')
+
+        assert manager.get('data/a.txt')['content'] == u'v1'
+        assert manager.save_queue.pending() == []
+        manager.save_queue.close()
+        assert manager.get('data/a.txt')['content'] == u'v1'
@@ -0,0 +1,77 @@
+import json
+import threading
+
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+import girder_client
+import pytest
+
+from girder_jupyter.contents.client import PooledGirderClient
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    failures = 0
+
+    def _respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        if server.requests <= server.failures:
+            self._respond(502, b'{}')
+        else:
+            self._respond(200, json.dumps({'path': self.path}).encode('utf8'))
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+    httpd.requests = 0
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _client(server, **kwargs):
+    return PooledGirderClient('http://127.0.0.1:%d/api/v1' % server.server_port,
+                              retry_backoff=0, **kwargs)
+
+
+def test_retries_idempotent_requests(server):
+    server.failures = 2
+    gc = _client(server, max_retries=3)
+
+    assert gc.get('folder')['path'] == '/api/v1/folder'
+    assert server.requests == 3
+
+
+def test_does_not_retry_posts(server):
+    server.failures = 1
+    gc = _client(server, max_retries=3)
+
+    with pytest.raises(girder_client.HttpError):
+        gc.post('file')
+    assert server.requests == 1
+
+
+def test_gives_up_after_max_retries(server):
+    server.failures = 10
+    gc = _client(server, max_retries=2)
+
+    with pytest.raises(girder_client.HttpError) as e:
+        gc.get('folder')
+    assert e.value.status == 502
+    assert server.requests == 3
@@ -0,0 +1,72 @@
+import time
+
+import girder_client
+import pytest
+
+from girder_jupyter.contents.manager import GirderContentsManager
+from girder_jupyter.testing import FakeGirder
+
+
+@pytest.fixture
+def girder():
+    with FakeGirder() as girder:
+        yield girder
+
+
+def _manager(girder):
+    return GirderContentsManager(api_url=girder.api_url, root='user/user')
+
+
+def test_round_trip(girder):
+    manager = _manager(girder)
+    manager.save({'type': 'file', 'format': 'text', 'content': u'caf\xe9'}, 'data/a.txt')
+    manager.rename('data/a.txt', 'data/b.txt')
+
+    assert [m['name'] for m in manager.get('data')['content']] == ['b.txt']
+    assert manager.get('data/b.txt')['content'] == u'caf\xe9'
+
+    manager.delete('data/b.txt')
+    assert manager.get('data')['content'] == []
+
+
+def test_requests_are_counted(girder):
+    girder.add_path('data/a.txt', b'data')
+    manager = _manager(girder)
+
+    manager.get('data/a.txt')
+
+    assert girder.requests == {
+        'GET resource/lookup': 1,
+        'GET folder/{id}': 1,
+        'GET item/{id}/files': 1,
+        'GET file/{id}/download': 1
+    }
+
+
+def test_ranged_download(girder):
+    file = girder.add_path('data/a.txt', b'0123456789')
+    gc = girder_client.GirderClient(apiUrl=girder.api_url)
+
+    response = gc.get('file/%s/download' % file['_id'], {'offset': 2, 'endByte': 5},
+                      jsonResp=False)
+
+    assert response.content == b'234'
+
+
+def test_missing_path(girder):
+    gc = girder_client.GirderClient(apiUrl=girder.api_url)
+
+    with pytest.raises(girder_client.HttpError) as error:
+        gc.resourceLookup('user/user/missing')
+    assert error.value.status == 400
+
+
+def test_latency(girder):
+    girder.latency = 0.05
+    gc = girder_client.GirderClient(apiUrl=girder.api_url)
+
+    start = time.time()
+    gc.get('user/me')
+
+    assert time.time() - start >= 0.05
+    assert girder.total_requests == 1
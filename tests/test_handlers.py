@@ -0,0 +1,232 @@
+import hashlib
+import io
+import tarfile
+
+import girder_client
+import mock
+import pytest
+from tornado import web
+from tornado.testing import AsyncHTTPTestCase
+
+from girder_jupyter.contents.handlers import GirderArchiveHandler, GirderFilesHandler, \
+    parse_range, RangeNotSatisfiable, tar_pieces
+from girder_jupyter.contents.manager import GirderContentsManager
+
+CONTENT = bytes(bytearray(range(256))) * 40
+
+
+@pytest.mark.parametrize('header,expected', [
+    (None, None),
+    ('bytes=0-99', (0, 100)),
+    ('bytes=100-', (100, 1000)),
+    ('bytes=-100', (900, 1000)),
+    ('bytes=-2000', (0, 1000)),
+    ('bytes=900-5000', (900, 1000)),
+    # Ignored, so the whole file is sent
+    ('bytes=0-1,5-6', None),
+    ('bytes=10-5', None),
+    ('items=0-10', None),
+    ('bytes=-', None)
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=-0'])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+def _read_pieces(pieces, contents):
+    return b''.join(piece if isinstance(piece, bytes)
+                    else contents[piece[0]['_id']][piece[1]:piece[2]]
+                    for piece in pieces)
+
+
+def test_tar_pieces():
+    files = {
+        'a': {'_id': 'a', 'size': 1500, 'updated': '2018-01-01T00:00:00.000000+00:00'},
+        'b': {'_id': 'b', 'size': 0, 'created': '2018-01-01T00:00:00.000000+00:00'}
+    }
+    contents = {'a': CONTENT[:1500], 'b': b''}
+    pieces = tar_pieces([(u'dir', None), (u'dir/a.bin', files['a']),
+                         (u'caf\xe9.txt', files['b'])], 1000)
+
+    # File contents are split into chunk sized ranges
+    assert [p for p in pieces if not isinstance(p, bytes)] == [
+        (files['a'], 0, 1000), (files['a'], 1000, 1500)
+    ]
+    tar = tarfile.open(fileobj=io.BytesIO(_read_pieces(pieces, contents)))
+    assert tar.getnames() == [u'dir', u'dir/a.bin', u'caf\xe9.txt']
+    assert tar.getmember(u'dir').isdir()
+    assert tar.getmember(u'dir/a.bin').mtime == 1514764800
+    assert tar.extractfile(u'dir/a.bin').read() == CONTENT[:1500]
+
+
+class _AuthenticatedMixin(object):
+
+    def get_current_user(self):
+        return 'user'
+
+    def check_xsrf_cookie(self):
+        pass
+
+
+class _Handler(_AuthenticatedMixin, GirderFilesHandler):
+    CHUNK_SIZE = 1000
+
+
+class _ArchiveHandler(_AuthenticatedMixin, GirderArchiveHandler):
+    CHUNK_SIZE = 1000
+
+
+class GirderFilesHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        self.gc = mock.Mock(spec=girder_client.GirderClient)
+        self.gc.resourceLookup.return_value = {
+            '_id': 'i1', '_modelType': 'item', 'name': 'data.bin', 'folderId': 'f1'
+        }
+        self.file = {
+            '_id': 'f1', '_modelType': 'file', 'name': 'data.bin', 'itemId': 'i1',
+            'size': len(CONTENT), 'sha512': hashlib.sha512(CONTENT).hexdigest()
+        }
+        self.gc.listFile.side_effect = lambda item_id: iter([self.file])
+
+        def send(method, path, parameters=None, jsonResp=True, stream=False):
+            data = CONTENT[parameters['offset']:parameters['endByte']]
+            response = mock.Mock()
+            response.iter_content.side_effect = lambda size: iter(
+                [data[i:i + size] for i in range(0, len(data), size)])
+            return response
+        self.gc.sendRestRequest.side_effect = send
+        self.cm = GirderContentsManager(gc=self.gc, root='root')
+
+        return web.Application([(r'/files/(.*)', _Handler)],
+                               contents_manager=self.cm, base_url='/')
+
+    def test_get(self):
+        response = self.fetch('/files/data.bin')
+        assert response.code == 200
+        assert response.body == CONTENT
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        assert response.headers['Content-Type'] == 'application/octet-stream'
+        assert response.headers['Etag'] == '"%s"' % self.file['sha512']
+        # Streamed a chunk at a time, from a single request
+        self.gc.sendRestRequest.assert_called_once_with(
+            'GET', 'file/f1/download', parameters={'offset': 0, 'endByte': len(CONTENT)},
+            jsonResp=False, stream=True)
+
+    def test_range(self):
+        response = self.fetch('/files/data.bin', headers={'Range': 'bytes=2500-3499'})
+        assert response.code == 206
+        assert response.body == CONTENT[2500:3500]
+        assert response.headers['Content-Range'] == 'bytes 2500-3499/%d' % len(CONTENT)
+        self.gc.sendRestRequest.assert_called_once_with(
+            'GET', 'file/f1/download', parameters={'offset': 2500, 'endByte': 3500},
+            jsonResp=False, stream=True)
+
+    def test_range_not_satisfiable(self):
+        response = self.fetch('/files/data.bin', headers={'Range': 'bytes=20000-'})
+        assert response.code == 416
+        assert response.headers['Content-Range'] == 'bytes */%d' % len(CONTENT)
+
+    def test_not_modified(self):
+        response = self.fetch('/files/data.bin', headers={
+            'If-None-Match': '"%s"' % self.file['sha512']
+        })
+        assert response.code == 304
+        self.gc.sendRestRequest.assert_not_called()
+
+    def test_head(self):
+        response = self.fetch('/files/data.bin', method='HEAD')
+        assert response.code == 200
+        assert int(response.headers['Content-Length']) == len(CONTENT)
+        self.gc.sendRestRequest.assert_not_called()
+
+    def test_missing(self):
+        self.gc.listFile.side_effect = lambda item_id: iter([])
+        assert self.fetch('/files/data.bin').code == 404
+
+
+class GirderArchiveHandlerTest(AsyncHTTPTestCase):
+
+    def get_app(self):
+        self.gc = mock.Mock(spec=girder_client.GirderClient)
+        resources = {
+            'root/project': {'_id': 'p', '_modelType': 'folder', 'name': 'project'},
+            'root/project/a.bin': {'_id': 'ia', '_modelType': 'item', 'name': 'a.bin',
+                                   'folderId': 'p'},
+            'root/project/data': {'_id': 'd', '_modelType': 'folder', 'name': 'data'}
+        }
+        self.gc.resourceLookup.side_effect = lambda path: resources[path]
+        self.files = {
+            'ia': {'_id': 'fa', '_modelType': 'file', 'name': 'a.bin', 'itemId': 'ia',
+                   'size': 2500},
+            'ib': {'_id': 'fb', '_modelType': 'file', 'name': 'b.bin', 'itemId': 'ib',
+                   'size': 10}
+        }
+        self.gc.listFile.side_effect = lambda item_id: iter([self.files[item_id]])
+
+        def get(path, parameters=None, jsonResp=True):
+            if path == 'item':
+                return {
+                    'p': [resources['root/project/a.bin']],
+                    'd': [{'_id': 'ib', '_modelType': 'item', 'name': 'b.bin',
+                           'folderId': 'd'}]
+                }[parameters['folderId']]
+            if path == 'folder':
+                return [resources['root/project/data']] if parameters['parentId'] == 'p' \
+                    else []
+            response = mock.Mock()
+            response.content = CONTENT[parameters['offset']:parameters['endByte']]
+            return response
+        self.gc.get.side_effect = get
+        self.cm = GirderContentsManager(gc=self.gc, root='root', archive_concurrency=2)
+
+        return web.Application([(r'/girder/archive/(.*)', _ArchiveHandler)],
+                               contents_manager=self.cm, base_url='/')
+
+    def test_zip(self):
+        response = mock.Mock()
+        response.iter_content.return_value = iter([b'PK', b'zip'])
+        self.gc.sendRestRequest.return_value = response
+
+        got = self.fetch('/girder/archive/project')
+
+        assert got.code == 200
+        assert got.body == b'PKzip'
+        assert got.headers['Content-Type'] == 'application/zip'
+        assert 'project.zip' in got.headers['Content-Disposition']
+        self.gc.sendRestRequest.assert_called_once_with(
+            'GET', 'folder/p/download', None, jsonResp=False, stream=True)
+        assert response.close.called
+
+    def test_zip_girder_error(self):
+        self.gc.sendRestRequest.side_effect = girder_client.HttpError(
+            status=403, text='', url='', method='GET')
+
+        assert self.fetch('/girder/archive/project').code == 403
+
+    def test_tar(self):
+        got = self.fetch('/girder/archive/project?format=tar')
+
+        assert got.code == 200
+        assert int(got.headers['Content-Length']) == len(got.body)
+        tar = tarfile.open(fileobj=io.BytesIO(got.body))
+        assert sorted(tar.getnames()) == ['a.bin', 'data', 'data/b.bin']
+        assert tar.extractfile('a.bin').read() == CONTENT[:2500]
+        assert tar.extractfile('data/b.bin').read() == CONTENT[:10]
+
+    def test_tar_of_paths(self):
+        got = self.fetch('/girder/archive/project?format=tar&path=data')
+
+        tar = tarfile.open(fileobj=io.BytesIO(got.body))
+        assert tar.getnames() == ['data', 'data/b.bin']
+
+    def test_tar_invalid_path(self):
+        assert self.fetch('/girder/archive/project?format=tar&path=../x').code == 400
+
+    def test_unknown_format(self):
+        assert self.fetch('/girder/archive/project?format=rar').code == 400
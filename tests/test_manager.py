@@ -0,0 +1,637 @@
+import base64
+import hashlib
+import threading
+
+import girder_client
+import mock
+import nbformat
+import pytest
+from tornado import web
+
+from girder_jupyter.contents.manager import GirderContentsManager
+
+TIMESTAMP = '2018-01-01T00:00:00.000000+00:00'
+
+
+def _folder(id, name, access_level=2):
+    return {
+        '_id': id,
+        '_modelType': 'folder',
+        '_accessLevel': access_level,
+        'name': name,
+        'created': TIMESTAMP
+    }
+
+
+def _item(id, name, folder_id):
+    return {
+        '_id': id,
+        '_modelType': 'item',
+        'folderId': folder_id,
+        'name': name,
+        'created': TIMESTAMP
+    }
+
+
+def _file(id, name, item_id):
+    return {
+        '_id': id,
+        '_modelType': 'file',
+        'itemId': item_id,
+        'name': name,
+        'mimeType': 'text/plain',
+        'created': TIMESTAMP
+    }
+
+
+def _manager(folder, items, **kwargs):
+    gc = mock.Mock(spec=girder_client.GirderClient)
+    gc.resourceLookup.return_value = folder
+
+    def get(path, parameters=None):
+        if path == 'item':
+            listing = [i for i in items if i['folderId'] == parameters['folderId']]
+            offset = parameters.get('offset', 0)
+            limit = parameters.get('limit', 0) or len(listing)
+            return listing[offset:offset + limit]
+        return []
+    gc.get.side_effect = get
+    gc.listFile.side_effect = \
+        lambda item_id: iter([_file('f%s' % item_id, 'f%s.txt' % item_id, item_id)])
+
+    return GirderContentsManager(gc=gc, root='user/test', **kwargs), gc
+
+
+def test_listing_reuses_parent_access():
+    folder = _folder('folder', 'data')
+    items = [_item(str(i), 'f%d.txt' % i, 'folder') for i in range(50)]
+    manager, gc = _manager(folder, items)
+
+    model = manager.get('data')
+
+    assert len(model['content']) == 50
+    assert all(m['writable'] for m in model['content'])
+    assert gc.getFolder.call_count == 0
+    assert gc.getItem.call_count == 0
+
+
+def test_listing_read_only_folder():
+    folder = _folder('folder', 'data', access_level=0)
+    items = [_item(str(i), 'f%d.txt' % i, 'folder') for i in range(5)]
+    manager, gc = _manager(folder, items)
+
+    model = manager.get('data')
+
+    assert not model['writable']
+    assert not any(m['writable'] for m in model['content'])
+
+
+def test_listing_is_paged():
+    folder = _folder('folder', 'data')
+    items = [_item(str(i), 'f%d.txt' % i, 'folder') for i in range(25)]
+    manager, gc = _manager(folder, items, list_page_size=10)
+
+    model = manager.get('data')
+
+    assert [m['name'] for m in model['content']] == [i['name'] for i in items]
+    item_calls = [c for c in gc.get.call_args_list if c[0][0] == 'item']
+    assert [c[0][1]['offset'] for c in item_calls] == [0, 10, 20]
+
+
+def test_listing_pages_concurrently():
+    folder = _folder('folder', 'data')
+    items = [_item(str(i), 'f%d.txt' % i, 'folder') for i in range(25)]
+    manager, gc = _manager(folder, items, list_page_size=10, list_concurrency=4)
+
+    model = manager.get('data')
+
+    assert [m['name'] for m in model['content']] == [i['name'] for i in items]
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_listing_lists_each_items_files_once(concurrency):
+    folder = _folder('folder', 'data')
+    items = [_item(str(i), 'f%d.%s' % (i, 'ipynb' if i % 2 else 'txt'), 'folder')
+             for i in range(20)]
+    names = {i['_id']: i['name'] for i in items}
+    manager, gc = _manager(folder, items, file_list_concurrency=concurrency)
+    gc.listFile.side_effect = \
+        lambda item_id: iter([_file('f%s' % item_id, names[item_id], item_id)])
+
+    model = manager.get('data')
+
+    assert [m['type'] for m in model['content']] == ['file', 'notebook'] * 10
+    assert sorted(c[0][0] for c in gc.listFile.call_args_list) == sorted(names)
+
+
+def _sized_file(data):
+    file = _file('file', 'data.bin', 'item')
+    file['size'] = len(data)
+    return file
+
+
+def test_file_content_is_streamed_into_one_buffer():
+    data = bytes(bytearray(range(256))) * 100
+    manager, gc = _manager(_folder('folder', 'data'), [])
+    manager.BASE64_CHUNK_SIZE = 3 * 10
+    gc.downloadFileAsIterator.return_value = iter([data[:1000], data[1000:]])
+
+    model = manager._file_model('data/data.bin', _sized_file(data), access={'item': True})
+
+    assert model['format'] == 'base64'
+    assert model['content'] == base64.b64encode(data).decode('ascii')
+
+
+def test_file_content_text():
+    data = u'café'.encode('utf8')
+    manager, gc = _manager(_folder('folder', 'data'), [])
+    gc.downloadFileAsIterator.return_value = iter([data[:4], data[4:]])
+
+    model = manager._file_model('data/data.txt', _sized_file(data), access={'item': True})
+
+    assert model['format'] == 'text'
+    assert model['content'] == u'café'
+
+
+def test_file_content_blob_cache(tmpdir):
+    data = b'data'
+    manager, gc = _manager(_folder('folder', 'data'), [], blob_cache_dir=str(tmpdir))
+    gc.downloadFileAsIterator.side_effect = lambda file_id: iter([data])
+    file = _sized_file(data)
+    file['sha512'] = hashlib.sha512(data).hexdigest()
+
+    for _ in range(2):
+        model = manager._file_model('data/data.bin', file, access={'item': True})
+        assert model['content'] == u'data'
+
+    assert gc.downloadFileAsIterator.call_count == 1
+
+
+def test_file_content_too_large():
+    manager, gc = _manager(_folder('folder', 'data'), [], max_inline_size=10)
+
+    with pytest.raises(web.HTTPError) as e:
+        manager._file_model('data/data.bin', _sized_file(b'x' * 11), access={'item': True})
+    assert e.value.status_code == 413
+    assert not gc.downloadFileAsIterator.called
+
+
+def test_chunked_save_is_spooled():
+    data = bytes(bytearray(range(256))) * 10
+    encoded = base64.b64encode(data).decode('ascii')
+    manager, gc = _manager(_folder('folder', 'data'), [], upload_chunk_size=1000)
+    gc.listFolder.side_effect = lambda *args, **kwargs: iter([_folder('folder', 'data')])
+    gc.loadOrCreateItem.return_value = _item('item', 'data.bin', 'folder')
+    gc.listFile.side_effect = lambda item_id: iter([])
+    received = bytearray()
+
+    def post(path, parameters=None, data=None):
+        if path == 'file/chunk':
+            received.extend(data)
+        return {'_id': 'upload'}
+    gc.post.side_effect = post
+
+    chunks = [encoded[:1024], encoded[1024:2048], encoded[2048:]]
+    for i, chunk in enumerate(chunks):
+        model = manager.save({
+            'type': 'file',
+            'format': 'base64',
+            'content': chunk,
+            'chunk': -1 if i == len(chunks) - 1 else i + 1
+        }, 'data/data.bin')
+        if i < len(chunks) - 1:
+            assert model['name'] == 'data.bin'
+            assert not received
+
+    assert bytes(received) == data
+    assert gc.post.call_args_list[0][1]['parameters']['size'] == len(data)
+
+
+def test_unchanged_save_is_skipped():
+    content = u'{"cells": []}'
+    manager, gc = _manager(_folder('folder', 'data'), [])
+    gc.listFolder.side_effect = lambda *args, **kwargs: iter([_folder('folder', 'data')])
+    gc.loadOrCreateItem.return_value = _item('item', 'data.txt', 'folder')
+    file = _file('file', 'data.txt', 'item')
+    file['size'] = len(content)
+    file['sha512'] = hashlib.sha512(content.encode('utf8')).hexdigest()
+    gc.listFile.side_effect = lambda item_id: iter([file])
+
+    manager.save({'type': 'file', 'format': 'text', 'content': content}, 'data/data.txt')
+    assert not gc.put.called
+    assert not gc.post.called
+
+    gc.put.return_value = {'_id': 'upload'}
+    manager.save({'type': 'file', 'format': 'text', 'content': content + ' '},
+                 'data/data.txt')
+    assert gc.put.called
+
+
+def test_save_creates_only_missing_folders():
+    folder = _folder('folder', 'data')
+    manager, gc = _manager(folder, [])
+
+    def lookup(path):
+        if path != 'user/test/data':
+            raise girder_client.HttpError(400, 'Path not found', path, 'GET')
+        return folder
+    gc.resourceLookup.side_effect = lookup
+    gc.createFolder.side_effect = \
+        lambda parent_id, name, **kwargs: _folder('%s/%s' % (parent_id, name), name)
+    gc.loadOrCreateItem.return_value = _item('item', 'data.txt', 'folder/a/b')
+    gc.listFile.side_effect = lambda item_id: iter([])
+    gc.post.return_value = {'_id': 'upload'}
+
+    manager._upload_to_path(u'data', None, 'text', 'user/test/data/a/b/data.txt')
+
+    assert [c[0][:2] for c in gc.createFolder.call_args_list] == \
+        [('folder', 'a'), ('folder/a', 'b')]
+    assert [c[0][0] for c in gc.resourceLookup.call_args_list] == \
+        ['user/test/data/a/b', 'user/test/data/a', 'user/test/data']
+
+    # The created folders are remembered for the next save
+    gc.resourceLookup.reset_mock()
+    gc.createFolder.reset_mock()
+    manager._upload_to_path(u'data', None, 'text', 'user/test/data/a/b/data.txt')
+    assert not gc.resourceLookup.called
+    assert not gc.createFolder.called
+
+
+def test_create_folders_under_item():
+    item = _item('item', 'data.txt', 'folder')
+    manager, gc = _manager(item, [])
+    gc.resourceLookup.side_effect = \
+        lambda path: item if path == 'user/test/data.txt' else None
+
+    with pytest.raises(web.HTTPError) as e:
+        manager._create_folders('user/test/data.txt/a')
+    assert e.value.status_code == 403
+    assert not gc.createFolder.called
+
+
+def test_bulk_upload(tmpdir):
+    folder = _folder('folder', 'data')
+    manager, gc = _manager(folder, [], bulk_concurrency=3)
+    gc.resourceLookup.side_effect = \
+        lambda path: folder if path == 'user/test/data' else None
+    gc.createFolder.side_effect = \
+        lambda parent_id, name, **kwargs: _folder('%s/%s' % (parent_id, name), name)
+    gc.loadOrCreateItem.side_effect = lambda name, folder_id, **kwargs: _item(
+        '%s/%s' % (folder_id, name), name, folder_id)
+    gc.listFile.side_effect = lambda item_id: iter([])
+    uploaded = {}
+
+    def post(path, parameters=None, data=None):
+        if path == 'file':
+            uploaded[parameters['parentId']] = parameters['size']
+        return {'_id': 'upload'}
+    gc.post.side_effect = post
+
+    tmpdir.join('a.txt').write('a')
+    tmpdir.join('sub', 'b.txt').write('bb', ensure=True)
+    tmpdir.join('sub', 'c.txt').write('ccc')
+    tmpdir.mkdir('empty')
+
+    stats = manager.bulk_upload(str(tmpdir), 'data')
+
+    assert stats['files'] == 3
+    assert stats['bytes'] == 6
+    assert uploaded == {
+        'folder/a.txt': 1,
+        'folder/sub/b.txt': 2,
+        'folder/sub/c.txt': 3
+    }
+    # Each folder is only created once, however many files are uploaded into it.
+    assert sorted(c[0][1] for c in gc.createFolder.call_args_list) == ['empty', 'sub']
+
+
+def test_bulk_download(tmpdir):
+    folder = _folder('folder', 'data')
+    sub = _folder('sub', 'sub')
+    items = [_item('a', 'a.txt', 'folder'), _item('b', 'b.txt', 'sub'),
+             _item('multi', 'multi', 'folder')]
+    manager, gc = _manager(folder, items)
+    gc.get.side_effect = lambda path, parameters=None: {
+        'item': [i for i in items if i['folderId'] == parameters.get('folderId')],
+        'folder': [sub] if parameters.get('parentId') == 'folder' else []
+    }[path]
+
+    def list_file(item_id):
+        if item_id == 'multi':
+            return iter([_file('m1', 'm1.txt', item_id), _file('m2', 'm2.txt', item_id)])
+        return iter([_file('f%s' % item_id, '%s.txt' % item_id, item_id)])
+    gc.listFile.side_effect = list_file
+
+    def download(file_id, path):
+        with open(path, 'w') as f:
+            f.write(file_id)
+    gc.downloadFile.side_effect = download
+
+    stats = manager.bulk_download('data', str(tmpdir))
+
+    assert stats['files'] == 4
+    assert stats['bytes'] == 8
+    assert tmpdir.join('a.txt').read() == 'fa'
+    assert tmpdir.join('multi', 'm1.txt').read() == 'm1'
+    assert tmpdir.join('multi', 'm2.txt').read() == 'm2'
+    assert tmpdir.join('sub', 'b.txt').read() == 'fb'
+
+
+def _rename_manager(resources):
+    manager, gc = _manager(_folder('folder', 'data'), [])
+
+    def lookup(path):
+        if path not in resources:
+            raise girder_client.HttpError(400, 'Path not found', path, 'GET')
+        return resources[path]
+    gc.resourceLookup.side_effect = lookup
+
+    return manager, gc
+
+
+def test_move_item_to_another_folder():
+    item = _item('item', 'nb.ipynb', 'folder')
+    manager, gc = _rename_manager({
+        'user/test/data/nb.ipynb': item,
+        'user/test/other': _folder('other', 'other')
+    })
+
+    manager.rename_file('data/nb.ipynb', 'other/nb.ipynb')
+
+    gc.put.assert_called_once_with('item/item', {'name': 'nb.ipynb', 'folderId': 'other'})
+    assert not gc.listFile.called
+    assert not gc.getItem.called
+
+
+def test_rename_item_renames_its_file():
+    item = _item('item', 'nb.ipynb', 'folder')
+    manager, gc = _rename_manager({'user/test/data/nb.ipynb': item})
+    gc.listFile.side_effect = lambda item_id: iter([_file('file', 'nb.ipynb', 'item')])
+
+    manager.rename_file('data/nb.ipynb', 'data/renamed.ipynb')
+
+    assert gc.put.call_args_list == [
+        mock.call('item/item', {'name': 'renamed.ipynb'}),
+        mock.call('file/file', {'name': 'renamed.ipynb'})
+    ]
+    assert not gc.getItem.called
+
+
+def test_move_folder():
+    manager, gc = _rename_manager({
+        'user/test/data': _folder('folder', 'data'),
+        'user/test/other': _folder('other', 'other')
+    })
+
+    manager.rename_file('data', 'other/moved')
+
+    gc.put.assert_called_once_with('folder/folder', {
+        'name': 'moved',
+        'parentId': 'other',
+        'parentType': 'folder'
+    })
+    assert not gc.get.called
+
+
+def test_move_folder_into_itself():
+    manager, gc = _rename_manager({'user/test/data': _folder('folder', 'data')})
+
+    with pytest.raises(web.HTTPError) as e:
+        manager.rename_file('data', 'data/sub/data')
+    assert e.value.status_code == 400
+    assert not gc.put.called
+
+
+def test_notebook_is_parsed_once():
+    data = nbformat.writes(nbformat.v4.new_notebook(
+        cells=[nbformat.v4.new_code_cell('x = 1')])).encode('utf8')
+    manager, gc = _manager(_folder('folder', 'data'), [])
+    gc.downloadFileAsIterator.side_effect = lambda file_id: iter([data])
+    file = _sized_file(data)
+    file['sha512'] = hashlib.sha512(data).hexdigest()
+
+    with mock.patch('nbformat.reads', wraps=nbformat.reads) as reads:
+        first = manager._notebook_model('data/nb.ipynb', file, access={'item': True})
+        first['content'].cells[0].source = 'changed'
+        second = manager._notebook_model('data/nb.ipynb', file, access={'item': True})
+
+    assert reads.call_count == 1
+    assert gc.downloadFileAsIterator.call_count == 1
+    assert second['content'].cells[0].source == 'x = 1'
+    assert manager.notebook_cache.hits == 1
+
+
+def _write_behind_manager(tmpdir):
+    folder = _folder('folder', 'data')
+    manager, gc = _manager(folder, [], write_behind=True, write_behind_dir=str(tmpdir),
+                           write_behind_delay=3600)
+    item = _item('item', 'data.txt', 'folder')
+    gc.resourceLookup.side_effect = lambda path: item if path.endswith('.txt') else folder
+    gc.loadOrCreateItem.return_value = item
+    gc.getFolder.return_value = folder
+    gc.listFile.side_effect = lambda item_id: iter([])
+    uploaded = {}
+
+    def post(path, parameters=None, data=None):
+        if path == 'file':
+            uploaded['size'] = parameters['size']
+        return {'_id': 'upload'}
+    gc.post.side_effect = post
+
+    return manager, gc, uploaded
+
+
+def test_write_behind_save(tmpdir):
+    manager, gc, uploaded = _write_behind_manager(tmpdir)
+
+    for content in (u'a', u'ab', u'abc'):
+        model = manager.save({'type': 'file', 'format': 'text', 'content': content},
+                             'data/data.txt')
+        assert model['name'] == 'data.txt'
+    assert not gc.post.called
+
+    # The latest save is read back from the journal, without uploading it
+    got = manager.get('data/data.txt')
+    assert got['content'] == u'abc'
+    assert got['last_modified'] == model['last_modified']
+    assert not gc.post.called
+
+    manager.flush_saves('data')
+    assert uploaded == {'size': 3}
+
+    file = _file('file', 'data.txt', 'item')
+    file['sha512'] = hashlib.sha512(b'abc').hexdigest()
+    gc.listFile.side_effect = lambda item_id: iter([file])
+    got = manager.get('data/data.txt', content=False)
+
+    assert got['last_modified'] == model['last_modified']
+    manager.save_queue.close()
+
+
+def test_write_behind_saves_coalesce(tmpdir):
+    manager, gc, uploaded = _write_behind_manager(tmpdir)
+
+    # As the notebook server's contents handler does for each save
+    for i in range(5):
+        path = 'data/data.txt'
+        if manager.file_exists(path):
+            assert manager.get(path)['content'] == u'version %d' % (i - 1)
+        manager.save({'type': 'file', 'format': 'text', 'content': u'version %d' % i}, path)
+
+    assert manager.save_queue.stats() == {'saves': 5, 'uploads': 0, 'pending': 1}
+    assert not gc.post.called
+
+    got = manager.get('data/data.txt', content=False)
+    assert got['type'] == 'file'
+    assert got['content'] is None
+    with pytest.raises(web.HTTPError):
+        manager.get('data/data.txt', type='directory')
+
+    manager.save_queue.close()
+    assert uploaded == {'size': 9}
+
+
+@pytest.mark.parametrize('path,status', [
+    ('data.txt', 400),
+    ('data/data.txt', 403)
+])
+def test_write_behind_save_refused(tmpdir, path, status):
+    folder = _folder('folder', 'data', access_level=0)
+    user = {'_id': 'user', '_modelType': 'user', 'login': 'test', '_accessLevel': 2}
+    manager, gc = _manager(folder, [], write_behind=True, write_behind_dir=str(tmpdir),
+                           write_behind_delay=3600)
+    resources = {'user/test': user, 'user/test/data': folder}
+
+    def lookup(path):
+        if path not in resources:
+            raise girder_client.HttpError(400, '', '', 'GET')
+        return resources[path]
+    gc.resourceLookup.side_effect = lookup
+
+    with pytest.raises(web.HTTPError) as e:
+        manager.save({'type': 'file', 'format': 'text', 'content': u'a'}, path)
+
+    assert e.value.status_code == status
+    assert manager.save_queue.pending() == []
+    manager.save_queue.close()
+
+
+def test_write_behind_delete_discards_save(tmpdir):
+    manager, gc, uploaded = _write_behind_manager(tmpdir)
+
+    def lookup(path):
+        if not path.endswith('/data'):
+            raise girder_client.HttpError(400, '', '', 'GET')
+        return _folder('folder', 'data')
+    gc.resourceLookup.side_effect = lookup
+
+    manager.save({'type': 'file', 'format': 'text', 'content': u'a'}, 'data/new.txt')
+    manager.delete_file('data/new.txt')
+
+    assert not manager.file_exists('data/new.txt')
+    manager.save_queue.close()
+    assert not uploaded
+
+
+def _assetstore_file(tmpdir, data, path='ab/cd/abcd'):
+    tmpdir.join('ab', 'cd', 'abcd').write(data, mode='wb', ensure=True)
+    file = _sized_file(data)
+    file.update(assetstoreId='assetstore', path=path)
+    return file
+
+
+@pytest.mark.parametrize('mmap_size', [0, 1])
+def test_file_read_from_assetstore(tmpdir, mmap_size):
+    manager, gc = _manager(_folder('folder', 'data'), [],
+                           assetstore_paths={'assetstore': str(tmpdir)},
+                           assetstore_mmap_size=mmap_size)
+    file = _assetstore_file(tmpdir, u'café'.encode('utf8'))
+
+    model = manager._file_model('data/data.txt', file, access={'item': True})
+
+    assert model['content'] == u'café'
+    assert not gc.downloadFileAsIterator.called
+
+
+@pytest.mark.parametrize('path,size', [
+    ('ab/cd/abcd', 100),
+    ('../outside', 4),
+    ('ab/cd/missing', 4)
+])
+def test_file_assetstore_fallback(tmpdir, path, size):
+    assetstore = tmpdir.mkdir('assetstore')
+    tmpdir.join('outside').write('data')
+    manager, gc = _manager(_folder('folder', 'data'), [],
+                           assetstore_paths={'assetstore': str(assetstore)})
+    gc.downloadFileAsIterator.side_effect = lambda file_id: iter([b'x' * size])
+    file = _assetstore_file(assetstore, b'data', path=path)
+    file['size'] = size
+
+    manager._file_model('data/data.txt', file, access={'item': True})
+
+    assert gc.downloadFileAsIterator.called
+
+
+def test_range_read_from_assetstore(tmpdir):
+    manager, gc = _manager(_folder('folder', 'data'), [],
+                           assetstore_paths={'assetstore': str(tmpdir)})
+    file = _assetstore_file(tmpdir, b'0123456789')
+
+    assert manager._read_range(file, 2, 5) == b'234'
+    assert not gc.get.called
+
+
+def test_range_streamed_from_assetstore(tmpdir):
+    manager, gc = _manager(_folder('folder', 'data'), [],
+                           assetstore_paths={'assetstore': str(tmpdir)})
+    file = _assetstore_file(tmpdir, b'0123456789')
+
+    stream = manager._open_range(file, 2, 7, 2)
+    try:
+        chunks = [stream._next() for _ in range(4)]
+    finally:
+        stream.close()
+
+    assert chunks == [b'23', b'45', b'6', b'']
+    assert not gc.sendRestRequest.called
+
+
+def test_login_rendered_in_background():
+    gc = mock.Mock(spec=girder_client.GirderClient)
+    rendered = threading.Event()
+
+    def get(path, parameters=None):
+        rendered.wait(5)
+        return {'login': 'jane'}
+
+    gc.get.side_effect = get
+    manager = GirderContentsManager(gc=gc, root='user/{login}/Private')
+
+    # Construction doesn't wait on Girder, using the root does.
+    assert manager.root == 'user/{login}/Private'
+    rendered.set()
+    assert manager._get_girder_path('a.txt') == 'user/jane/Private/a.txt'
+    assert gc.get.call_count == 1
+
+
+def test_login_rendered_on_use_after_failure():
+    gc = mock.Mock(spec=girder_client.GirderClient)
+    gc.get.side_effect = [girder_client.HttpError(503, '', '', 'GET'), {'login': 'jane'}]
+    manager = GirderContentsManager(gc=gc, root='user/{login}')
+    manager._warm_up_thread.join()
+
+    assert manager._get_girder_path('') == 'user/jane'
+
+
+def test_prewarm():
+    folder = _folder('folder', 'data')
+    gc = mock.Mock(spec=girder_client.GirderClient)
+    gc.resourceLookup.return_value = folder
+    gc.listItem.return_value = iter([_item('item', 'a.txt', 'folder')])
+    gc.listFolder.return_value = iter([_folder('sub', 'sub')])
+    manager = GirderContentsManager(gc=gc, root='user/jane/data', prewarm=True)
+    manager._warm_up_thread.join()
+
+    assert manager.resource_cache.get('user/jane/data') == folder
+    assert manager.resource_cache.get('user/jane/data/a.txt')['_id'] == 'item'
+    assert manager.resource_cache.get('user/jane/data/sub')['_id'] == 'sub'
@@ -0,0 +1,98 @@
+from prometheus_client import REGISTRY
+import pytest
+import six
+from tornado.ioloop import IOLoop
+
+from girder_jupyter.contents import metrics
+from girder_jupyter.contents.manager import GirderContentsManager
+from girder_jupyter.testing import FakeGirder
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture
+def girder():
+    with FakeGirder() as girder:
+        girder.add_path('data/a.txt', b'data')
+        yield girder
+
+
+@pytest.mark.parametrize('path,expected', [
+    ('resource/lookup?path=user/user', 'resource/lookup'),
+    ('item/5a0c3c2ff0a3b2f18c9d4e1a/files', 'item/{id}/files'),
+    ('/file/5a0c3c2ff0a3b2f18c9d4e1a', 'file/{id}'),
+    ('folder', 'folder')
+])
+def test_endpoint(path, expected):
+    assert metrics.endpoint(path) == expected
+
+
+def test_nested_operations_are_tracked_once():
+    before = _value('girder_jupyter_operation_duration_seconds_count',
+                    operation='outer', status='ok')
+
+    with metrics.track('outer') as outer:
+        with metrics.track('inner') as inner:
+            metrics.girder_request('GET', 'folder', 200, 0.1)
+
+    assert inner is None
+    assert outer.girder_requests == 1
+    assert _value('girder_jupyter_operation_duration_seconds_count',
+                  operation='outer', status='ok') == before + 1
+    assert _value('girder_jupyter_operation_duration_seconds_count',
+                  operation='inner', status='ok') == 0
+
+
+def test_operation_metrics(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user')
+    requests = _value('girder_jupyter_operation_girder_requests_sum', operation='get')
+    files = _value('girder_jupyter_girder_request_duration_seconds_count', method='GET',
+                   endpoint='item/{id}/files', status_code='200')
+    received = _value('girder_jupyter_girder_bytes_total', direction='received')
+
+    manager.get('data/a.txt')
+
+    assert _value('girder_jupyter_operation_girder_requests_sum',
+                  operation='get') == requests + 4
+    assert _value('girder_jupyter_girder_request_duration_seconds_count', method='GET',
+                  endpoint='item/{id}/files', status_code='200') == files + 1
+    assert _value('girder_jupyter_girder_bytes_total', direction='received') > received
+
+
+def test_failed_operation(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user')
+    errors = _value('girder_jupyter_operation_duration_seconds_count',
+                    operation='get', status='error')
+
+    with pytest.raises(Exception):
+        manager.get('missing')
+
+    assert _value('girder_jupyter_operation_duration_seconds_count',
+                  operation='get', status='error') == errors + 1
+
+
+def test_cache_metrics(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user')
+    hits = _value('girder_jupyter_cache_lookups_total', cache='resource', result='hit')
+
+    manager.get('data', content=False)
+    manager.get('data', content=False)
+
+    assert _value('girder_jupyter_cache_lookups_total',
+                  cache='resource', result='hit') == hits + 1
+
+
+@pytest.mark.skipif(six.PY2, reason='Requires Python 3')
+def test_async_operation_metrics(girder):
+    from girder_jupyter.contents.async_manager import AsyncGirderContentsManager
+
+    manager = AsyncGirderContentsManager(api_url=girder.api_url, root='user/user')
+    requests = _value('girder_jupyter_operation_girder_requests_sum',
+                      operation='file_exists')
+
+    assert IOLoop.current().run_sync(lambda: manager.file_exists('data/a.txt'))
+
+    assert _value('girder_jupyter_operation_girder_requests_sum',
+                  operation='file_exists') == requests + 2
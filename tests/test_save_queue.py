@@ -0,0 +1,113 @@
+import io
+import time
+
+import girder_client
+import pytest
+
+from girder_jupyter.contents.save_queue import SaveQueue
+
+
+class Uploads(object):
+    def __init__(self):
+        self.uploads = []
+        self.error = None
+
+    def __call__(self, stream, size, mime_type, path):
+        if self.error is not None:
+            raise self.error
+        stream.seek(0)
+        self.uploads.append((path, stream.read(), size, mime_type))
+
+
+def _put(queue, path, data):
+    return queue.put(path, io.BytesIO(data), len(data), 'text/plain')
+
+
+def test_saves_are_coalesced(tmpdir):
+    uploads = Uploads()
+    queue = SaveQueue(str(tmpdir), uploads, delay=3600)
+
+    for i in range(3):
+        _put(queue, 'user/test/a.txt', b'version %d' % i)
+    _put(queue, 'user/test/b.txt', b'b')
+    assert sorted(queue.pending()) == ['user/test/a.txt', 'user/test/b.txt']
+    assert not uploads.uploads
+
+    queue.flush('user/test/a.txt')
+
+    assert uploads.uploads == [('user/test/a.txt', b'version 2', 9, 'text/plain')]
+    assert queue.pending() == ['user/test/b.txt']
+    assert queue.stats() == {'saves': 4, 'uploads': 1, 'pending': 1}
+
+    queue.close()
+    assert len(uploads.uploads) == 2
+    assert not tmpdir.listdir()
+
+
+def test_worker_uploads_after_delay(tmpdir):
+    uploads = Uploads()
+    queue = SaveQueue(str(tmpdir), uploads, delay=0.05)
+
+    _put(queue, 'user/test/a.txt', b'a')
+    deadline = time.time() + 5
+    while not uploads.uploads and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert uploads.uploads == [('user/test/a.txt', b'a', 1, 'text/plain')]
+    queue.close()
+
+
+def test_journal_is_replayed(tmpdir):
+    uploads = Uploads()
+    uploads.error = IOError('Girder is down')
+    queue = SaveQueue(str(tmpdir), uploads, delay=3600)
+    _put(queue, 'user/test/a.txt', b'a')
+
+    with pytest.raises(IOError):
+        queue.flush()
+    # The journal is kept when the upload fails, even at shutdown
+    queue.close()
+    assert len(tmpdir.listdir()) == 1
+
+    uploads.error = None
+    queue = SaveQueue(str(tmpdir), uploads, delay=3600)
+    queue.close()
+
+    assert uploads.uploads == [('user/test/a.txt', b'a', 1, 'text/plain')]
+    assert not tmpdir.listdir()
+
+
+def test_pending_save_is_read_from_journal(tmpdir):
+    uploads = Uploads()
+    queue = SaveQueue(str(tmpdir), uploads, delay=3600)
+
+    assert queue.get('user/test/a.txt') is None
+    _put(queue, 'user/test/a.txt', b'a')
+    _put(queue, 'user/test/a.txt', b'ab')
+    assert queue.get('user/test/a.txt') == (b'ab', 'text/plain')
+
+    queue.discard('user/test/a.txt')
+    assert queue.get('user/test/a.txt') is None
+    queue.close()
+    assert not uploads.uploads
+    assert not tmpdir.listdir()
+
+
+def test_refused_save_is_not_retried(tmpdir):
+    uploads = Uploads()
+    uploads.error = girder_client.HttpError(403, 'Access denied', '', 'POST')
+    queue = SaveQueue(str(tmpdir), uploads, delay=0, retry_delay=0.01)
+
+    _put(queue, 'user/test/a.txt', b'a')
+    deadline = time.time() + 5
+    while queue.pending() and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert queue.pending() == []
+    assert [f.ext for f in tmpdir.listdir()] == ['.failed']
+    queue.close()
+
+    # It isn't replayed
+    uploads.error = None
+    SaveQueue(str(tmpdir), uploads, delay=3600).close()
+    assert not uploads.uploads
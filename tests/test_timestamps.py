@@ -0,0 +1,21 @@
+import dateutil.parser
+import pytest
+
+from girder_jupyter.contents.timestamps import parse_timestamp
+
+
+@pytest.mark.parametrize('timestamp', [
+    '2018-01-01T12:34:56.123000+00:00',
+    '2018-01-01T12:34:56.1+00:00',
+    '2018-01-01T12:34:56+00:00',
+    '2018-01-01T12:34:56Z',
+    '2018-01-01T12:34:56.123456-05:30',
+    '2018-01-01T12:34:56.123456',
+    'Jan 1 2018 12:34:56'
+])
+def test_matches_dateutil(timestamp):
+    parsed = parse_timestamp(timestamp)
+    expected = dateutil.parser.parse(timestamp)
+
+    assert parsed == expected
+    assert parsed.utcoffset() == expected.utcoffset()
@@ -0,0 +1,176 @@
+import json
+
+import pytest
+import six
+from tornado.ioloop import IOLoop
+
+from girder_jupyter.contents import tracing
+from girder_jupyter.contents.manager import GirderContentsManager
+from girder_jupyter.testing import FakeGirder, request_budget
+
+
+@pytest.fixture
+def girder():
+    with FakeGirder() as girder:
+        girder.add_path('data/a.txt', b'data')
+        girder.add_path('data/b.txt', b'more data')
+        yield girder
+
+
+def _names(spans):
+    return [span['name'] for span in spans]
+
+
+def _find(spans, name):
+    for span in spans:
+        if span['name'] == name:
+            return span
+        found = _find(span.get('children', []), name)
+        if found is not None:
+            return found
+
+    return None
+
+
+class _Recorder(object):
+
+    def __init__(self):
+        self.operations = []
+
+    def __call__(self, operation):
+        self.operations.append(operation.to_dict())
+
+
+def test_untraced_spans_are_not_recorded():
+    operation = tracing.Operation('get')
+    token = tracing.enter(operation)
+    try:
+        with tracing.span('outer') as span:
+            tracing.record('GET folder', 0.1)
+    finally:
+        tracing.exit(token)
+
+    assert span is None
+    assert operation.root is None
+
+
+def test_traced_generator():
+    @tracing.traced
+    def generate():
+        tracing.record('GET folder', 0)
+        yield 1
+        tracing.record('GET folder', 0)
+        yield 2
+
+    operation = tracing.Operation('get', trace=True)
+    token = tracing.enter(operation)
+    try:
+        for value in generate():
+            # The generator's span isn't current while its values are handled
+            tracing.record('GET item', 0)
+    finally:
+        tracing.exit(token)
+
+    trace = operation.to_dict()['trace']
+    assert _names(trace) == ['generate', 'GET item', 'GET item']
+    assert _names(trace[0]['children']) == ['GET folder', 'GET folder']
+
+
+def test_trace(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user',
+                                    trace_operations=True, slow_operation_threshold=1e-9)
+    manager._operation_finished = recorder = _Recorder()
+
+    manager.get('data')
+
+    operation, = recorder.operations
+    assert operation['operation'] == 'get'
+    assert operation['status'] == 'ok'
+    assert operation['girder_requests'] == sum(operation['requests'].values())
+    assert operation['requests']['GET item/{id}/files'] == 2
+    assert _names(operation['trace']) == ['_resource', '_dir_model']
+    assert _find(operation['trace'], 'GET resource/lookup')['status'] == 200
+    listing = _find(operation['trace'], '_list_resource')
+    assert _names(listing['children']) == ['GET item', 'GET folder']
+    assert _find(operation['trace'], '_prefetch_item_files') is not None
+
+
+def test_trace_download_size(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user',
+                                    trace_operations=True, slow_operation_threshold=1e-9)
+    manager._operation_finished = recorder = _Recorder()
+
+    manager.get('data/b.txt')
+
+    download = _find(recorder.operations[0]['trace'], '_download')
+    assert download['size'] == 9
+    assert download['source'] == 'girder'
+    assert _find(download['children'], 'GET file/{id}/download')['received'] == 9
+
+
+def test_slow_operation_log(girder, tmpdir):
+    log = tmpdir.join('slow.log')
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user',
+                                    slow_operation_threshold=1e-9, slow_operation_log=str(log))
+
+    manager.get('data/a.txt')
+    manager.file_exists('data/a.txt')
+
+    first, second = [json.loads(line) for line in log.readlines()]
+    assert first['operation'] == 'get'
+    assert 'trace' not in first
+    assert second['operation'] == 'file_exists'
+    # The item was found in the resource cache
+    assert second['requests'] == {'GET item/{id}/files': 1}
+
+
+def test_fast_operations_are_not_logged(girder, tmpdir):
+    log = tmpdir.join('slow.log')
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user',
+                                    slow_operation_threshold=60, slow_operation_log=str(log))
+
+    manager.get('data/a.txt')
+
+    assert not log.exists()
+
+
+@pytest.mark.skipif(six.PY2, reason='Requires Python 3')
+def test_async_trace(girder):
+    from girder_jupyter.contents.async_manager import AsyncGirderContentsManager
+
+    manager = AsyncGirderContentsManager(api_url=girder.api_url, root='user/user',
+                                         trace_operations=True,
+                                         slow_operation_threshold=1e-9)
+    manager._operation_finished = recorder = _Recorder()
+
+    IOLoop.current().run_sync(lambda: manager.get('data'))
+
+    trace = recorder.operations[0]['trace']
+    assert _names(trace) == ['_resource', '_dir_model']
+    listing = _find(trace, '_list_resource')
+    assert sorted(_names(listing['children'])) == ['GET folder', 'GET item']
+
+
+def test_request_budget(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user')
+
+    with request_budget(3) as operation:
+        manager.get('data/a.txt', content=False)
+
+    assert operation.girder_requests == 3
+
+    with pytest.raises(AssertionError) as e:
+        with request_budget(1):
+            manager.get('data/b.txt')
+
+    assert 'GET file/{id}/download: 1' in str(e.value)
+
+
+def test_request_budget_trace(girder):
+    manager = GirderContentsManager(api_url=girder.api_url, root='user/user')
+
+    with pytest.raises(AssertionError) as e:
+        with request_budget(0, trace=True):
+            manager.get('data/a.txt', content=False)
+
+    assert '"name": "_resource"' in str(e.value)
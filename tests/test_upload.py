@@ -0,0 +1,60 @@
+import base64
+
+import girder_client
+import mock
+import requests
+
+from girder_jupyter.contents.upload import Base64Reader, TextReader, upload_chunks
+
+DATA = bytes(bytearray(range(256))) * 7
+
+
+def _read_all(stream, chunk_size):
+    chunks = []
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return chunks
+        chunks.append(chunk)
+
+
+def test_base64_reader():
+    reader = Base64Reader(base64.b64encode(DATA).decode('ascii'))
+
+    assert reader.size == len(DATA)
+    assert b''.join(_read_all(reader, 100)) == DATA
+    reader.seek(101)
+    assert reader.read(50) == DATA[101:151]
+
+
+def test_text_reader():
+    text = u'café ☃ ' * 100
+    reader = TextReader(text, chunk_chars=7)
+
+    assert reader.size == len(text.encode('utf8'))
+    assert b''.join(_read_all(reader, 10)) == text.encode('utf8')
+    reader.seek(33)
+    assert reader.read(10) == text.encode('utf8')[33:43]
+
+
+def test_upload_chunks_resumes():
+    gc = mock.Mock(spec=girder_client.GirderClient)
+    received = bytearray()
+
+    def post(path, parameters=None, data=None):
+        assert parameters['offset'] == len(received)
+        received.extend(data)
+        # Fail after Girder has stored the second chunk
+        if len(received) == 200 and not gc.get.called:
+            raise requests.ConnectionError()
+        return {'_id': 'file', 'size': len(received)}
+
+    gc.post.side_effect = post
+    gc.get.side_effect = lambda path, params: {'offset': len(received)}
+
+    stream = Base64Reader(base64.b64encode(DATA).decode('ascii'))
+    file = upload_chunks(gc, {'_id': 'upload'}, stream, stream.size, 100)
+
+    assert bytes(received) == DATA
+    assert file['size'] == len(DATA)
+    gc.get.assert_called_once_with('file/offset', {'uploadId': 'upload'})